@@ -2,8 +2,11 @@
 
 import json
 import random
+from core_ecommerce.embeddings import search_products
 from core_ecommerce.models import Product, UserProfile
+from core_ecommerce.search import search_product_ids
 from django.contrib.auth.models import User
+from django.db.models import Q
 # 引入 requests 库用于模拟或真实调用 AI API
 import requests 
 
@@ -86,36 +89,36 @@ class AIGuideService:
         tags = self._get_user_profile_tags(user)
         keywords = self._extract_keywords(message)
         
-        # 根据关键词和用户消息搜索商品
-        products = Product.objects.all()
+        # 根据关键词和用户消息搜索商品（只推荐有货的商品）
+        products = Product.objects.filter(stock__gt=0)
+        semantic_products = []
         
-        # 关键词过滤
+        # 关键词过滤（全文检索索引，任一关键词命中即可）
         if keywords:
-            from django.db.models import Q
-            q_objects = Q()
-            for keyword in keywords:
-                q_objects |= Q(name__icontains=keyword) | Q(category__icontains=keyword) | Q(description__icontains=keyword)
-            products = products.filter(q_objects)
+            products = products.filter(id__in=search_product_ids(' '.join(keywords), match_any=True))
         
         # 如果没有关键词，从消息中提取
         if not keywords and message:
             # 尝试从消息中提取商品类型
             message_lower = message.lower()
             if '耳机' in message or 'earphone' in message_lower:
-                products = products.filter(Q(name__icontains='耳机') | Q(category='数码配件'))
+                products = products.filter(Q(id__in=search_product_ids('耳机')) | Q(category='数码配件'))
             elif '充电' in message or 'charger' in message_lower:
-                products = products.filter(Q(name__icontains='充电') | Q(category='数码配件'))
+                products = products.filter(Q(id__in=search_product_ids('充电')) | Q(category='数码配件'))
             elif '手环' in message or 'watch' in message_lower:
-                products = products.filter(Q(name__icontains='手环') | Q(category='智能穿戴'))
+                products = products.filter(Q(id__in=search_product_ids('手环')) | Q(category='智能穿戴'))
             elif '键盘' in message or 'keyboard' in message_lower:
-                products = products.filter(Q(name__icontains='键盘') | Q(category='电脑外设'))
+                products = products.filter(Q(id__in=search_product_ids('键盘')) | Q(category='电脑外设'))
             elif '鼠标' in message or 'mouse' in message_lower:
-                products = products.filter(Q(name__icontains='鼠标') | Q(category='电脑外设'))
+                products = products.filter(Q(id__in=search_product_ids('鼠标')) | Q(category='电脑外设'))
             elif '音箱' in message or 'speaker' in message_lower:
-                products = products.filter(Q(name__icontains='音箱') | Q(category='智能家居'))
+                products = products.filter(Q(id__in=search_product_ids('音箱')) | Q(category='智能家居'))
+            else:
+                # 没有可识别的商品类型：按语义向量检索与描述最相近的有货商品
+                semantic_products = search_products(message, limit=6, queryset=products)
         
-        # 按潜力评分和销量排序
-        recommended_products = products.order_by('-potential_score', '-sales_count', '-rating')[:6]
+        # 按潜力评分和销量排序（语义检索的结果保持相似度顺序）
+        recommended_products = semantic_products or products.order_by('-potential_score', '-sales_count', '-rating')[:6]
         
         # 如果还是没有结果，推荐热门商品
         if not recommended_products:
@@ -0,0 +1,79 @@
+"""
+Django管理命令：AI 选品评分性能基准
+使用方法: python manage.py bench_ai_selection --rows 1000 10000 50000
+
+在事务中生成临时商品，分别测量逐行 save() 的旧实现与向量化批量评分的吞吐量（products/sec），
+结束后回滚，不会在数据库中留下数据。
+"""
+import time
+from contextlib import contextmanager
+
+from django.core.management.base import BaseCommand
+from django.db.models.signals import post_save
+
+from ai_selector.selector_service import AISelectionService
+from core_ecommerce.management.benchmark import rolled_back
+from core_ecommerce.models import Product
+from core_ecommerce.signals import bump_catalog_version, index_saved_product
+
+BENCH_SKU_PREFIX = 'BENCH-SEL-'
+# 逐行 save() 时触发的派生数据同步；向量化实现只在最后递增一次目录版本
+PRODUCT_SAVE_RECEIVERS = (bump_catalog_version, index_saved_product)
+
+
+@contextmanager
+def product_save_signals_disconnected():
+    """计时期间断开商品 post_save 的同步信号，只测量评分本身和写两列的代价"""
+    for receiver in PRODUCT_SAVE_RECEIVERS:
+        post_save.disconnect(receiver, sender=Product)
+    try:
+        yield
+    finally:
+        for receiver in PRODUCT_SAVE_RECEIVERS:
+            post_save.connect(receiver, sender=Product)
+
+
+class Command(BaseCommand):
+    help = 'AI 选品评分吞吐量基准（逐行 save 对比向量化 + 批量写回）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000])
+        parser.add_argument(
+            '--legacy-max-rows', type=int, default=10000,
+            help='逐行实现只在不超过该规模时测量（太慢）',
+        )
+
+    def legacy_score(self, service):
+        """改造前的实现：逐行计算并 save()，与向量化实现一样只写评分和理由两列"""
+        with product_save_signals_disconnected():
+            for product in Product.objects.all():
+                score, reason = service._get_score_reason(product.name, product.category)
+                product.potential_score = score
+                product.selection_reason = reason
+                product.save(update_fields=['potential_score', 'selection_reason'])
+
+    def vectorized_score(self, service):
+        service.generate_selection_recommendations()
+
+    def run_case(self, label, rows, func, service):
+        start = time.perf_counter()
+        func(service)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f'{label:<12} rows={rows:<8} {elapsed:8.3f}s  {rows / elapsed:12,.0f} products/sec')
+
+    def handle(self, *args, **options):
+        service = AISelectionService()
+        categories = list(service.market_trends) + ['户外用品', '生活用品']
+        for rows in options['rows']:
+            with rolled_back():
+                Product.objects.bulk_create([
+                    Product(
+                        name=f'基准商品 {i}', sku=f'{BENCH_SKU_PREFIX}{i}', price=99,
+                        stock=i % 500, category=categories[i % len(categories)],
+                    )
+                    for i in range(rows)
+                ], batch_size=2000)
+                total = Product.objects.count()
+                if rows <= options['legacy_max_rows']:
+                    self.run_case('legacy', total, self.legacy_score, service)
+                self.run_case('vectorized', total, self.vectorized_score, service)
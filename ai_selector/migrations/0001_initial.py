@@ -0,0 +1,29 @@
+# Generated by Django 4.2.18 on 2026-10-17 01:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarketTrend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(max_length=100, unique=True, verbose_name='品类')),
+                ('growth', models.FloatField(verbose_name='增长率')),
+                ('competition', models.FloatField(verbose_name='竞争度')),
+                ('version', models.IntegerField(default=1, verbose_name='版本')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '市场趋势',
+                'verbose_name_plural': '市场趋势',
+            },
+        ),
+    ]
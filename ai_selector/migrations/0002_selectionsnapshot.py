@@ -0,0 +1,27 @@
+# Generated by Django 4.2.18 on 2026-10-17 01:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_selector', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SelectionSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('generated_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='生成时间')),
+                ('product_count', models.IntegerField(default=0, verbose_name='参与评分商品数')),
+                ('items', models.JSONField(default=list, verbose_name='推荐商品')),
+            ],
+            options={
+                'verbose_name': '选品推荐快照',
+                'verbose_name_plural': '选品推荐快照',
+                'ordering': ['-generated_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# ai_selector/models.py
+
+from django.db import models, transaction
+from django.db.models import F
+from core_ecommerce.models import Product
+
+
+class MarketTrend(models.Model):
+    """品类市场趋势（AI 选品评分输入）。
+
+    每次修改都会递增 version，并把该品类下的商品标记为待重新评分。
+    """
+    category = models.CharField(max_length=100, unique=True, verbose_name="品类")
+    growth = models.FloatField(verbose_name="增长率")
+    competition = models.FloatField(verbose_name="竞争度")
+    version = models.IntegerField(default=1, verbose_name="版本")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+
+    class Meta:
+        verbose_name = "市场趋势"
+        verbose_name_plural = "市场趋势"
+
+    def __str__(self):
+        return f"{self.category} (v{self.version})"
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            is_update = self.pk is not None
+            if is_update:
+                self.version = F('version') + 1
+            super().save(*args, **kwargs)
+            if is_update:
+                self.refresh_from_db(fields=['version'])
+            # 只影响本品类的商品
+            Product.objects.filter(category=self.category).update(score_dirty=True)
+
+
+class SelectionSnapshot(models.Model):
+    """预先计算好的 AI 选品推荐快照，由定时任务写入，看板和导出只读取快照"""
+    generated_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="生成时间")
+    product_count = models.IntegerField(default=0, verbose_name="参与评分商品数")
+    items = models.JSONField(default=list, verbose_name="推荐商品")
+
+    class Meta:
+        verbose_name = "选品推荐快照"
+        verbose_name_plural = "选品推荐快照"
+        ordering = ['-generated_at']
+
+    def __str__(self):
+        return f"选品快照 {self.generated_at:%Y-%m-%d %H:%M}"
+
+
+from django.contrib import admin
+
+admin.site.register(MarketTrend)
+admin.site.register(SelectionSnapshot)
@@ -1,8 +1,39 @@
 # ai_selector/selector_service.py
 
 import datetime
+import hashlib
 import random
+from collections import defaultdict
+import numpy as np
+from django.db import transaction
+from django.db.models import Exists, Q
+from django.utils import timezone
+from core_ecommerce.catalog import bump_catalog_version
 from core_ecommerce.models import Product
+from .models import MarketTrend, SelectionSnapshot
+
+# 模拟市场趋势数据（从爬虫/数据源获取的），MarketTrend 表中的记录会覆盖这里的默认值
+DEFAULT_MARKET_TRENDS = {
+    "母婴玩具": {"growth": 0.15, "competition": 0.4},
+    "日式家居": {"growth": 0.08, "competition": 0.6},
+    "电子产品": {"growth": 0.20, "competition": 0.8},
+}
+# 未收录趋势数据的品类使用的默认值
+DEFAULT_TREND = {"growth": 0.05, "competition": 0.7}
+# 每条 UPDATE 语句最多更新的商品数（IN 列表长度，兼顾旧版 SQLite 的 999 个参数上限）
+SCORE_WRITE_CHUNK_SIZE = 900
+# 增量评分每批读取的待评分商品数
+DIRTY_SCAN_CHUNK_SIZE = 2000
+# 清除待评分标记的条件 UPDATE 每条语句覆盖的商品数（每个商品 4 个参数）
+DIRTY_CLEAR_CHUNK_SIZE = 200
+# 推荐快照保存的商品数（导出最多 50 个，看板展示前 10 个）
+SNAPSHOT_SIZE = 50
+# 超过该时长（定时任务间隔的两倍）未刷新的快照在页面上标记为过期
+SNAPSHOT_STALE_AFTER = datetime.timedelta(minutes=30)
+# 保留的历史快照数
+SNAPSHOT_HISTORY = 20
+SNAPSHOT_FIELDS = ['id', 'name', 'sku', 'category', 'price', 'potential_score',
+                   'selection_reason', 'rating', 'sales_count', 'stock']
 
 class AISelectionService:
     """
@@ -11,46 +42,174 @@ class AISelectionService:
     """
     
     def __init__(self):
-        # 模拟市场趋势数据（从爬虫/数据源获取的）
-        self.market_trends = {
-            "母婴玩具": {"growth": 0.15, "competition": 0.4},
-            "日式家居": {"growth": 0.08, "competition": 0.6},
-            "电子产品": {"growth": 0.20, "competition": 0.8},
-        }
+        self.market_trends = {k: dict(v) for k, v in DEFAULT_MARKET_TRENDS.items()}
+        # 品类趋势版本号，参与评分输入指纹；默认趋势为版本 0
+        self.trend_versions = {}
+        for trend in MarketTrend.objects.all():
+            self.market_trends[trend.category] = {"growth": trend.growth, "competition": trend.competition}
+            self.trend_versions[trend.category] = trend.version
+
+    def update_market_trend(self, category, growth, competition):
+        """更新品类趋势：版本号递增，并只把该品类的商品标记为待重新评分"""
+        trend, created = MarketTrend.objects.get_or_create(
+            category=category, defaults={'growth': growth, 'competition': competition},
+        )
+        if not created:
+            trend.growth = growth
+            trend.competition = competition
+            trend.save()
+        self.market_trends[category] = {"growth": growth, "competition": competition}
+        self.trend_versions[category] = trend.version
+        return trend
+
+    def input_fingerprint(self, category, price, stock, sales_count):
+        """评分输入指纹：品类趋势（含版本）+ 价格、库存、销量"""
+        trend = self.market_trends.get(category, DEFAULT_TREND)
+        raw = (
+            f'{category}|{self.trend_versions.get(category, 0)}|{trend["growth"]}|{trend["competition"]}'
+            f'|{price}|{stock}|{sales_count}'
+        )
+        return hashlib.blake2b(raw.encode('utf-8'), digest_size=8).hexdigest()
+
+    def _reason_for(self, category, trend, score):
+        """根据评分生成推荐理由"""
+        if score < 0.3:
+            return f"【{category}】市场竞争过于激烈，虽然有增长，但利润空间受限，建议谨慎。"
+        return f"基于市场分析，该商品所属【{category}】品类增长率达 {trend['growth']*100:.1f}%，竞争度相对较低。AI 预测潜力高，建议重点采购。"
 
     def _get_score_reason(self, product_name, category):
         """根据趋势模拟生成潜力评分和理由"""
-        trend = self.market_trends.get(category, {"growth": 0.05, "competition": 0.7})
+        trend = self.market_trends.get(category, DEFAULT_TREND)
         
         # 潜力评分 = 增长率 * 0.6 + (1 - 竞争度) * 0.4 + 随机波动
         score = (trend["growth"] * 0.6) + ((1 - trend["competition"]) * 0.4) + (random.random() * 0.1)
         score = round(score, 2)
-        
-        reason = f"基于市场分析，该商品所属【{category}】品类增长率达 {trend['growth']*100:.1f}%，竞争度相对较低。AI 预测潜力高，建议重点采购。"
-        
-        if score < 0.3:
-            reason = f"【{category}】市场竞争过于激烈，虽然有增长，但利润空间受限，建议谨慎。"
-            
-        return score, reason
+        return score, self._reason_for(category, trend, score)
+
+    def score_catalog(self, ids, categories, rng=None):
+        """向量化评分：按品类查表得到基础分，一次 NumPy 运算算出整批商品的分数。
+
+        ids/categories 为等长序列，返回 (scores, reasons)。
+        """
+        rng = rng or np.random.default_rng()
+        uniques, category_idx = np.unique(np.asarray(categories, dtype=object), return_inverse=True)
+        trends = [self.market_trends.get(c, DEFAULT_TREND) for c in uniques]
+        growth = np.array([t["growth"] for t in trends], dtype=np.float64)
+        competition = np.array([t["competition"] for t in trends], dtype=np.float64)
+
+        # 潜力评分 = 增长率 * 0.6 + (1 - 竞争度) * 0.4 + 随机波动
+        base = growth * 0.6 + (1 - competition) * 0.4
+        scores = np.round(base[category_idx] + rng.random(len(ids)) * 0.1, 2)
+
+        # 理由只取决于品类和是否低于 0.3，每个品类预先生成两种文案
+        reason_table = [
+            (self._reason_for(c, t, 1.0), self._reason_for(c, t, 0.0))
+            for c, t in zip(uniques, trends)
+        ]
+        low = scores < 0.3
+        reasons = [reason_table[c][int(l)] for c, l in zip(category_idx.tolist(), low.tolist())]
+        return scores, reasons
+
+    def _write_scores(self, ids, scores, reasons, chunk_size=SCORE_WRITE_CHUNK_SIZE):
+        """批量写回，只更新 potential_score 和 selection_reason 两列。
+
+        评分保留两位小数、理由只取决于品类，全目录只有几十种 (评分, 理由) 组合，
+        按组合分组后用 UPDATE ... WHERE id IN (...) 写入，比 bulk_update 的逐行 CASE WHEN 快一个数量级。
+        """
+        groups = defaultdict(list)
+        for pk, score, reason in zip(ids, scores.tolist(), reasons):
+            groups[(score, reason)].append(pk)
+        for (score, reason), pks in groups.items():
+            for start in range(0, len(pks), chunk_size):
+                Product.objects.filter(id__in=pks[start:start + chunk_size]).update(
+                    potential_score=score, selection_reason=reason, score_dirty=False, score_fingerprint='',
+                )
+        bump_catalog_version()
+
+    def rescore_dirty_products(self, chunk_size=DIRTY_SCAN_CHUNK_SIZE):
+        """增量评分：只处理被标记为待评分的商品，代价与变更量成正比而不是与目录大小成正比。
+
+        输入指纹未变化的商品（例如只改了名称）只清除标记，不重新评分。
+        返回 {'checked': 检查的商品数, 'rescored': 重新评分的商品数}。
+        """
+        checked = rescored = 0
+        last_id = 0
+        while True:
+            rows = list(
+                Product.objects.filter(score_dirty=True, id__gt=last_id).order_by('id')
+                .values_list('id', 'category', 'price', 'stock', 'sales_count', 'score_fingerprint')[:chunk_size]
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            checked += len(rows)
+
+            changed = []
+            for pk, category, price, stock, sales_count, old_fingerprint in rows:
+                fingerprint = self.input_fingerprint(category, price, stock, sales_count)
+                if fingerprint != old_fingerprint:
+                    changed.append((pk, category, fingerprint))
+
+            with transaction.atomic():
+                if changed:
+                    ids, categories, fingerprints = (list(col) for col in zip(*changed))
+                    scores, reasons = self.score_catalog(ids, categories)
+                    Product.objects.bulk_update([
+                        Product(id=pk, potential_score=score, selection_reason=reason, score_fingerprint=fingerprint)
+                        for pk, score, reason, fingerprint in zip(ids, scores.tolist(), reasons, fingerprints)
+                    ], ['potential_score', 'selection_reason', 'score_fingerprint'], batch_size=500)
+                    rescored += len(changed)
+                    bump_catalog_version()
+                self._clear_dirty([row[:5] for row in rows])
+        return {'checked': checked, 'rescored': rescored}
+
+    def _clear_dirty(self, rows):
+        """清除待评分标记，只针对评分输入与读取时一致的商品。
+
+        rows 为 (id, 品类, 价格, 库存, 销量)。读取之后被再次修改的商品（输入变化，或品类趋势的
+        版本已递增）不满足条件，保持待评分，由下一轮处理，不会丢失读写之间的并发修改。
+        """
+        for start in range(0, len(rows), DIRTY_CLEAR_CHUNK_SIZE):
+            by_category = defaultdict(Q)
+            for pk, category, price, stock, sales_count in rows[start:start + DIRTY_CLEAR_CHUNK_SIZE]:
+                by_category[category] |= Q(id=pk, price=price, stock=stock, sales_count=sales_count)
+            condition = Q()
+            for category, matches in by_category.items():
+                trend_changed = MarketTrend.objects.filter(
+                    category=category, version__gt=self.trend_versions.get(category, 0),
+                )
+                condition |= Q(category=category) & matches & ~Exists(trend_changed)
+            Product.objects.filter(condition, score_dirty=True).update(score_dirty=False)
+
+    def get_top_recommendations(self, limit=10):
+        return Product.objects.all().order_by('-potential_score')[:limit]
 
     def generate_selection_recommendations(self):
         """
-        生成选品推荐清单。
+        生成选品推荐清单（全量重新评分）。
         定期输出商品潜力评分，生成推荐清单。
+        只读取 id 和分类两列，整批向量化评分后分组批量写回。
+        全量评分不写入指纹，之后再被标记的商品会在增量评分时重新计算。
         """
-        products = Product.objects.all()
-        
-        for product in products:
-            # 更新潜力评分和理由
-            score, reason = self._get_score_reason(product.name, product.category)
-            product.potential_score = score
-            product.selection_reason = reason
-            product.save()
+        rows = list(Product.objects.values_list('id', 'category'))
+        if rows:
+            ids, categories = (list(col) for col in zip(*rows))
+            scores, reasons = self.score_catalog(ids, categories)
+            self._write_scores(ids, scores, reasons)
             
         # 返回评分最高的 TOP 10 作为推荐
-        recommended_products = Product.objects.all().order_by('-potential_score')[:10]
-        
-        return recommended_products
+        return self.get_top_recommendations()
+
+    def save_snapshot(self, size=SNAPSHOT_SIZE):
+        """把当前评分最高的商品写入推荐快照，只保留最近 SNAPSHOT_HISTORY 份"""
+        items = []
+        for row in Product.objects.order_by('-potential_score', '-id').values(*SNAPSHOT_FIELDS)[:size]:
+            row['price'] = float(row['price'])
+            items.append(row)
+        snapshot = SelectionSnapshot.objects.create(product_count=Product.objects.count(), items=items)
+        expired = SelectionSnapshot.objects.values_list('id', flat=True)[SNAPSHOT_HISTORY:]
+        SelectionSnapshot.objects.filter(id__in=list(expired)).delete()
+        return snapshot
 
     def get_market_trend_report(self):
         """查看市场趋势数据和可视化报告"""
@@ -70,6 +229,18 @@ class AISelectionService:
         }
         return report_data
 
+def get_latest_snapshot():
+    """读取最新的推荐快照，尚未生成时返回 None。
+
+    直接查询数据库（按 generated_at 索引取一行）：定时任务在 worker 进程中写入新快照，
+    Web 进程不缓存，每次都能读到最新一份。
+    """
+    return SelectionSnapshot.objects.first()
+
+
+def snapshot_is_stale(snapshot, now=None):
+    return snapshot is None or (now or timezone.now()) - snapshot.generated_at > SNAPSHOT_STALE_AFTER
+
 # 确保在运行 Demo 前，数据库中有一些初始商品数据
 def initialize_products():
     """初始化商品数据"""
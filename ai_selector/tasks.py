@@ -3,12 +3,24 @@ from .selector_service import AISelectionService
 
 
 @shared_task
-def run_ai_selection():
-    """Run the AI selection service and return number of recommended products."""
+def run_ai_selection(full=False):
+    """Run the AI selection service and return number of recommended products.
+
+    By default only products whose scoring inputs changed are rescored;
+    pass full=True to rescore the whole catalog. The top-N snapshot read
+    by the dashboard and export views is refreshed afterwards.
+    """
     service = AISelectionService()
-    recommended = service.generate_selection_recommendations()
+    if full:
+        recommended = service.generate_selection_recommendations()
+        stats = {}
+    else:
+        stats = service.rescore_dirty_products()
+        recommended = service.get_top_recommendations()
+    snapshot = service.save_snapshot()
+    stats['snapshot_id'] = snapshot.id
     # Optionally, return ids or count
     try:
-        return {'count': len(list(recommended))}
+        return {'count': len(list(recommended)), **stats}
     except Exception:
-        return {'count': 0}
+        return {'count': 0, **stats}
@@ -0,0 +1,92 @@
+from unittest import mock
+
+import numpy as np
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from core_ecommerce.models import Product
+from ai_selector.selector_service import AISelectionService
+
+
+class VectorizedScoringTest(TestCase):
+    def test_score_catalog_matches_formula(self):
+        service = AISelectionService()
+        categories = ['母婴玩具', '电子产品', '未知品类', '母婴玩具']
+        scores, reasons = service.score_catalog([1, 2, 3, 4], categories, rng=np.random.default_rng(0))
+        for category, score, reason in zip(categories, scores, reasons):
+            trend = service.market_trends.get(category, {"growth": 0.05, "competition": 0.7})
+            base = trend['growth'] * 0.6 + (1 - trend['competition']) * 0.4
+            self.assertGreaterEqual(score, round(base, 2))
+            self.assertLessEqual(score, round(base + 0.1, 2))
+            self.assertEqual(reason, service._reason_for(category, trend, score))
+        # 未知品类基础分 0.15，必然低于 0.3，给出谨慎建议
+        self.assertIn('建议谨慎', reasons[2])
+
+    def test_generate_recommendations_writes_in_bulk(self):
+        categories = ['母婴玩具', '电子产品', '日式家居']
+        Product.objects.bulk_create([
+            Product(name=f'P{i}', sku=f'P{i}', price=10, category=categories[i % 3], selection_reason='old')
+            for i in range(300)
+        ])
+        with CaptureQueriesContext(connection) as ctx:
+            top = list(AISelectionService().generate_selection_recommendations())
+        # 查询数只与 (评分, 理由) 组合数有关，与商品数无关
+        self.assertLess(len(ctx.captured_queries), 40)
+        self.assertEqual(len(top), 10)
+        self.assertFalse(Product.objects.filter(selection_reason='old').exists())
+        self.assertEqual(top[0].potential_score, Product.objects.order_by('-potential_score')[0].potential_score)
+
+
+class IncrementalScoringTest(TestCase):
+    def setUp(self):
+        self.toys = Product.objects.create(name='T1', sku='T1', price=10, stock=5, category='母婴玩具')
+        self.phone = Product.objects.create(name='E1', sku='E1', price=99, stock=5, category='电子产品')
+
+    def test_only_changed_inputs_are_rescored(self):
+        service = AISelectionService()
+        self.assertEqual(service.rescore_dirty_products(), {'checked': 2, 'rescored': 2})
+        self.assertFalse(Product.objects.filter(score_dirty=True).exists())
+        # 没有变更时不做任何事
+        self.assertEqual(service.rescore_dirty_products(), {'checked': 0, 'rescored': 0})
+
+        # 只改名称：被标记但指纹不变，不重新评分
+        self.toys.refresh_from_db()
+        self.toys.name = 'T1 新名称'
+        self.toys.save()
+        self.assertEqual(service.rescore_dirty_products(), {'checked': 1, 'rescored': 0})
+
+        # 改库存：指纹变化，重新评分
+        self.phone.stock = 1
+        self.phone.save(update_fields=['stock'])
+        self.assertEqual(service.rescore_dirty_products(), {'checked': 1, 'rescored': 1})
+
+    def test_trend_update_marks_only_its_category(self):
+        service = AISelectionService()
+        service.rescore_dirty_products()
+        trend = service.update_market_trend('电子产品', growth=0.5, competition=0.1)
+        self.assertEqual(trend.version, 1)
+        self.assertEqual(list(Product.objects.filter(score_dirty=True).values_list('sku', flat=True)), ['E1'])
+
+        # 新的服务实例从表中读取趋势，评分使用新的增长率
+        self.assertEqual(AISelectionService().rescore_dirty_products(), {'checked': 1, 'rescored': 1})
+        self.phone.refresh_from_db()
+        self.assertGreaterEqual(self.phone.potential_score, 0.5 * 0.6 + 0.9 * 0.4 - 0.005)
+
+        trend = service.update_market_trend('电子产品', growth=0.5, competition=0.1)
+        self.assertEqual(trend.version, 2)
+
+    def test_writes_during_scoring_keep_the_dirty_flag(self):
+        service = AISelectionService()
+        score_catalog = service.score_catalog
+
+        def concurrent_writes(ids, categories, rng=None):
+            # 读取待评分商品之后、写回之前，其他请求修改了库存和品类趋势
+            Product.objects.filter(sku='T1').update(stock=1, score_dirty=True)
+            AISelectionService().update_market_trend('电子产品', growth=0.5, competition=0.1)
+            return score_catalog(ids, categories, rng)
+
+        with mock.patch.object(service, 'score_catalog', side_effect=concurrent_writes):
+            self.assertEqual(service.rescore_dirty_products(), {'checked': 2, 'rescored': 2})
+        self.assertEqual(sorted(Product.objects.filter(score_dirty=True).values_list('sku', flat=True)), ['E1', 'T1'])
+        self.assertEqual(AISelectionService().rescore_dirty_products(), {'checked': 2, 'rescored': 2})
+        self.assertFalse(Product.objects.filter(score_dirty=True).exists())
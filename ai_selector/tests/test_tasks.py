@@ -1,5 +1,7 @@
 from django.test import TestCase
 from core_ecommerce.models import Product
+from ai_selector.models import SelectionSnapshot
+from ai_selector.selector_service import AISelectionService, get_latest_snapshot
 from ai_selector.tasks import run_ai_selection
 
 class AISelectionTaskTest(TestCase):
@@ -17,3 +19,19 @@ class AISelectionTaskTest(TestCase):
         # check that products have potential_score set
         p1 = Product.objects.get(sku='P1')
         self.assertIsNotNone(p1.potential_score)
+
+    def test_run_ai_selection_writes_snapshot(self):
+        result = run_ai_selection()
+        snapshot = get_latest_snapshot()
+        self.assertEqual(result['snapshot_id'], snapshot.id)
+        self.assertEqual([item['sku'] for item in snapshot.items],
+                         list(Product.objects.order_by('-potential_score', '-id').values_list('sku', flat=True)))
+        self.assertEqual(snapshot.product_count, 2)
+
+    def test_latest_snapshot_is_read_fresh(self):
+        first = AISelectionService().save_snapshot()
+        with self.assertNumQueries(1):
+            self.assertEqual(get_latest_snapshot().id, first.id)
+        # 其他进程（Celery worker）写入的快照立即可见
+        newer = SelectionSnapshot.objects.create(product_count=0, items=[])
+        self.assertEqual(get_latest_snapshot().id, newer.id)
@@ -0,0 +1,49 @@
+import json
+from datetime import timedelta
+from unittest import mock
+from django.db import connection
+from django.http import HttpResponse
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from core_ecommerce.models import Product
+from ai_selector.models import SelectionSnapshot
+from ai_selector.selector_service import AISelectionService
+
+
+class SelectionSnapshotViewTest(TestCase):
+    def setUp(self):
+        Product.objects.create(name='P1', sku='P1', price=10, stock=10, category='母婴玩具', potential_score=0.9)
+        Product.objects.create(name='P2', sku='P2', price=20, stock=5, category='电子产品', potential_score=0.4)
+
+    def test_export_reads_snapshot_without_rescoring(self):
+        AISelectionService().save_snapshot()
+        Product.objects.filter(sku='P1').update(potential_score=0.1)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('export_analysis_report'), {'format': 'json'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE')])
+        data = json.loads(response.content)
+        # 导出的是快照中的评分，而不是之后被修改的当前评分
+        self.assertEqual([p['sku'] for p in data['recommended_products']], ['P1', 'P2'])
+        self.assertEqual(data['recommended_products'][0]['potential_score'], 0.9)
+        self.assertIn('snapshot_time', data)
+
+    @mock.patch('ai_selector.views.run_ai_selection.delay')
+    def test_export_without_snapshot_enqueues_task(self, delay):
+        response = self.client.get(reverse('export_analysis_report'), {'format': 'json'})
+        self.assertEqual(response.status_code, 503)
+        delay.assert_called_once_with()
+
+    @mock.patch('ai_selector.views.render', return_value=HttpResponse())
+    def test_dashboard_shows_snapshot_freshness(self, render):
+        snapshot = AISelectionService().save_snapshot()
+        SelectionSnapshot.objects.filter(id=snapshot.id).update(generated_at=timezone.now() - timedelta(hours=2))
+        self.client.get(reverse('ai_selection_dashboard'))
+        context = render.call_args[0][2]
+        self.assertEqual(context['snapshot'].id, snapshot.id)
+        self.assertTrue(context['snapshot_stale'])
+        self.assertEqual([p['sku'] for p in context['recommended_products']], ['P1', 'P2'])
+        # 页面访问不再重新评分
+        self.assertEqual(Product.objects.get(sku='P2').potential_score, 0.4)
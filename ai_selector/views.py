@@ -3,31 +3,45 @@
 from django.shortcuts import render
 from django.http import HttpResponse, JsonResponse
 from django.views.decorators.http import require_http_methods
-from .selector_service import AISelectionService, initialize_products
+from .selector_service import AISelectionService, get_latest_snapshot, snapshot_is_stale
+from .tasks import run_ai_selection
 import json
+import logging
 import csv
 from datetime import datetime
 from core_ecommerce.models import Product
 
+logger = logging.getLogger(__name__)
+
+
+def _request_snapshot():
+    """快照尚未生成时投递一次后台评分任务，页面本身不做评分"""
+    try:
+        run_ai_selection.delay()
+    except Exception:
+        logger.exception('Failed to enqueue AI selection task')
+
 
 def ai_selection_dashboard(request):
     """
     AI 选品模块主界面（运营人员）。
     展示 KPI 仪表盘和 AI 推荐清单。
+    推荐清单读取定时任务写入的快照，页面访问不会重新评分。
     """
-    # 确保有初始数据
-    initialize_products() 
-    
     service = AISelectionService()
     
-    # 1. 运行 AI 选品逻辑，更新评分并获取推荐清单
-    recommended_products = service.generate_selection_recommendations()
+    # 1. 读取最新的推荐快照
+    snapshot = get_latest_snapshot()
+    if snapshot is None:
+        _request_snapshot()
     
     # 2. 获取市场趋势报表
     report = service.get_market_trend_report()
     
     context = {
-        'recommended_products': recommended_products,
+        'recommended_products': snapshot.items[:10] if snapshot else [],
+        'snapshot': snapshot,
+        'snapshot_stale': snapshot_is_stale(snapshot),
         'report': report,
         'page_title': 'AI 选品核心看板'
     }
@@ -65,26 +79,30 @@ def export_analysis_report(request):
         except Product.DoesNotExist:
             return JsonResponse({'error': 'Product not found'}, status=404)
     else:
-        # 导出所有推荐商品
-        recommended_products = service.generate_selection_recommendations()
+        # 导出推荐快照中的商品（快照最多 50 个）
+        snapshot = get_latest_snapshot()
+        if snapshot is None:
+            _request_snapshot()
+            return JsonResponse({'error': 'Selection snapshot not ready yet, please retry later'}, status=503)
         report = service.get_market_trend_report()
         
         data = {
             'export_time': datetime.now().isoformat(),
-            'total_products': len(recommended_products),
+            'snapshot_time': snapshot.generated_at.isoformat(),
+            'total_products': len(snapshot.items),
             'recommended_products': [
                 {
-                    'id': p.id,
-                    'name': p.name,
-                    'sku': p.sku,
-                    'category': p.category,
-                    'price': float(p.price),
-                    'potential_score': p.potential_score,
-                    'selection_reason': p.selection_reason,
-                    'rating': p.rating,
-                    'sales_count': p.sales_count,
+                    'id': p['id'],
+                    'name': p['name'],
+                    'sku': p['sku'],
+                    'category': p['category'],
+                    'price': p['price'],
+                    'potential_score': p['potential_score'],
+                    'selection_reason': p['selection_reason'],
+                    'rating': p['rating'],
+                    'sales_count': p['sales_count'],
                 }
-                for p in recommended_products[:50]  # 限制最多50个
+                for p in snapshot.items
             ],
             'market_trend': report,
         }
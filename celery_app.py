@@ -19,6 +19,46 @@ app.conf.beat_schedule = {
         'task': 'ai_selector.tasks.run_ai_selection',
         'schedule': 60 * 15,
     },
+    'resume-stalled-import-jobs-every-5-min': {
+        'task': 'core_ecommerce.tasks.resume_stalled_import_jobs',
+        'schedule': 60 * 5,
+    },
+    'drain-behavior-events-every-10-sec': {
+        'task': 'core_ecommerce.tasks.drain_behavior_events',
+        'schedule': 10,
+    },
+    'release-expired-reservations-every-minute': {
+        'task': 'core_ecommerce.tasks.release_expired_reservations',
+        'schedule': 60,
+    },
+    'compact-counters-every-5-min': {
+        'task': 'core_ecommerce.tasks.compact_counters',
+        'schedule': 60 * 5,
+    },
+    'reconcile-sales-rollups-every-hour': {
+        'task': 'core_ecommerce.tasks.reconcile_sales_rollups',
+        'schedule': 60 * 60,
+    },
+    'rebuild-related-products-every-day': {
+        'task': 'core_ecommerce.tasks.rebuild_related_products',
+        'schedule': 60 * 60 * 24,
+    },
+    'rebuild-user-recommendations-every-day': {
+        'task': 'core_ecommerce.tasks.rebuild_user_recommendations',
+        'schedule': 60 * 60 * 24,
+    },
+    'build-product-embeddings-every-day': {
+        'task': 'core_ecommerce.tasks.build_product_embeddings',
+        'schedule': 60 * 60 * 24,
+    },
+    'compact-behavior-events-every-day': {
+        'task': 'core_ecommerce.tasks.compact_behavior_events',
+        'schedule': 60 * 60 * 24,
+    },
+    'purge-abandoned-carts-every-day': {
+        'task': 'core_ecommerce.tasks.purge_abandoned_carts',
+        'schedule': 60 * 60 * 24,
+    },
 }
 
 
@@ -0,0 +1,265 @@
+# core_ecommerce/activity_feed.py
+
+"""实时行为动态（看板用）。
+
+行为事件进入缓冲区的同时发布到动态流（只保留最近 FEED_SIZE 条），每条带递增的事件 ID。
+看板通过 SSE 或长轮询接收新事件，断线后凭最后收到的 ID
+（SSE 的 Last-Event-ID 请求头 / 长轮询的 after 参数）续传，不再反复查询 UserBehavior 表。
+
+动态流跟随行为事件缓冲区的后端（settings.BEHAVIOR_EVENT_BUFFER）：
+- locmem：进程内环形缓冲区，只包含本进程接收的事件，只适用于单进程部署；
+  进程重启后 ID 从 1 重新计数，客户端携带的 ID 大于当前最大 ID 时从头返回；
+- redis：Redis Stream，所有进程发布到同一个流，ID 由 Lua 脚本原子递增，
+  任一进程的订阅者都能看到全部事件，续传 ID 在各进程间一致。
+
+SSE 和长轮询在等待期间占用一个同步 worker 线程：每个进程同时保持的连接数不超过
+MAX_OPEN_STREAMS（超出返回 503），SSE 每 STREAM_DURATION 秒断开一次，由客户端自动重连续传。
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from itertools import islice
+
+from django.conf import settings
+
+FEED_SIZE = 1000
+MAX_BATCH = 200
+# 长轮询最长等待时间；SSE 连接保持时间（到期后客户端按 retry 自动重连续传）与心跳间隔
+LONG_POLL_TIMEOUT = 20
+STREAM_DURATION = 60
+HEARTBEAT_INTERVAL = 15
+RETRY_MS = 3000
+# 每个进程同时保持的 SSE/长轮询连接数上限
+MAX_OPEN_STREAMS = 8
+
+
+def feed_item(behavior_type, metadata, user_id=None, product_id=None, created_at=None):
+    """动态条目：字段与 UserBehaviorAPI.get 的返回一致；事件 ID（id）在发布时分配"""
+    return {
+        'user_id': user_id,
+        'product_id': product_id,
+        'event': behavior_type,
+        'meta': metadata,
+        'timestamp': created_at,
+    }
+
+
+class ActivityRing:
+    def __init__(self, size=FEED_SIZE):
+        self._items = deque(maxlen=size)
+        self._last_id = 0
+        self._changed = threading.Condition()
+
+    @property
+    def last_id(self):
+        with self._changed:
+            return self._last_id
+
+    def publish(self, items):
+        if not items:
+            return
+        with self._changed:
+            for item in items:
+                self._last_id += 1
+                self._items.append({**item, 'id': self._last_id})
+            self._changed.notify_all()
+
+    def _read(self, after, limit):
+        if after > self._last_id:
+            after = 0
+        if not self._items:
+            return []
+        # ID 连续递增：直接按偏移定位，不扫描整个缓冲区
+        start = max(after - self._items[0]['id'] + 1, 0)
+        return list(islice(self._items, start, start + limit))
+
+    def read(self, after=0, limit=MAX_BATCH):
+        """ID 大于 after 的事件（最多 limit 条）；after 早于缓冲区时从最早的一条开始"""
+        with self._changed:
+            return self._read(after, limit)
+
+    def wait(self, after=0, timeout=LONG_POLL_TIMEOUT, limit=MAX_BATCH):
+        """等待 ID 大于 after 的事件，最多等待 timeout 秒，超时返回空列表"""
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while True:
+                items = self._read(after, limit)
+                remaining = deadline - time.monotonic()
+                if items or remaining <= 0:
+                    return items
+                self._changed.wait(remaining)
+
+    def clear(self):
+        with self._changed:
+            self._items.clear()
+            self._last_id = 0
+
+
+class RedisActivityFeed:
+    """Redis Stream：条目 ID 为 "<事件 ID>-0"，事件 ID 计数器与写入在同一个 Lua 脚本中完成"""
+
+    PUBLISH_SCRIPT = """
+    local count = #ARGV - 1
+    local last = redis.call('INCRBY', KEYS[1], count)
+    for i = 1, count do
+        redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[1], (last - count + i) .. '-0', 'item', ARGV[i + 1])
+    end
+    return last
+    """
+
+    def __init__(self, size=FEED_SIZE, location=None, key_prefix='behavior_events'):
+        import redis
+
+        # 不设读超时：XREAD BLOCK 的等待时间由 wait() 的 timeout 控制
+        self.client = redis.Redis.from_url(location or settings.CELERY_BROKER_URL, socket_connect_timeout=0.1)
+        self.size = size
+        self.counter_key = f'{key_prefix}:feed:last_id'
+        self.stream_key = f'{key_prefix}:feed'
+        self._publish = self.client.register_script(self.PUBLISH_SCRIPT)
+
+    @property
+    def last_id(self):
+        return int(self.client.get(self.counter_key) or 0)
+
+    def publish(self, items):
+        if not items:
+            return
+        self._publish(keys=[self.counter_key, self.stream_key],
+                      args=[self.size, *[json.dumps(item, ensure_ascii=False) for item in items]])
+
+    def _start(self, after):
+        # 计数器被清空（ID 重新计数）后客户端的 ID 超前：从头返回
+        return 0 if after > self.last_id else after
+
+    def _items(self, entries):
+        return [{**json.loads(fields[b'item']), 'id': int(entry_id.split(b'-')[0])} for entry_id, fields in entries]
+
+    def read(self, after=0, limit=MAX_BATCH):
+        after = self._start(after)
+        return self._items(self.client.xrange(self.stream_key, min=f'{after + 1}-0', count=limit))
+
+    def wait(self, after=0, timeout=LONG_POLL_TIMEOUT, limit=MAX_BATCH):
+        after = self._start(after)
+        if timeout <= 0:
+            return self.read(after, limit)
+        # 已有 after 之后的条目时 XREAD 立即返回，否则阻塞等待新条目
+        result = self.client.xread({self.stream_key: f'{after}-0'}, count=limit, block=max(int(timeout * 1000), 1))
+        return self._items(result[0][1]) if result else []
+
+    def clear(self):
+        self.client.delete(self.counter_key, self.stream_key)
+
+
+class StreamSlots:
+    """限制同时保持的长连接数：SSE/长轮询在等待期间占用一个同步 worker 线程"""
+
+    def __init__(self, limit=MAX_OPEN_STREAMS):
+        self.limit = limit
+        self._active = 0
+        self._mutex = threading.Lock()
+
+    @property
+    def active(self):
+        with self._mutex:
+            return self._active
+
+    def acquire(self):
+        with self._mutex:
+            if self._active >= self.limit:
+                return False
+            self._active += 1
+            return True
+
+    def release(self):
+        with self._mutex:
+            self._active = max(self._active - 1, 0)
+
+
+class _SlotStream:
+    """SSE 响应体：响应关闭时（包括生成器尚未开始迭代就断开）归还连接名额"""
+
+    def __init__(self, stream, slots):
+        self._stream = stream
+        self._slots = slots
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._stream)
+
+    def close(self):
+        self._stream.close()
+        if self._slots is not None:
+            self._slots.release()
+            self._slots = None
+
+
+activity_ring = ActivityRing()
+stream_slots = StreamSlots()
+_feed = None
+_feed_lock = threading.Lock()
+
+
+def get_activity_feed():
+    """当前后端的动态流：locmem 为进程内的 activity_ring，redis 为共享的 Redis Stream"""
+    global _feed
+    if _feed is None:
+        with _feed_lock:
+            if _feed is None:
+                config = getattr(settings, 'BEHAVIOR_EVENT_BUFFER', {})
+                if config.get('BACKEND', 'locmem') == 'redis':
+                    _feed = RedisActivityFeed(location=config.get('LOCATION'),
+                                              key_prefix=config.get('KEY_PREFIX', 'behavior_events'))
+                else:
+                    _feed = activity_ring
+    return _feed
+
+
+def reset_activity_feed():
+    """丢弃当前实例（修改 settings.BEHAVIOR_EVENT_BUFFER 后调用）"""
+    global _feed
+    _feed = None
+
+
+def publish_events(events):
+    """发布已进入缓冲区的行为事件（events.normalize_events 的输出）"""
+    get_activity_feed().publish([
+        feed_item(event['behavior_type'], event['metadata'], user_id=event['user_id'],
+                  product_id=event['product_id'], created_at=event['created_at'])
+        for event in events
+    ])
+
+
+def parse_event_id(value):
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def sse_stream(after, duration=STREAM_DURATION, heartbeat=HEARTBEAT_INTERVAL, ring=None):
+    """SSE 消息生成器：先补发 after 之后的事件，再持续推送新事件，空闲时发送注释心跳"""
+    ring = ring or get_activity_feed()
+    deadline = time.monotonic() + duration
+    yield f'retry: {RETRY_MS}\n\n'
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        items = ring.wait(after, timeout=min(heartbeat, remaining))
+        if not items:
+            yield ': keep-alive\n\n'
+            continue
+        for item in items:
+            yield f'id: {item["id"]}\nevent: behavior\ndata: {json.dumps(item, ensure_ascii=False)}\n\n'
+        after = items[-1]['id']
+
+
+def open_sse_stream(after):
+    """占用一个连接名额并返回 SSE 响应体；名额已满时返回 None"""
+    if not stream_slots.acquire():
+        return None
+    return _SlotStream(sse_stream(after), stream_slots)
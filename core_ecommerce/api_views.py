@@ -1,23 +1,47 @@
 from rest_framework import generics
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAdminUser, AllowAny
 from rest_framework.parsers import MultiPartParser, FormParser
-from .models import Product, ProductReview, Order, OrderItem, Cart, CartItem, ShippingAddress, InventoryAlert, RestockSuggestion, UserBehavior
-from .serializers import ProductSerializer
+from .models import Product, ProductReview, Order, OrderItem, Cart, CartItem, ShippingAddress, InventoryAlert, RestockSuggestion, UserBehavior, ProductImportJob
+from .serializers import ProductSerializer, product_list_values, serialize_product_rows
+from .importer import ProductCSVImporter, CSVImportError, import_job_progress
+from .search import search_filter, search_product_ids
+from .rollups import sales_dashboard, sales_trend
+from .checkout import place_order, InvalidOrderItems, ProductNotFound, InsufficientStock
+from .reservations import hold_cart_quantity, release_cart_reservation, stock_levels
+from . import counters
+from .catalog import catalog_conditional
+from .related import related_products
+from .recommendations import recommended_products
+from .embeddings import similar_product_ids
+from .activity_feed import (
+    LONG_POLL_TIMEOUT, RETRY_MS, feed_item, get_activity_feed, open_sse_stream, parse_event_id, stream_slots,
+)
+from .events import MAX_EVENTS_PER_REQUEST, track_events, stats as event_stats
+from .query_cache import get_query_cache, product_list_cache_key
+from .carts import get_cart_data, apply_cart_operations, CartOperationError, SESSION_CART_KEY
+from .pagination import CacheablePageNumberPagination, KeysetPagination, OptionalKeysetPaginationMixin
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from rest_framework import status
 from django.contrib.auth.models import User
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-import csv
-import io
-from django.db.models import Q, Count, Avg
+from django.urls import reverse
+import json
+import logging
+from django.db.models import Q, Count, Avg, Case, When, Value, IntegerField
+
+logger = logging.getLogger(__name__)
 
 
 class ImportProductsAPI(APIView):
     """Upload a CSV file to bulk create/update products.
 
     Expected CSV headers: name,sku,price,stock,category
+
+    文件按行流式处理并分批写入，返回逐行错误报告和吞吐量（rows/sec）。
+    传入 async=1 时只保存文件并创建后台导入任务，立即返回 202 和任务状态地址。
     """
     permission_classes = [IsAdminUser]
     parser_classes = [MultiPartParser, FormParser]
@@ -27,96 +51,166 @@ class ImportProductsAPI(APIView):
         if not file:
             return Response({'error': 'No file uploaded'}, status=status.HTTP_400_BAD_REQUEST)
 
+        run_async = request.data.get('async') or request.query_params.get('async')
+        if str(run_async).lower() in ('1', 'true', 'yes'):
+            return self.create_job(request, file)
+
         try:
-            decoded = file.read().decode('utf-8')
-            reader = csv.DictReader(io.StringIO(decoded))
-            created = 0
-            updated = 0
-            for row in reader:
-                sku = row.get('sku')
-                if not sku:
-                    continue
-                product, exists = Product.objects.get_or_create(sku=sku, defaults={
-                    'name': row.get('name', '')[:200],
-                    'price': row.get('price') or 0,
-                    'stock': int(row.get('stock') or 0),
-                    'category': row.get('category') or 'Uncategorized',
-                })
-                if exists:
-                    created += 1
-                else:
-                    # update fields
-                    product.name = row.get('name', product.name)
-                    try:
-                        product.price = float(row.get('price') or product.price)
-                    except Exception:
-                        pass
-                    try:
-                        product.stock = int(row.get('stock') or product.stock)
-                    except Exception:
-                        pass
-                    product.category = row.get('category') or product.category
-                    product.save()
-                    updated += 1
-
-            return Response({'created': created, 'updated': updated})
+            result = ProductCSVImporter().run(file)
+        except CSVImportError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response(result.as_dict())
+
+    def create_job(self, request, file):
+        from .tasks import run_product_import
+
+        job = ProductImportJob.objects.create(file=file, total_bytes=file.size, created_by=request.user)
+        try:
+            run_product_import.delay(job.id)
+        except Exception:
+            # Broker 不可用时任务保持 PENDING，由定时任务 resume_stalled_import_jobs 重新投递
+            logger.exception('Failed to enqueue product import job %s', job.id)
+        return Response({
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': reverse('api_product_import_job', args=[job.id]),
+        }, status=status.HTTP_202_ACCEPTED)
 
 
-class ProductListAPI(generics.ListCreateAPIView):
+class ImportJobStatusAPI(APIView):
+    """查询商品导入任务进度"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, job_id):
+        try:
+            job = ProductImportJob.objects.get(id=job_id)
+        except ProductImportJob.DoesNotExist:
+            return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(import_job_progress(job))
+
+
+class ProductListAPI(OptionalKeysetPaginationMixin, generics.ListCreateAPIView):
     serializer_class = ProductSerializer
     # enable server-side pagination
-    class StandardResultsSetPagination(PageNumberPagination):
+    class StandardResultsSetPagination(CacheablePageNumberPagination):
         page_size = 9
         page_size_query_param = 'page_size'
         max_page_size = 100
 
+    # ?cursor= 时使用 keyset 分页（无 OFFSET、无 COUNT）
+    class ProductKeysetPagination(KeysetPagination):
+        page_size = 9
+
     pagination_class = StandardResultsSetPagination
+    keyset_pagination_class = ProductKeysetPagination
+    orderings = ['price', '-price', 'potential_score', '-potential_score']
 
-    def get_queryset(self):
-        qs = Product.objects.all()
+    def get_list_filters(self):
+        """解析过滤/排序参数为查询实际使用的值；get_queryset 和查询缓存键都用这一份"""
         params = self.request.query_params
+        filters = {}
         q = params.get('q') or params.get('search')
         if q:
-            qs = qs.filter(Q(name__icontains=q) | Q(sku__icontains=q) | Q(category__icontains=q))
-
+            filters['q'] = q
         category = params.get('category')
         if category:
-            qs = qs.filter(category__iexact=category)
+            filters['category'] = category.lower()
+        for name in ['min_price', 'max_price']:
+            if params.get(name) is not None:
+                try:
+                    filters[name] = float(params[name])
+                except ValueError:
+                    pass
+        if params.get('ordering') in self.orderings:
+            filters['ordering'] = params['ordering']
+        return filters
 
-        min_price = params.get('min_price')
-        max_price = params.get('max_price')
-        try:
-            if min_price is not None:
-                qs = qs.filter(price__gte=float(min_price))
-            if max_price is not None:
-                qs = qs.filter(price__lte=float(max_price))
-        except Exception:
-            pass
+    def get_queryset(self):
+        qs = Product.objects.all()
+        filters = self.get_list_filters()
+        search_rank = None
+        if 'q' in filters:
+            # 走全文检索索引替代 icontains 全表扫描；命中条件是子查询、不截断，
+            # 其他过滤、排序和分页总数都覆盖全部命中商品
+            qs = qs.filter(search_filter(filters['q']))
+            if 'ordering' not in filters:
+                # 按相关度排序：前 search.DEFAULT_LIMIT 个命中按 bm25 排名，其余排在它们之后
+                ids = search_product_ids(filters['q'])
+                if ids:
+                    search_rank = Case(
+                        *[When(id=pk, then=Value(rank)) for rank, pk in enumerate(ids)],
+                        default=Value(len(ids)),
+                        output_field=IntegerField(),
+                    )
 
-        ordering = params.get('ordering')
-        allowed = ['price', '-price', 'potential_score', '-potential_score']
-        if ordering in allowed:
-            qs = qs.order_by(ordering)
+        if 'category' in filters:
+            qs = qs.in_category(filters['category'])
+        if 'min_price' in filters:
+            qs = qs.filter(price__gte=filters['min_price'])
+        if 'max_price' in filters:
+            qs = qs.filter(price__lte=filters['max_price'])
+
+        ordering = filters.get('ordering')
+        # 以 id 作为同向的次级排序，保证分页顺序稳定
+        if ordering:
+            qs = qs.order_by(ordering, '-id' if ordering.startswith('-') else 'id')
+        elif search_rank is not None:
+            qs = qs.annotate(search_rank=search_rank).order_by('search_rank', 'id')
         else:
-            qs = qs.order_by('-potential_score')
+            qs = qs.order_by('-potential_score', '-id')
 
         return qs
 
+    @catalog_conditional
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        # 相同参数组合 + 相同目录版本直接返回缓存的结果（见 query_cache.py）；
+        # 缓存里只有本页数据和分页状态，next/previous 链接按当前请求生成
+        key = product_list_cache_key(self.get_list_filters(), request.query_params)
+        results, page_state = get_query_cache().get_or_compute(key, self.list_data)
+        if page_state is None:
+            return Response(results)
+        self.paginator.restore_page(request, page_state)
+        return self.get_paginated_response(results)
+
+    def list_data(self):
+        # 只读列表走 .values() 快速序列化，输出与 ProductSerializer 相同
+        queryset = product_list_values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return serialize_product_rows(page), self.paginator.page_state()
+        return serialize_product_rows(queryset), None
+
+
+class QueryCacheStatsAPI(APIView):
+    """商品列表查询缓存的命中率等指标"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(get_query_cache().stats())
+
 
 class ProductDetailAPI(generics.RetrieveAPIView):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
 
+    @catalog_conditional
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
-class ProductReviewListAPI(generics.ListCreateAPIView):
-    """商品评价列表和创建"""
+
+class ProductReviewListAPI(OptionalKeysetPaginationMixin, generics.ListCreateAPIView):
+    """商品评价列表和创建（?cursor= 时使用 keyset 分页）"""
     permission_classes = [AllowAny]
     
     def get_queryset(self):
         product_id = self.kwargs.get('product_id')
-        return ProductReview.objects.filter(product_id=product_id).select_related('user').order_by('-created_at')
+        reviews = ProductReview.objects.filter(product_id=product_id).select_related('user').order_by('-created_at', '-id')
+        return counters.with_counter(reviews, 'helpful_count')
     
     def get_serializer_class(self):
         from .serializers import ProductReviewSerializer
@@ -158,11 +252,11 @@ class ProductReviewHelpfulAPI(APIView):
     permission_classes = [AllowAny]
     
     def post(self, request, review_id):
+        # 投票只写分片计数，不锁评价本身所在的行（见 counters.py）
         try:
-            review = ProductReview.objects.get(id=review_id)
-            review.helpful_count += 1
-            review.save()
-            return Response({'helpful_count': review.helpful_count})
+            review = counters.with_counter(ProductReview.objects.only('id', 'helpful_count'), 'helpful_count').get(id=review_id)
+            counters.increment(ProductReview, review.id, 'helpful_count')
+            return Response({'helpful_count': review.helpful_count_total + 1})
         except ProductReview.DoesNotExist:
             return Response({'error': 'Review not found'}, status=status.HTTP_404_NOT_FOUND)
 
@@ -183,31 +277,19 @@ class CartAPI(APIView):
                 request.session.create()
                 session_key = request.session.session_key
             cart, _ = Cart.objects.get_or_create(session_key=session_key, user=None)
+            # 登录时按此 ID 把匿名购物车并入用户购物车（见 signals.merge_guest_cart_on_login）
+            request.session[SESSION_CART_KEY] = cart.id
         
         return cart
     
     def get(self, request):
-        """获取购物车"""
-        cart = self.get_cart(request)
-        items = CartItem.objects.filter(cart=cart).select_related('product')
-        
-        cart_data = {
-            'id': cart.id,
-            'items': [
-                {
-                    'id': item.id,
-                    'product_id': item.product.id,
-                    'product_name': item.product.name,
-                    'price': float(item.product.price),
-                    'original_price': float(item.product.original_price) if item.product.original_price else None,
-                    'image': item.product.image_url or 'https://images.unsplash.com/photo-1603789955942-64ca8f2d7c54?w=200',
-                    'quantity': item.quantity,
-                    'stock': item.product.stock,
-                }
-                for item in items
-            ],
-            'total': sum(float(item.product.price) * item.quantity for item in items),
-        }
+        """获取购物车（只读：不创建购物车和会话，结果带缓存，见 carts.py）"""
+        user = request.user if request.user.is_authenticated else None
+        if user:
+            cart_data = get_cart_data(user_id=user.id)
+        else:
+            session_key = request.session.session_key or request.META.get('HTTP_X_SESSION_KEY', '')
+            cart_data = get_cart_data(session_key=session_key)
         return Response(cart_data)
     
     def post(self, request):
@@ -227,12 +309,14 @@ class CartAPI(APIView):
             defaults={'quantity': quantity}
         )
         
-        if not created:
-            cart_item.quantity += quantity
-            cart_item.quantity = min(cart_item.quantity, product.stock)
+        # 购物车数量以实际预占到的库存为准
+        requested = quantity if created else cart_item.quantity + quantity
+        held = hold_cart_quantity(cart, product.id, requested)
+        if created or held != cart_item.quantity:
+            cart_item.quantity = max(held, 1)
             cart_item.save()
         
-        return Response({'message': 'Added to cart', 'cart_item_id': cart_item.id})
+        return Response({'message': 'Added to cart', 'cart_item_id': cart_item.id, 'reserved': held})
     
     def put(self, request):
         """更新购物车商品数量"""
@@ -241,9 +325,10 @@ class CartAPI(APIView):
         
         try:
             cart_item = CartItem.objects.get(id=item_id)
-            cart_item.quantity = max(1, min(quantity, cart_item.product.stock))
+            held = hold_cart_quantity(cart_item.cart, cart_item.product_id, max(1, quantity))
+            cart_item.quantity = max(1, held)
             cart_item.save()
-            return Response({'message': 'Updated'})
+            return Response({'message': 'Updated', 'reserved': held})
         except CartItem.DoesNotExist:
             return Response({'error': 'Item not found'}, status=status.HTTP_404_NOT_FOUND)
     
@@ -252,12 +337,31 @@ class CartAPI(APIView):
         item_id = request.data.get('item_id')
         
         try:
+            for cart_id, product_id in CartItem.objects.filter(id=item_id).values_list('cart_id', 'product_id'):
+                release_cart_reservation(cart_id, product_id)
             CartItem.objects.filter(id=item_id).delete()
             return Response({'message': 'Deleted'})
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
+class CartBatchAPI(APIView):
+    """购物车批量修改API：一个请求、一个事务内应用多条 add/update/remove 操作"""
+    permission_classes = [AllowAny]
+    get_cart = CartAPI.get_cart
+    
+    def post(self, request):
+        cart = self.get_cart(request)
+        try:
+            adjusted = apply_cart_operations(cart, request.data.get('operations'))
+        except CartOperationError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'cart': get_cart_data(user_id=cart.user_id, session_key=cart.session_key),
+            'adjusted': adjusted,
+        })
+
+
 class OrderAPI(APIView):
     """订单API"""
     permission_classes = [AllowAny]
@@ -323,52 +427,20 @@ class OrderAPI(APIView):
         shipping_address = request.data.get('shipping_address', '')
         source = request.data.get('source', '')
         
-        if not items:
-            return Response({'error': 'No items'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # 计算总金额
-        total_amount = 0
-        order_items_data = []
-        
-        for item in items:
-            try:
-                product = Product.objects.get(id=item['product_id'])
-                quantity = int(item['quantity'])
-                price = float(product.price)
-                total_amount += price * quantity
-                order_items_data.append({
-                    'product': product,
-                    'quantity': quantity,
-                    'price': price,
-                })
-            except Product.DoesNotExist:
-                return Response({'error': f'Product {item.get("product_id")} not found'}, status=status.HTTP_404_NOT_FOUND)
-        
-        # 创建订单
-        order = Order.objects.create(
-            user=user,
-            total_amount=total_amount,
-            shipping_address=shipping_address,
-            source=source,
-            status='PENDING',
-        )
-        
-        # 创建订单项
-        for item_data in order_items_data:
-            OrderItem.objects.create(
-                order=order,
-                product=item_data['product'],
-                quantity=item_data['quantity'],
-                price=item_data['price'],
-            )
-            # 减少库存
-            item_data['product'].stock -= item_data['quantity']
-            item_data['product'].save()
+        # 事务内一次性校验、扣减库存并创建订单（见 checkout.py）
+        try:
+            order, _ = place_order(user, items, shipping_address=shipping_address, source=source or '')
+        except InvalidOrderItems as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ProductNotFound as e:
+            return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+        except InsufficientStock as e:
+            return Response({'error': str(e), 'shortages': e.shortages}, status=status.HTTP_409_CONFLICT)
         
         return Response({
             'order_id': order.id,
             'order_no': f'OD{order.id:08d}',
-            'total_amount': float(total_amount),
+            'total_amount': float(order.total_amount),
             'message': 'Order created',
         })
 
@@ -447,49 +519,14 @@ class AnalyticsDashboardAPI(APIView):
     
     def get(self, request):
         """获取运营数据统计"""
-        from django.db.models import Sum, Count, Avg
-        from datetime import datetime, timedelta
+        from django.db.models import Sum, Count
         
-        # 计算时间范围
-        now = timezone.now()
-        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        week_start = today_start - timedelta(days=7)
-        month_start = today_start - timedelta(days=30)
-        
-        # 总销售额
-        total_sales = Order.objects.filter(status__in=['PAID', 'SHIPPED', 'COMPLETED']).aggregate(
-            total=Sum('total_amount')
-        )['total'] or 0
-        
-        # 今日销售额
-        today_sales = Order.objects.filter(
-            status__in=['PAID', 'SHIPPED', 'COMPLETED'],
-            created_at__gte=today_start
-        ).aggregate(total=Sum('total_amount'))['total'] or 0
-        
-        # 订单数量
-        total_orders = Order.objects.count()
-        today_orders = Order.objects.filter(created_at__gte=today_start).count()
-        
-        # 活跃用户（有订单的用户）
-        active_users = User.objects.filter(order__isnull=False).distinct().count()
+        # 销售额、订单数、活跃用户和销售趋势读取预先汇总的数据（见 rollups.py）
+        sales = sales_dashboard()
         
         # 商品统计
         total_products = Product.objects.count()
-        low_stock_products = Product.objects.filter(stock__lt=10).count()
-        
-        # 销售趋势（最近7天）
-        sales_trend = []
-        for i in range(6, -1, -1):
-            date = today_start - timedelta(days=i)
-            day_sales = Order.objects.filter(
-                status__in=['PAID', 'SHIPPED', 'COMPLETED'],
-                created_at__date=date.date()
-            ).aggregate(total=Sum('total_amount'))['total'] or 0
-            sales_trend.append({
-                'date': date.strftime('%Y-%m-%d'),
-                'sales': float(day_sales),
-            })
+        low_stock_products = Product.objects.low_stock(10).count()
         
         # 热门商品（按销量）
         top_products = Product.objects.order_by('-sales_count')[:10].values(
@@ -504,20 +541,46 @@ class AnalyticsDashboardAPI(APIView):
         
         return Response({
             'stats': {
-                'total_sales': float(total_sales),
-                'today_sales': float(today_sales),
-                'total_orders': total_orders,
-                'today_orders': today_orders,
-                'active_users': active_users,
+                'total_sales': sales['total_sales'],
+                'today_sales': sales['today_sales'],
+                'total_orders': sales['total_orders'],
+                'today_orders': sales['today_orders'],
+                'active_users': sales['active_users'],
                 'total_products': total_products,
                 'low_stock_products': low_stock_products,
             },
-            'sales_trend': sales_trend,
+            'sales_trend': sales['sales_trend'],
+            'hourly_sales': sales['hourly_sales'],
             'top_products': list(top_products),
             'category_stats': list(category_stats),
         })
 
 
+class SalesTrendAPI(APIView):
+    """销售趋势API：?start=YYYY-MM-DD&end=YYYY-MM-DD&granularity=day|week|month"""
+    permission_classes = [AllowAny]
+    
+    def get(self, request):
+        from datetime import date, timedelta
+        
+        try:
+            end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else timezone.localdate()
+            start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else end - timedelta(days=29)
+            granularity = request.GET.get('granularity', 'day')
+            series = sales_trend(start, end, granularity)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'granularity': granularity,
+            'total_sales': round(sum(row['sales'] for row in series), 2),
+            'total_orders': sum(row['orders'] for row in series),
+            'series': series,
+        })
+
+
 class InventoryMonitorAPI(APIView):
     """实时库存监控API"""
     permission_classes = [AllowAny]
@@ -528,17 +591,16 @@ class InventoryMonitorAPI(APIView):
         
         # 低库存商品
         low_stock_threshold = int(request.GET.get('threshold', 10))
-        low_stock_products = Product.objects.filter(stock__lt=low_stock_threshold).order_by('stock')[:20]
+        low_stock_products = list(Product.objects.low_stock(low_stock_threshold).order_by('stock')[:20])
+        levels = stock_levels(p.id for p in low_stock_products)
         
         # 库存预警趋势（最近7天）
         trend_data = []
         now = timezone.now()
+        # 简化：使用当前库存数，7 天共用同一个计数
+        count = Product.objects.low_stock(low_stock_threshold).count()
         for i in range(6, -1, -1):
             date = (now - timedelta(days=i)).date()
-            # 统计当天的低库存商品数量
-            count = Product.objects.filter(
-                stock__lt=low_stock_threshold
-            ).count()  # 简化：使用当前库存数
             trend_data.append({
                 'date': date.strftime('%m-%d'),
                 'alerts': count,
@@ -547,7 +609,7 @@ class InventoryMonitorAPI(APIView):
         
         # 补货建议（基于库存和销量）
         suggestions = []
-        for product in Product.objects.filter(stock__lt=20).order_by('stock')[:10]:
+        for product in Product.objects.low_stock(20).order_by('stock')[:10]:
             # 计算建议补货数量（基于平均销量）
             avg_daily_sales = product.sales_count / 30 if product.sales_count > 0 else 1
             suggested_qty = max(50, int(avg_daily_sales * 30))  # 建议补货30天销量
@@ -570,6 +632,8 @@ class InventoryMonitorAPI(APIView):
                     'id': p.id,
                     'name': p.name,
                     'stock': p.stock,
+                    'reserved': levels[p.id]['reserved'],
+                    'on_hand': levels[p.id]['on_hand'],
                     'category': p.category,
                     'sales_count': p.sales_count,
                 }
@@ -607,31 +671,117 @@ class UserBehaviorAPI(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request):
-        # 返回最近的用户行为记录（如果模型可用）
+        """最近 20 条已入库的行为；last_event_id 可作为实时动态（BehaviorFeedAPI）的续传起点。
+
+        behavior_id 是数据库记录 ID，与动态流的事件 ID 无关。
+        """
         try:
-            behaviors = UserBehavior.objects.all().order_by('-id')[:20]
-            data = []
-            for b in behaviors:
-                data.append({
-                    'id': getattr(b, 'id', None),
-                    'user_id': getattr(b, 'user_id', None),
-                    'event': getattr(b, 'event', None),
-                    'meta': getattr(b, 'meta', None),
-                    'timestamp': getattr(b, 'timestamp', None).isoformat() if getattr(b, 'timestamp', None) else None,
-                })
-            return Response({'behaviors': data})
+            data = [
+                {'behavior_id': b.id, **feed_item(b.behavior_type, b.metadata, user_id=b.user_id,
+                                                  product_id=b.product_id, created_at=b.created_at.isoformat())}
+                for b in UserBehavior.objects.recent(20)
+            ]
+            return Response({'behaviors': data, 'last_event_id': get_activity_feed().last_id})
         except Exception:
             return Response({'behaviors': []})
 
+    def post(self, request):
+        """批量上报行为事件：{'events': [{'type': 'view', 'product_id': 1, 'metadata': {}}, ...]}。
+
+        只追加到缓冲区，不写数据库（见 events.py）；缓冲区已满时多出的事件被丢弃。
+        """
+        events = request.data.get('events')
+        if events is None:
+            events = [request.data]
+        if not isinstance(events, list) or not events:
+            return Response({'error': 'events must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(events) > MAX_EVENTS_PER_REQUEST:
+            return Response({'error': f'At most {MAX_EVENTS_PER_REQUEST} events per request'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        user_id = request.user.id if request.user.is_authenticated else None
+        session_id = request.session.session_key or request.META.get('HTTP_X_SESSION_KEY', '')
+        return Response(track_events(events, user_id=user_id, session_id=session_id), status=status.HTTP_202_ACCEPTED)
+
+
+class EventStreamRenderer(BaseRenderer):
+    """仅用于内容协商：text/event-stream 请求由视图直接返回 StreamingHttpResponse"""
+    media_type = 'text/event-stream'
+    format = 'sse'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode('utf-8')
+
+
+class BehaviorFeedAPI(APIView):
+    """实时行为动态（见 activity_feed.py）。
+
+    - SSE：Accept: text/event-stream，断线重连时浏览器自动携带 Last-Event-ID 续传；
+    - 长轮询：?after=<最后收到的 ID>&timeout=<秒>，有新事件立即返回，否则等待到超时。
+    两者都占用一个连接名额，名额已满时返回 503 和 Retry-After。
+    """
+    permission_classes = [IsAdminUser]
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+
+    def too_many_streams(self):
+        return Response({'error': 'Too many open feed connections'}, status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                        headers={'Retry-After': str(RETRY_MS // 1000)})
+
+    def get(self, request):
+        if request.accepted_renderer.format == 'sse':
+            after = parse_event_id(request.META.get('HTTP_LAST_EVENT_ID') or request.GET.get('after'))
+            stream = open_sse_stream(after)
+            if stream is None:
+                return self.too_many_streams()
+            response = StreamingHttpResponse(stream, content_type='text/event-stream')
+            response['Cache-Control'] = 'no-cache'
+            # 禁止反向代理缓冲，事件才能立即送达
+            response['X-Accel-Buffering'] = 'no'
+            return response
+        after = parse_event_id(request.GET.get('after'))
+        try:
+            timeout = min(max(float(request.GET.get('timeout', LONG_POLL_TIMEOUT)), 0), LONG_POLL_TIMEOUT)
+        except ValueError:
+            timeout = LONG_POLL_TIMEOUT
+        if not stream_slots.acquire():
+            return self.too_many_streams()
+        try:
+            items = get_activity_feed().wait(after, timeout=timeout)
+        finally:
+            stream_slots.release()
+        return Response({'events': items, 'last_id': items[-1]['id'] if items else max(after, 0)})
+
+
+class BehaviorEventStatsAPI(APIView):
+    """行为事件缓冲区指标：积压量、接受/丢弃/无效/已写入计数"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(event_stats())
+
 
 class RecommendationAPI(APIView):
-    """简易推荐 API：返回按销量排序的商品列表"""
+    """推荐 API：带 product_id 时返回该商品的相关商品（没有时返回内容相似的商品），
+    登录用户返回个性化推荐，否则（或没有结果时）按销量排序"""
     permission_classes = [AllowAny]
 
     def get(self, request):
         try:
-            qs = Product.objects.order_by('-sales_count')[:10]
-            serializer = ProductSerializer(qs, many=True)
-            return Response({'recommendations': serializer.data})
+            product_id = request.GET.get('product_id')
+            if product_id:
+                rows = serialize_product_rows(product_list_values(related_products(int(product_id), limit=10)))
+                if rows:
+                    return Response({'recommendations': rows, 'source': 'related'})
+                # 没有行为数据的商品（新品等）：按名称/描述的语义向量找相似商品
+                similar = {pk: rank for rank, pk in enumerate(similar_product_ids(int(product_id), limit=10))}
+                if similar:
+                    rows = serialize_product_rows(product_list_values(Product.objects.filter(id__in=list(similar))))
+                    rows.sort(key=lambda row: similar[row['id']])
+                    return Response({'recommendations': rows, 'source': 'similar'})
+            elif request.user.is_authenticated:
+                rows = serialize_product_rows(product_list_values(recommended_products(request.user.id, limit=10)))
+                if rows:
+                    return Response({'recommendations': rows, 'source': 'personalized'})
+            qs = product_list_values(Product.objects.order_by('-sales_count'))[:10]
+            return Response({'recommendations': serialize_product_rows(qs)})
         except Exception:
             return Response({'recommendations': []})
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class CoreEcommerceConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'core_ecommerce'
+
+    def ready(self):
+        # 注册模型信号（搜索索引增量维护等）
+        from . import signals  # noqa: F401
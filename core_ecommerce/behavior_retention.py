@@ -0,0 +1,65 @@
+# core_ecommerce/behavior_retention.py
+
+"""用户行为原始事件的保留期与压缩。
+
+UserBehavior 按月分区键 partition 存储（见 models.UserBehaviorQuerySet）：按时间的查询带上分区条件，
+只扫描相关月份的索引范围。超过保留期的原始事件由定时任务按 (日期, 商品, 行为类型)
+汇总计数累加到 BehaviorDailyRollup，然后按分区删除，表和索引的大小不再随时间无限增长。
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import BehaviorDailyRollup, UserBehavior
+
+RETAIN_DAYS = 90
+
+
+def retention_cutoff(retain_days=RETAIN_DAYS, now=None):
+    """保留期起点：retain_days 天前的本地零点（只压缩完整的自然日）"""
+    day = timezone.localdate(now) - timedelta(days=retain_days)
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _merge_counts(rows):
+    """把 [{'date', 'product_id', 'behavior_type', 'total'}] 累加到汇总表"""
+    existing = {
+        (rollup.date, rollup.product_id, rollup.behavior_type): rollup
+        for rollup in BehaviorDailyRollup.objects.filter(date__in={row['date'] for row in rows})
+    }
+    to_create = []
+    to_update = []
+    for row in rows:
+        rollup = existing.get((row['date'], row['product_id'], row['behavior_type']))
+        if rollup is None:
+            to_create.append(BehaviorDailyRollup(
+                date=row['date'], product_id=row['product_id'], behavior_type=row['behavior_type'], count=row['total'],
+            ))
+        else:
+            rollup.count += row['total']
+            to_update.append(rollup)
+    BehaviorDailyRollup.objects.bulk_create(to_create, batch_size=1000)
+    BehaviorDailyRollup.objects.bulk_update(to_update, ['count'], batch_size=1000)
+
+
+def compact_behavior_events(retain_days=RETAIN_DAYS, now=None):
+    """压缩保留期之前的原始事件，每个分区一个事务，返回 {'partitions': 处理的分区数, 'compacted': 删除的事件数}"""
+    expired = UserBehavior.objects.before(retention_cutoff(retain_days, now))
+    partitions = list(expired.order_by('partition').values_list('partition', flat=True).distinct())
+    compacted = 0
+    for partition in partitions:
+        with transaction.atomic():
+            raw = expired.filter(partition=partition)
+            rows = list(
+                raw.annotate(date=TruncDate('created_at'))
+                .values('date', 'product_id', 'behavior_type')
+                .annotate(total=Count('id'))
+                .order_by()
+            )
+            _merge_counts(rows)
+            compacted += raw.delete()[0]
+    return {'partitions': len(partitions), 'compacted': compacted}
@@ -0,0 +1,251 @@
+# core_ecommerce/carts.py
+
+"""购物车读模型与批量修改。
+
+一条 LEFT JOIN 查询取出购物车、商品项和商品信息，金额用 Decimal 计算，
+结果按购物车所有者（登录用户或匿名会话）缓存。CartItem/Cart 的保存和删除
+通过信号清除缓存（见 signals.py）；queryset.update()/bulk_create() 等绕过信号的写入
+需要自行调用 invalidate_cart()。
+
+缓存设置了较短的过期时间，商品改价、改名后购物车最多滞后 CART_CACHE_TIMEOUT 秒。
+
+匿名购物车在用户登录时并入用户购物车（merge_guest_carts），长期未修改的匿名购物车
+由定时任务按批清理（purge_abandoned_carts）。
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Cart, CartItem, StockReservation
+from .reservations import hold_cart_quantities, transfer_cart_holds
+
+CART_CACHE_TIMEOUT = 60
+# 匿名购物车 ID 存在会话数据中：登录时会话键会轮换，会话数据保留
+SESSION_CART_KEY = 'cart_id'
+GUEST_CART_TTL_DAYS = 30
+PURGE_BATCH_SIZE = 1000
+CART_OPERATIONS = ['add', 'update', 'remove']
+MAX_CART_OPERATIONS = 200
+DEFAULT_ITEM_IMAGE = 'https://images.unsplash.com/photo-1603789955942-64ca8f2d7c54?w=200'
+ITEM_FIELDS = {
+    'items__id': 'id',
+    'items__product_id': 'product_id',
+    'items__product__name': 'product_name',
+    'items__product__price': 'price',
+    'items__product__original_price': 'original_price',
+    'items__product__image_url': 'image',
+    'items__quantity': 'quantity',
+    'items__product__stock': 'stock',
+}
+
+
+def cart_cache_key(user_id=None, session_key=None):
+    if user_id:
+        return f'cart:user:{user_id}'
+    return f'cart:session:{session_key}'
+
+
+def empty_cart():
+    return {'id': None, 'items': [], 'count': 0, 'total': Decimal('0.00')}
+
+
+def build_cart(user_id=None, session_key=None):
+    """一次查询构建购物车数据；购物车不存在时返回空购物车（不会创建）"""
+    if user_id:
+        carts = Cart.objects.filter(user_id=user_id)
+    else:
+        carts = Cart.objects.filter(session_key=session_key, user__isnull=True)
+    rows = carts.order_by('id', 'items__id').values('id', *ITEM_FIELDS)
+
+    cart = empty_cart()
+    for row in rows:
+        if cart['id'] is None:
+            cart['id'] = row['id']
+        elif row['id'] != cart['id']:
+            # 只取最早创建的购物车
+            break
+        if row['items__id'] is None:
+            continue
+        item = {name: row[field] for field, name in ITEM_FIELDS.items()}
+        item['image'] = item['image'] or DEFAULT_ITEM_IMAGE
+        cart['items'].append(item)
+        cart['count'] += item['quantity']
+        cart['total'] += item['price'] * item['quantity']
+    return cart
+
+
+def get_cart_data(user_id=None, session_key=None):
+    """带缓存的购物车数据"""
+    if not user_id and not session_key:
+        return empty_cart()
+    key = cart_cache_key(user_id, session_key)
+    data = cache.get(key)
+    if data is None:
+        data = build_cart(user_id, session_key)
+        cache.set(key, data, CART_CACHE_TIMEOUT)
+    return data
+
+
+def invalidate_cart(user_id=None, session_key=None):
+    keys = []
+    if user_id:
+        keys.append(cart_cache_key(user_id=user_id))
+    if session_key:
+        keys.append(cart_cache_key(session_key=session_key))
+    cache.delete_many(keys)
+
+
+def invalidate_cart_ids(cart_ids):
+    """按购物车 ID 清除缓存（批量写入 CartItem 后调用）"""
+    for user_id, session_key in Cart.objects.filter(id__in=list(cart_ids)).values_list('user_id', 'session_key'):
+        invalidate_cart(user_id, session_key)
+
+
+class CartOperationError(Exception):
+    """批量修改购物车的请求无效（整批不生效）"""
+
+
+def parse_cart_operations(operations):
+    """校验批量操作：[{'op': 'add'|'update'|'remove', 'product_id': 1, 'quantity': 2}, ...]"""
+    if not isinstance(operations, list) or not operations:
+        raise CartOperationError('operations must be a non-empty list')
+    if len(operations) > MAX_CART_OPERATIONS:
+        raise CartOperationError(f'At most {MAX_CART_OPERATIONS} operations per request')
+    parsed = []
+    for index, operation in enumerate(operations):
+        try:
+            op = operation['op']
+            product_id = int(operation['product_id'])
+            quantity = int(operation.get('quantity', 1)) if op != 'remove' else 0
+        except (KeyError, TypeError, ValueError, AttributeError):
+            raise CartOperationError(f'Invalid operation #{index}: {operation}')
+        if op not in CART_OPERATIONS:
+            raise CartOperationError(f'Unknown op #{index}: {op}')
+        if quantity < 0 or (op == 'add' and quantity == 0):
+            raise CartOperationError(f'Invalid quantity #{index}: {quantity}')
+        parsed.append((op, product_id, quantity))
+    return parsed
+
+
+def apply_cart_operations(cart, operations):
+    """在一个事务内按顺序应用批量操作，数量按可售库存截断（一次读取库存）。
+
+    返回被截断的商品 [{'product_id', 'requested', 'quantity'}]；
+    有商品不存在时抛出 CartOperationError，整批回滚。
+    """
+    parsed = parse_cart_operations(operations)
+    with transaction.atomic():
+        items = {item.product_id: item for item in CartItem.objects.filter(cart=cart)}
+        targets = {product_id: item.quantity for product_id, item in items.items()}
+        touched = set()
+        for op, product_id, quantity in parsed:
+            if op == 'add':
+                targets[product_id] = targets.get(product_id, 0) + quantity
+            else:
+                targets[product_id] = quantity
+            touched.add(product_id)
+
+        requested = {product_id: targets[product_id] for product_id in touched}
+        granted = hold_cart_quantities(cart, requested)
+        missing = touched - set(granted)
+        if missing:
+            raise CartOperationError(f'Product {", ".join(map(str, sorted(missing)))} not found')
+
+        now = timezone.now()
+        to_create = []
+        to_update = []
+        to_delete = []
+        for product_id, quantity in granted.items():
+            item = items.get(product_id)
+            if quantity <= 0:
+                if item is not None:
+                    to_delete.append(item.id)
+            elif item is None:
+                to_create.append(CartItem(cart=cart, product_id=product_id, quantity=quantity))
+            elif item.quantity != quantity:
+                item.quantity = quantity
+                item.updated_at = now
+                to_update.append(item)
+        CartItem.objects.bulk_create(to_create)
+        CartItem.objects.bulk_update(to_update, ['quantity', 'updated_at'])
+        CartItem.objects.filter(id__in=to_delete).delete()
+    # 批量写入不触发信号，手动清除缓存
+    invalidate_cart(cart.user_id, cart.session_key)
+    return [
+        {'product_id': product_id, 'requested': requested[product_id], 'quantity': granted[product_id]}
+        for product_id in sorted(touched)
+        if granted[product_id] != requested[product_id]
+    ]
+
+
+def merge_guest_carts(user, cart_ids=()):
+    """把匿名购物车（按 ID 查找）并入用户购物车，返回合并的商品种类数。
+
+    同款商品数量相加，一条 INSERT ... ON CONFLICT (cart_id, product_id) DO UPDATE 写入；
+    匿名购物车的有效预占转给用户购物车，其余预占解除关联，随后删除匿名购物车，全部在一个事务内完成。
+    """
+    cart_ids = [cart_id for cart_id in cart_ids if cart_id]
+    if not cart_ids:
+        return 0
+    with transaction.atomic():
+        guests = list(Cart.objects.filter(id__in=cart_ids, user__isnull=True).values_list('id', 'session_key'))
+        if not guests:
+            return 0
+        guest_ids = [cart_id for cart_id, _ in guests]
+        # 与 build_cart 一致：用户有多个购物车时使用最早创建的一个
+        cart = Cart.objects.filter(user=user).order_by('id').first() or Cart.objects.create(user=user)
+
+        quantities = defaultdict(int)
+        for product_id, quantity in CartItem.objects.filter(cart_id__in=guest_ids).values_list('product_id', 'quantity'):
+            quantities[product_id] += quantity
+        existing = dict(
+            CartItem.objects.filter(cart=cart, product_id__in=list(quantities)).select_for_update()
+            .values_list('product_id', 'quantity')
+        )
+        CartItem.objects.bulk_create(
+            [
+                CartItem(cart=cart, product_id=product_id, quantity=existing.get(product_id, 0) + quantity)
+                for product_id, quantity in quantities.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['cart', 'product'],
+            update_fields=['quantity', 'updated_at'],
+        )
+        transfer_cart_holds(guest_ids, cart)
+        # 已释放、已过期的预占留在原购物车上，解除关联后才能删除购物车
+        StockReservation.objects.filter(cart_id__in=guest_ids).update(cart=None)
+        Cart.objects.filter(id__in=guest_ids).delete()
+    # 批量写入不触发信号，手动清除缓存
+    invalidate_cart(user_id=user.id)
+    for _, session_key in guests:
+        invalidate_cart(session_key=session_key)
+    return len(quantities)
+
+
+def purge_abandoned_carts(days=GUEST_CART_TTL_DAYS, batch_size=PURGE_BATCH_SIZE, now=None):
+    """按批删除 days 天内购物车及商品项都没有修改过的匿名购物车，返回删除的购物车数。
+
+    这些购物车的预占早已过期，只解除关联，由 release_expired_reservations() 照常处理。
+    每批按 ID 调用普通的 delete()（级联删除商品项并触发缓存失效信号），每批一个事务。
+    """
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    abandoned = (
+        Cart.objects.filter(user__isnull=True, updated_at__lt=cutoff)
+        .exclude(items__updated_at__gte=cutoff)
+        .order_by()
+    )
+    purged = 0
+    while True:
+        with transaction.atomic():
+            ids = list(abandoned.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            StockReservation.objects.filter(cart_id__in=ids).update(cart=None)
+            Cart.objects.filter(id__in=ids).delete()
+        purged += len(ids)
+    return purged
@@ -0,0 +1,82 @@
+# core_ecommerce/catalog.py
+
+"""商品目录版本号与条件 GET。
+
+商品数据（含库存、销量、AI 评分）每次写入后递增缓存中的目录版本号，商品列表/详情接口以版本号
+作为 ETag、以最后修改时间作为 Last-Modified。客户端或 CDN 带 If-None-Match 重新验证时，
+版本未变化直接返回 304，不执行任何商品查询。
+
+写入时立即递增一次，事务提交后再递增一次：提交前其他请求读到旧数据时拿到的版本号
+会在提交后作废，不会把旧数据缓存在新版本号下。
+save()/delete() 由信号处理；queryset.update()/bulk_create()/bulk_update() 等批量写入需要自行调用
+bump_catalog_version()。版本号保存在默认缓存中，Celery worker 的写入（导入、评分、合并计数、
+释放预占等）也要让 Web 进程看到，因此多进程部署时默认缓存必须是 Redis（设置 CACHE_URL，
+见 settings.CACHES），递增依赖 Redis INCR 的原子性。
+"""
+
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+CATALOG_VERSION_KEY = 'catalog:version'
+CATALOG_MODIFIED_KEY = 'catalog:modified'
+# 浏览器每次都重新验证；CDN 可直接复用 CATALOG_CDN_MAX_AGE 秒
+CATALOG_CDN_MAX_AGE = 30
+
+
+def _initial_version():
+    # 缓存丢失后从当前时间（微秒）重新开始，不会与之前发出的 ETag 重复
+    return int(time.time() * 1_000_000)
+
+
+def _bump():
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, _initial_version(), None)
+    cache.set(CATALOG_MODIFIED_KEY, timezone.now(), None)
+
+
+def bump_catalog_version():
+    """商品数据已修改：立即递增目录版本号，在事务中时提交后再递增一次"""
+    _bump()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(_bump)
+
+
+def catalog_state():
+    """(版本号, 最后修改时间)，一次缓存读取"""
+    state = cache.get_many([CATALOG_VERSION_KEY, CATALOG_MODIFIED_KEY])
+    if CATALOG_VERSION_KEY not in state or CATALOG_MODIFIED_KEY not in state:
+        cache.add(CATALOG_VERSION_KEY, _initial_version(), None)
+        cache.add(CATALOG_MODIFIED_KEY, timezone.now(), None)
+        state = cache.get_many([CATALOG_VERSION_KEY, CATALOG_MODIFIED_KEY])
+    return state[CATALOG_VERSION_KEY], state[CATALOG_MODIFIED_KEY]
+
+
+def _set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, public=True, max_age=0, must_revalidate=True, s_maxage=CATALOG_CDN_MAX_AGE)
+    return response
+
+
+def catalog_conditional(method):
+    """APIView.get 装饰器：附加 ETag/Last-Modified/Cache-Control，版本未变化时直接返回 304"""
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        version, modified = catalog_state()
+        etag = f'"catalog-{version}"'
+        last_modified = int(modified.timestamp())
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = method(self, request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        return _set_validators(response, etag, last_modified)
+    return wrapper
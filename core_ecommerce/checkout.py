@@ -0,0 +1,95 @@
+# core_ecommerce/checkout.py
+
+"""下单：在一个事务内校验商品、预占库存、创建订单和订单项。
+
+库存扣减是一条带条件的 UPDATE（见 reservations.adjust_stock）：
+``UPDATE product SET stock = stock + CASE id ... END WHERE (id = 1 AND stock >= 2 + 其他购物车的预占) OR ...``，
+由数据库保证"检查库存 + 扣减"的原子性，并发下单不会超卖，也不会丢失更新。
+只要有一个商品库存不足，整个事务回滚，不会留下部分扣减。
+扣减的库存记为订单的预占，订单超时未付款时由定时任务释放。
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Order, OrderItem, Product
+from .reservations import available_stock, reserve_for_order
+
+
+class CheckoutError(Exception):
+    """下单失败的基类"""
+
+
+class InvalidOrderItems(CheckoutError):
+    """订单项格式错误（缺少商品 ID、数量不是正整数等）"""
+
+
+class ProductNotFound(CheckoutError):
+    def __init__(self, product_ids):
+        self.product_ids = sorted(product_ids)
+        super().__init__(f'Product {", ".join(map(str, self.product_ids))} not found')
+
+
+class InsufficientStock(CheckoutError):
+    def __init__(self, shortages):
+        # shortages: [{'product_id', 'requested', 'available'}]
+        self.shortages = shortages
+        super().__init__('Insufficient stock for product ' + ', '.join(str(s['product_id']) for s in shortages))
+
+
+def normalize_items(items):
+    """把请求中的订单项合并为 {product_id: quantity}，同一商品出现多次时数量相加"""
+    if not items:
+        raise InvalidOrderItems('No items')
+    quantities = {}
+    for item in items:
+        try:
+            product_id = int(item['product_id'])
+            quantity = int(item.get('quantity', 1))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            raise InvalidOrderItems(f'Invalid item: {item}')
+        if quantity <= 0:
+            raise InvalidOrderItems(f'Invalid quantity for product {product_id}: {quantity}')
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return quantities
+
+
+def place_order(user, items, shipping_address='', source=''):
+    """创建订单并预占库存，返回 (order, order_items)。
+
+    用户购物车中已预占的同款商品直接转给订单。
+
+    失败时抛出 InvalidOrderItems / ProductNotFound / InsufficientStock，数据库不做任何修改。
+    """
+    quantities = normalize_items(items)
+    with transaction.atomic():
+        products = Product.objects.only('id', 'price').in_bulk(list(quantities))
+        missing = set(quantities) - set(products)
+        if missing:
+            raise ProductNotFound(missing)
+
+        total_amount = sum(
+            (products[product_id].price * quantity for product_id, quantity in quantities.items()),
+            Decimal('0.00'),
+        )
+        order = Order.objects.create(
+            user=user,
+            total_amount=total_amount,
+            shipping_address=shipping_address,
+            source=source,
+            status='PENDING',
+        )
+        if not reserve_for_order(order, quantities, cart_owner=user):
+            stock = available_stock(quantities, exclude=Q(cart__user=user) if user is not None else None)
+            raise InsufficientStock([
+                {'product_id': product_id, 'requested': quantity, 'available': stock.get(product_id, 0)}
+                for product_id, quantity in quantities.items()
+                if stock.get(product_id, 0) < quantity
+            ])
+        order_items = OrderItem.objects.bulk_create([
+            OrderItem(order=order, product_id=product_id, quantity=quantity, price=products[product_id].price)
+            for product_id, quantity in quantities.items()
+        ])
+    return order, order_items
@@ -0,0 +1,121 @@
+# core_ecommerce/counters.py
+
+"""分片计数器。
+
+高并发累加同一个计数字段（热门评价的有用数）时，
+直接 UPDATE 原字段会让所有请求排队等待同一行的行锁。这里把增量随机写入
+COUNTER_SHARDS 个 CounterShard 行之一（原子的 F() 累加），由定时任务
+compact_counters() 合并回模型上的原字段。
+
+读取时原字段值 + 尚未合并的分片之和即为准确值：单个对象用 get_count()，
+列表查询用 with_counter() 注解，避免 N+1。
+
+商品销量不走分片：下单时扣减库存的条件 UPDATE 本来就要写商品行，
+销量在同一条语句中累加（见 reservations.adjust_stock），分片不会减少行锁等待。
+"""
+
+import random
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from .models import CounterShard, ProductReview
+
+COUNTER_SHARDS = 8
+COMPACT_BATCH_SIZE = 1000
+
+# 允许分片累加的字段
+SHARDED_FIELDS = {
+    (ProductReview, 'helpful_count'),
+}
+
+
+def _content_type(model):
+    return ContentType.objects.get_for_model(model)
+
+
+def _check_field(model, field):
+    if (model, field) not in SHARDED_FIELDS:
+        raise ValueError(f'{model.__name__}.{field} 未注册为分片计数字段')
+
+
+def increment(model, object_id, field, amount=1):
+    """给 model(object_id).field 累加 amount：只写随机一个分片行，不触碰对象本身所在的行"""
+    _check_field(model, field)
+    lookup = {
+        'content_type': _content_type(model),
+        'object_id': object_id,
+        'field': field,
+        'shard': random.randrange(COUNTER_SHARDS),
+    }
+    if CounterShard.objects.filter(**lookup).update(value=F('value') + amount):
+        return
+    try:
+        with transaction.atomic():
+            CounterShard.objects.create(value=amount, **lookup)
+    except IntegrityError:
+        # 并发请求先创建了这个分片
+        CounterShard.objects.filter(**lookup).update(value=F('value') + amount)
+
+
+def pending_counts(model, field, object_ids):
+    """{object_id: 尚未合并的增量}"""
+    rows = (
+        CounterShard.objects.filter(content_type=_content_type(model), field=field, object_id__in=list(object_ids))
+        .values('object_id').annotate(total=Sum('value')).values_list('object_id', 'total')
+    )
+    return dict(rows)
+
+
+def get_count(instance, field):
+    """原字段值 + 尚未合并的增量"""
+    return getattr(instance, field) + pending_counts(type(instance), field, [instance.pk]).get(instance.pk, 0)
+
+
+def with_counter(queryset, field, name=None):
+    """把合并后的计数注解为 name（默认 <field>_total），一次查询完成"""
+    model = queryset.model
+    _check_field(model, field)
+    pending = (
+        CounterShard.objects.filter(content_type=_content_type(model), field=field, object_id=OuterRef('pk'))
+        .values('object_id').annotate(total=Sum('value')).values('total')
+    )
+    return queryset.annotate(**{
+        name or f'{field}_total': F(field) + Coalesce(Subquery(pending, output_field=IntegerField()), Value(0)),
+    })
+
+
+def compact_counters(batch_size=COMPACT_BATCH_SIZE):
+    """把分片增量合并回原字段，返回合并的对象数。
+
+    合并时从分片中减去读到的值（而不是直接删除），合并期间新写入的增量不会丢失；
+    归零的分片行随后删除，删除与累加都是单行原子操作，不会互相覆盖。
+    """
+    compacted = 0
+    for model, field in SHARDED_FIELDS:
+        content_type = _content_type(model)
+        shards = CounterShard.objects.filter(content_type=content_type, field=field)
+        while True:
+            with transaction.atomic():
+                rows = list(shards.exclude(value=0).values_list('id', 'object_id', 'value')[:batch_size])
+                if not rows:
+                    break
+                totals = defaultdict(int)
+                for _, object_id, value in rows:
+                    totals[object_id] += value
+                model.objects.filter(pk__in=list(totals)).update(**{
+                    field: F(field) + Case(
+                        *[When(pk=object_id, then=Value(total)) for object_id, total in totals.items()],
+                        default=Value(0), output_field=IntegerField(),
+                    ),
+                })
+                CounterShard.objects.filter(id__in=[row[0] for row in rows]).update(value=F('value') - Case(
+                    *[When(id=shard_id, then=Value(value)) for shard_id, _, value in rows],
+                    default=Value(0), output_field=IntegerField(),
+                ))
+                compacted += len(totals)
+        shards.filter(value=0).delete()
+    return compacted
@@ -0,0 +1,324 @@
+# core_ecommerce/embeddings.py
+
+"""商品语义向量（embedding）存储与最近邻检索。
+
+向量离线在本地计算，不依赖外部服务：
+1. 商品名称、分类、描述切分为词项（英文/数字按单词，中文按单字和相邻两字），
+   用带符号的特征哈希映射到固定维数的稀疏向量，词频取 log1p 后乘以 IDF；
+2. 对 TF-IDF 矩阵做截断 SVD 降到 DIMENSIONS 维，行向量归一化后以 float32 保存。
+
+存储目录（settings.PRODUCT_EMBEDDINGS['PATH']）下每次重建写入一个新版本子目录：
+vectors.npy（商品数 × 维数）、ids.npy（按商品 ID 升序，与 vectors 的行对应）、
+idf.npy / components.npy（查询文本的投影参数）和 meta.json，
+全部写完后原子替换 CURRENT 文件切换版本，读取方在下一次查询时自动打开新版本。
+
+读取时 np.load(mmap_mode='r') 只读映射文件：同一台机器上的所有 Web 进程共享
+操作系统的页缓存，不会各自把矩阵读进内存。检索按 BATCH_ROWS 行分块计算余弦相似度，
+多个查询向量一起计算，每块只保留 Top-K 候选。
+"""
+
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import svds
+from django.conf import settings
+
+from .models import Product
+
+DEFAULTS = {
+    # None 表示 BASE_DIR / 'product_embeddings'
+    'PATH': None,
+    'DIMENSIONS': 64,
+    'N_FEATURES': 2 ** 15,
+    # 保留的历史版本数（正在使用旧版本映射的进程不受删除影响）
+    'KEEP_VERSIONS': 2,
+}
+BATCH_ROWS = 65536
+READ_CHUNK_SIZE = 2000
+# 名称比描述更能代表商品
+FIELD_WEIGHTS = {'name': 2.0, 'category': 1.0, 'description': 1.0}
+# 文本检索的最低相似度，低于该值视为不相关
+MIN_TEXT_SCORE = 0.1
+# 检索结果还要经过查询集过滤（如只要有货的商品）时，多取的候选倍数
+FILTERED_SEARCH_FACTOR = 4
+
+WORD_RE = re.compile(r'[a-z0-9]+')
+CJK_RE = re.compile(r'[\u4e00-\u9fff]+')
+
+
+def tokenize(text):
+    """英文/数字按单词，中文按单字和相邻两字切分"""
+    text = (text or '').lower()
+    tokens = WORD_RE.findall(text)
+    for run in CJK_RE.findall(text):
+        tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def hash_features(fields, n_features):
+    """{列号: 权重}：带符号的特征哈希（crc32 跨进程稳定），词频取 log1p"""
+    counts = {}
+    for field, text in fields.items():
+        weight = FIELD_WEIGHTS.get(field, 1.0)
+        for token in tokenize(text):
+            digest = zlib.crc32(token.encode('utf-8'))
+            column = digest % n_features
+            sign = 1.0 if digest & 0x80000000 else -1.0
+            counts[column] = counts.get(column, 0.0) + sign * weight
+    return {column: np.sign(count) * np.log1p(abs(count)) for column, count in counts.items() if count}
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _corpus(n_features):
+    """返回 (商品 ID 数组, CSR 词频矩阵)，按商品 ID 升序"""
+    ids, rows, cols, values = [], [], [], []
+    products = Product.objects.order_by('id').values_list('id', 'name', 'category', 'description')
+    for product_id, name, category, description in products.iterator(chunk_size=READ_CHUNK_SIZE):
+        features = hash_features({'name': name, 'category': category, 'description': description}, n_features)
+        row = len(ids)
+        ids.append(product_id)
+        rows.extend([row] * len(features))
+        cols.extend(features)
+        values.extend(features.values())
+    matrix = sparse.csr_matrix(
+        (np.asarray(values, dtype=np.float64), (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64))),
+        shape=(len(ids), n_features),
+    )
+    return np.asarray(ids, dtype=np.int64), matrix
+
+
+def train_embeddings(matrix, dimensions):
+    """返回 (商品向量, IDF, 投影矩阵 特征数 × 维数)；商品数不超过维数时用稠密 SVD"""
+    n_docs = matrix.shape[0]
+    df = np.bincount(matrix.indices, minlength=matrix.shape[1])
+    idf = np.log((1.0 + n_docs) / (1.0 + df)) + 1.0
+    tfidf = matrix @ sparse.diags(idf)
+    norms = np.sqrt(np.asarray(tfidf.multiply(tfidf).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    tfidf = sparse.diags(1.0 / norms) @ tfidf
+
+    if n_docs <= dimensions + 1:
+        _, _, vt = np.linalg.svd(tfidf.toarray(), full_matrices=False)
+        vt = vt[:dimensions]
+    else:
+        _, singular, vt = svds(tfidf, k=dimensions)
+        vt = vt[np.argsort(-singular)]
+    components = vt.T
+    vectors = _normalize_rows(np.asarray(tfidf @ components))
+    return vectors.astype(np.float32), idf.astype(np.float32), components.astype(np.float32)
+
+
+def _config():
+    config = {**DEFAULTS, **getattr(settings, 'PRODUCT_EMBEDDINGS', {})}
+    config['PATH'] = Path(config['PATH'] or Path(settings.BASE_DIR) / 'product_embeddings')
+    return config
+
+
+def build_product_embeddings(dimensions=None):
+    """重新计算全部商品的向量并切换到新版本，返回 {'products', 'dimensions', 'version'}"""
+    config = _config()
+    root = config['PATH']
+    n_features = config['N_FEATURES']
+    ids, matrix = _corpus(n_features)
+    if len(ids):
+        vectors, idf, components = train_embeddings(matrix, dimensions or config['DIMENSIONS'])
+    else:
+        vectors = np.zeros((0, 0), dtype=np.float32)
+        idf = np.ones(n_features, dtype=np.float32)
+        components = np.zeros((n_features, 0), dtype=np.float32)
+
+    version = f'v{time.time_ns()}'
+    target = root / version
+    target.mkdir(parents=True)
+    np.save(target / 'vectors.npy', vectors)
+    np.save(target / 'ids.npy', ids)
+    np.save(target / 'idf.npy', idf)
+    np.save(target / 'components.npy', components)
+    (target / 'meta.json').write_text(json.dumps({
+        'products': len(ids), 'dimensions': vectors.shape[1], 'n_features': n_features,
+    }))
+    pointer = root / 'CURRENT.tmp'
+    pointer.write_text(version)
+    os.replace(pointer, root / 'CURRENT')
+
+    old_versions = sorted(p for p in root.iterdir() if p.is_dir() and p.name.startswith('v') and p.name != version)
+    for path in old_versions[:max(len(old_versions) - config['KEEP_VERSIONS'] + 1, 0)]:
+        shutil.rmtree(path, ignore_errors=True)
+    return {'products': len(ids), 'dimensions': vectors.shape[1], 'version': version}
+
+
+class _Snapshot:
+    """一个版本的只读映射；切换版本时整体替换，查询过程中不会混用两个版本的文件"""
+
+    def __init__(self, directory):
+        meta = json.loads((directory / 'meta.json').read_text())
+        self.vectors = np.load(directory / 'vectors.npy', mmap_mode='r')
+        self.ids = np.load(directory / 'ids.npy', mmap_mode='r')
+        self.idf = np.load(directory / 'idf.npy', mmap_mode='r')
+        self.components = np.load(directory / 'components.npy', mmap_mode='r')
+        self.n_features = meta['n_features']
+
+
+class EmbeddingStore:
+    """只读映射的向量文件；CURRENT 变化后在下一次查询时重新映射"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.version = None
+        self._snapshot = None
+        self._pointer_mtime = None
+        self._mutex = threading.Lock()
+
+    def snapshot(self):
+        """当前版本的映射，存储尚未建立或为空时返回 None"""
+        pointer = self.path / 'CURRENT'
+        try:
+            mtime = pointer.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if mtime != self._pointer_mtime:
+            with self._mutex:
+                if mtime != self._pointer_mtime:
+                    version = pointer.read_text().strip()
+                    if version != self.version:
+                        self._snapshot = _Snapshot(self.path / version)
+                        self.version = version
+                    self._pointer_mtime = mtime
+        snapshot = self._snapshot
+        return snapshot if snapshot is not None and len(snapshot.ids) else None
+
+    def __len__(self):
+        snapshot = self.snapshot()
+        return len(snapshot.ids) if snapshot else 0
+
+    @staticmethod
+    def _rows_for(snapshot, product_ids):
+        product_ids = np.asarray(product_ids, dtype=np.int64)
+        rows = np.searchsorted(snapshot.ids, product_ids)
+        rows[rows >= len(snapshot.ids)] = 0
+        return np.where(snapshot.ids[rows] == product_ids, rows, -1)
+
+    @staticmethod
+    def _embed_text(snapshot, text):
+        features = hash_features({'name': text}, snapshot.n_features)
+        if not features:
+            return None
+        columns = np.fromiter(features, dtype=np.int64, count=len(features))
+        weights = np.fromiter(features.values(), dtype=np.float32, count=len(features)) * snapshot.idf[columns]
+        vector = weights @ snapshot.components[columns]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    @staticmethod
+    def _top_k(snapshot, queries, k, exclude_rows=None, batch_rows=BATCH_ROWS):
+        n_queries = len(queries)
+        exclude_rows = np.full(n_queries, -1) if exclude_rows is None else np.asarray(exclude_rows)
+        best_rows = np.zeros((n_queries, 0), dtype=np.int64)
+        best_scores = np.zeros((n_queries, 0), dtype=np.float32)
+        for start in range(0, len(snapshot.ids), batch_rows):
+            block = snapshot.vectors[start:start + batch_rows]
+            scores = queries @ block.T
+            excluded = (exclude_rows >= start) & (exclude_rows < start + len(block))
+            scores[excluded, exclude_rows[excluded] - start] = -np.inf
+            best_scores = np.hstack([best_scores, scores])
+            best_rows = np.hstack([best_rows, np.broadcast_to(np.arange(start, start + len(block)), scores.shape)])
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+        results = []
+        for rows, scores in zip(best_rows, best_scores):
+            order = np.lexsort((rows, -scores))
+            results.append([
+                (int(snapshot.ids[row]), float(score)) for row, score in zip(rows[order], scores[order])
+                if np.isfinite(score)
+            ])
+        return results
+
+    def top_k(self, queries, k=10, exclude_rows=None, batch_rows=BATCH_ROWS):
+        """一批查询向量（已归一化）的 Top-K 余弦近邻。
+
+        返回每个查询的 [(商品 ID, 相似度), ...]，按相似度降序；
+        exclude_rows[i] 为第 i 个查询要排除的行号（通常是商品自身），-1 表示不排除。
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        snapshot = self.snapshot()
+        if snapshot is None or k <= 0:
+            return [[] for _ in queries]
+        return self._top_k(snapshot, queries, k, exclude_rows=exclude_rows, batch_rows=batch_rows)
+
+    def similar(self, product_ids, k=10, batch_rows=BATCH_ROWS):
+        """每个商品的 Top-K 相似商品（不含自身），不在存储中的商品返回空列表"""
+        results = [[] for _ in product_ids]
+        snapshot = self.snapshot()
+        if snapshot is None or k <= 0:
+            return results
+        rows = self._rows_for(snapshot, product_ids)
+        found = np.flatnonzero(rows >= 0)
+        if len(found):
+            queries = np.asarray(snapshot.vectors[rows[found]])
+            neighbours = self._top_k(snapshot, queries, k, exclude_rows=rows[found], batch_rows=batch_rows)
+            for index, ranked in zip(found, neighbours):
+                results[index] = ranked
+        return results
+
+    def search(self, text, k=10, min_score=MIN_TEXT_SCORE):
+        """与一段文本最相近的商品 [(商品 ID, 相似度), ...]，低于 min_score 的不返回"""
+        snapshot = self.snapshot()
+        vector = self._embed_text(snapshot, text) if snapshot is not None else None
+        if vector is None or k <= 0:
+            return []
+        return [(pk, score) for pk, score in self._top_k(snapshot, vector[None, :], k)[0] if score >= min_score]
+
+
+_store = None
+
+
+def get_embedding_store():
+    global _store
+    if _store is None:
+        _store = EmbeddingStore(_config()['PATH'])
+    return _store
+
+
+def reset_embedding_store():
+    """丢弃当前实例（修改 settings.PRODUCT_EMBEDDINGS 后调用）"""
+    global _store
+    _store = None
+
+
+def _products_in_order(ranked, queryset=None):
+    """按相似度顺序返回商品；给定 queryset 时只保留其中的商品"""
+    queryset = Product.objects.all() if queryset is None else queryset
+    products = queryset.in_bulk([pk for pk, _ in ranked])
+    return [products[pk] for pk, _ in ranked if pk in products]
+
+
+def similar_product_ids(product_id, limit=8):
+    """内容相似的商品 ID（按向量余弦相似度排序），不访问数据库；商品不在存储中时返回空列表"""
+    return [pk for pk, _ in get_embedding_store().similar([product_id], k=limit)[0]]
+
+
+def similar_products(product_id, limit=8):
+    return _products_in_order(get_embedding_store().similar([product_id], k=limit)[0])
+
+
+def search_products(text, limit=6, min_score=MIN_TEXT_SCORE, queryset=None):
+    """与一段自然语言描述最相近的商品；给定 queryset 时只返回其中的商品，保持相似度顺序"""
+    k = limit if queryset is None else limit * FILTERED_SEARCH_FACTOR
+    ranked = get_embedding_store().search(text, k=k, min_score=min_score)
+    return _products_in_order(ranked, queryset)[:limit]
@@ -0,0 +1,273 @@
+# core_ecommerce/events.py
+
+"""用户行为（UserBehavior）事件的异步批量写入。
+
+接口只校验事件并追加到缓冲区，立即返回，不在请求中写数据库；
+缓冲区由后台消费者取出后按大批量 bulk_create 写入（见 drain_events）。
+缓冲区可插拔（settings.BEHAVIOR_EVENT_BUFFER）：
+- locmem：进程内队列，由同进程的后台线程每 FLUSH_INTERVAL 秒写入一次（开发/单进程部署）；
+- redis：Redis 列表（默认复用 Celery 的 Redis），由 Celery 定时任务 drain_behavior_events 消费。
+
+缓冲区有容量上限：写满时新事件直接丢弃并计数（背压），而不是让请求等待；
+Redis 不可用时同样丢弃计数。接受/丢弃/无效/已写入等计数可通过 stats() 查看。
+进入缓冲区的事件同时发布到实时动态（见 activity_feed.py）。
+取出即从缓冲区删除，消费者在写入前崩溃会丢失这一批事件（行为数据允许少量丢失）。
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .activity_feed import publish_events, reset_activity_feed
+from .models import Product, UserBehavior, behavior_partition
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BACKEND': 'locmem',
+    'LOCATION': None,
+    'CAPACITY': 100000,
+    # locmem 后台线程的写入间隔（秒），None 表示不启动线程，只能手动 drain_events()
+    'FLUSH_INTERVAL': 5,
+    'KEY_PREFIX': 'behavior_events',
+}
+MAX_EVENTS_PER_REQUEST = 500
+DRAIN_BATCH_SIZE = 5000
+BEHAVIOR_TYPES = {value for value, _ in UserBehavior.BEHAVIOR_TYPES}
+
+
+class LocalEventBuffer:
+    """进程内有界队列"""
+
+    def __init__(self, capacity, flush_interval=None, **kwargs):
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self._queue = deque()
+        self._metrics = Counter()
+        self._mutex = threading.Lock()
+        self._flusher = None
+
+    def push(self, events):
+        with self._mutex:
+            room = max(self.capacity - len(self._queue), 0)
+            self._queue.extend(events[:room])
+            self._metrics['accepted'] += min(room, len(events))
+            self._metrics['dropped'] += max(len(events) - room, 0)
+        self._ensure_flusher()
+        return min(room, len(events))
+
+    def pop(self, count):
+        with self._mutex:
+            return [self._queue.popleft() for _ in range(min(count, len(self._queue)))]
+
+    def incr(self, metric, amount=1):
+        with self._mutex:
+            self._metrics[metric] += amount
+
+    def metrics(self):
+        with self._mutex:
+            return {**self._metrics, 'backlog': len(self._queue), 'capacity': self.capacity}
+
+    def clear(self):
+        with self._mutex:
+            self._queue.clear()
+            self._metrics.clear()
+
+    def _ensure_flusher(self):
+        if self.flush_interval is None or self._flusher is not None:
+            return
+        with self._mutex:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_forever, name='behavior-event-flusher', daemon=True)
+                self._flusher.start()
+
+    def _flush_forever(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                drain_events(self)
+            except Exception:
+                logger.exception('Failed to flush behavior events')
+            finally:
+                close_old_connections()
+
+
+class RedisEventBuffer:
+    """Redis 列表：Lua 脚本中检查容量并 RPUSH 追加，MULTI 中 LRANGE + LTRIM 原子地取出一批"""
+
+    # 容量检查与追加在同一个脚本中执行，并发写入也不会超过容量
+    PUSH_SCRIPT = """
+    local count = #ARGV - 1
+    local room = tonumber(ARGV[1]) - redis.call('LLEN', KEYS[1])
+    local accepted = math.max(math.min(room, count), 0)
+    if accepted > 0 then
+        redis.call('RPUSH', KEYS[1], unpack(ARGV, 2, accepted + 1))
+        redis.call('HINCRBY', KEYS[2], 'accepted', accepted)
+    end
+    if count > accepted then
+        redis.call('HINCRBY', KEYS[2], 'dropped', count - accepted)
+    end
+    return accepted
+    """
+
+    def __init__(self, capacity, location=None, key_prefix='behavior_events', **kwargs):
+        import redis
+
+        # 超时很短：Redis 故障时丢弃事件，而不是拖慢用户请求
+        self.client = redis.Redis.from_url(
+            location or settings.CELERY_BROKER_URL, socket_timeout=0.1, socket_connect_timeout=0.1,
+        )
+        self.capacity = capacity
+        self.queue_key = f'{key_prefix}:queue'
+        self.metrics_key = f'{key_prefix}:metrics'
+        self._push = self.client.register_script(self.PUSH_SCRIPT)
+
+    def push(self, events):
+        return int(self._push(keys=[self.queue_key, self.metrics_key],
+                              args=[self.capacity, *[json.dumps(event) for event in events]]))
+
+    def pop(self, count):
+        pipe = self.client.pipeline()
+        pipe.lrange(self.queue_key, 0, count - 1)
+        pipe.ltrim(self.queue_key, count, -1)
+        raw, _ = pipe.execute()
+        return [json.loads(item) for item in raw]
+
+    def incr(self, metric, amount=1):
+        self.client.hincrby(self.metrics_key, metric, amount)
+
+    def metrics(self):
+        metrics = {k.decode(): int(v) for k, v in self.client.hgetall(self.metrics_key).items()}
+        return {**metrics, 'backlog': self.client.llen(self.queue_key), 'capacity': self.capacity}
+
+    def clear(self):
+        self.client.delete(self.queue_key, self.metrics_key)
+
+
+BACKENDS = {
+    'locmem': LocalEventBuffer,
+    'redis': RedisEventBuffer,
+}
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_event_buffer():
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                config = {**DEFAULTS, **getattr(settings, 'BEHAVIOR_EVENT_BUFFER', {})}
+                _buffer = BACKENDS[config['BACKEND']](
+                    capacity=config['CAPACITY'],
+                    flush_interval=config['FLUSH_INTERVAL'],
+                    location=config['LOCATION'],
+                    key_prefix=config['KEY_PREFIX'],
+                )
+    return _buffer
+
+
+def reset_event_buffer():
+    """丢弃当前实例（修改 settings.BEHAVIOR_EVENT_BUFFER 后调用），实时动态跟随同一配置"""
+    global _buffer
+    _buffer = None
+    reset_activity_feed()
+
+
+def normalize_events(events, user_id=None, session_id='', now=None):
+    """校验客户端提交的事件，返回 (可写入的事件列表, 无效事件数)。
+
+    事件格式：{'type': 'view', 'product_id': 1, 'metadata': {...}}；
+    用户和会话取自请求，时间为服务端接收时间。
+    """
+    received_at = (now or timezone.now()).isoformat()
+    valid = []
+    for event in events:
+        try:
+            behavior_type = event.get('type') or event['behavior_type']
+            product_id = event.get('product_id')
+            product_id = int(product_id) if product_id not in (None, '') else None
+            metadata = event.get('metadata') or {}
+        except (KeyError, TypeError, ValueError, AttributeError):
+            continue
+        if behavior_type not in BEHAVIOR_TYPES or not isinstance(metadata, dict):
+            continue
+        valid.append({
+            'user_id': user_id,
+            'session_id': str(event.get('session_id') or session_id or '')[:100],
+            'product_id': product_id,
+            'behavior_type': behavior_type,
+            'metadata': metadata,
+            'created_at': received_at,
+        })
+    return valid, len(events) - len(valid)
+
+
+def track_events(events, user_id=None, session_id=''):
+    """校验并追加到缓冲区，返回 {'accepted', 'dropped', 'invalid'}；不访问数据库"""
+    buffer = get_event_buffer()
+    valid, invalid = normalize_events(events, user_id=user_id, session_id=session_id)
+    try:
+        if invalid:
+            buffer.incr('invalid', invalid)
+        accepted = buffer.push(valid) if valid else 0
+    except Exception:
+        # 缓冲区不可用（Redis 故障等）：丢弃事件，不影响请求
+        logger.warning('Behavior event buffer unavailable, dropping %d events', len(valid), exc_info=True)
+        return {'accepted': 0, 'dropped': len(valid), 'invalid': invalid}
+    # 同时推送到实时动态（见 activity_feed.py）
+    publish_events(valid[:accepted])
+    return {'accepted': accepted, 'dropped': len(valid) - accepted, 'invalid': invalid}
+
+
+def drain_events(buffer=None, batch_size=DRAIN_BATCH_SIZE, max_batches=None):
+    """取出缓冲区中的事件，按 batch_size 一批 bulk_create，返回写入的行数。
+
+    引用了已删除商品的事件在写入前剔除，计为 invalid；已删除用户的事件照常写入，
+    用户置空（与 UserBehavior.user 的 SET_NULL 一致）。事件取出即从缓冲区删除，
+    写入前必须剔除所有会违反外键约束的引用，否则整批事件丢失。
+    """
+    buffer = buffer or get_event_buffer()
+    written = batches = 0
+    while max_batches is None or batches < max_batches:
+        events = buffer.pop(batch_size)
+        if not events:
+            break
+        batches += 1
+        product_ids = {event['product_id'] for event in events if event['product_id'] is not None}
+        existing = set(Product.objects.filter(id__in=product_ids).values_list('id', flat=True)) if product_ids else set()
+        user_ids = {event['user_id'] for event in events if event['user_id'] is not None}
+        users = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True)) if user_ids else set()
+        rows = []
+        for event in events:
+            if event['product_id'] is not None and event['product_id'] not in existing:
+                continue
+            created_at = parse_datetime(event['created_at'])
+            rows.append(UserBehavior(
+                user_id=event['user_id'] if event['user_id'] in users else None,
+                session_id=event['session_id'],
+                product_id=event['product_id'],
+                behavior_type=event['behavior_type'],
+                metadata=event['metadata'],
+                created_at=created_at,
+                partition=behavior_partition(created_at),
+            ))
+        UserBehavior.objects.bulk_create(rows, batch_size=1000)
+        written += len(rows)
+        buffer.incr('written', len(rows))
+        if len(rows) < len(events):
+            buffer.incr('invalid', len(events) - len(rows))
+    return written
+
+
+def stats():
+    return get_event_buffer().metrics()
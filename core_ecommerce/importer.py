@@ -0,0 +1,352 @@
+# core_ecommerce/importer.py
+
+"""商品 CSV 流式导入。
+
+上传文件按行流式解码，不会一次性读入内存；每攒够一批 SKU 就用一次
+``in_bulk`` 查询区分新增/更新，再通过 ``bulk_create``/``bulk_update``
+在同一个事务内写入。单行数据出错只记录到错误报告中，不影响其他行。
+"""
+
+import codecs
+import csv
+import time
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .catalog import bump_catalog_version
+from .models import Product, ProductImportJob
+from .search import index_product_ids
+
+DEFAULT_BATCH_SIZE = 1000
+READ_CHUNK_SIZE = 64 * 1024
+MAX_ERROR_REPORTS = 1000
+REQUIRED_COLUMNS = ['sku']
+UPDATE_FIELDS = ['name', 'price', 'stock', 'category']
+# 心跳超过该时长未更新的 RUNNING 任务视为 worker 已崩溃，可被重新接管
+STALE_JOB_AFTER = timedelta(minutes=5)
+
+
+class CSVImportError(Exception):
+    """整个文件无法继续导入（表头缺失、编码错误等）"""
+
+
+class ImportResult:
+    """一次导入的统计结果"""
+
+    def __init__(self, rows=0, created=0, updated=0, failed=0, errors=None):
+        self.rows = rows
+        self.created = created
+        self.updated = updated
+        self.failed = failed
+        self.errors = list(errors or [])
+        self.started_at = time.monotonic()
+        self.elapsed = 0.0
+
+    def add_error(self, line, sku, message):
+        self.failed += 1
+        if len(self.errors) < MAX_ERROR_REPORTS:
+            self.errors.append({'line': line, 'sku': sku, 'error': message})
+
+    def finish(self):
+        self.elapsed = time.monotonic() - self.started_at
+
+    @property
+    def rows_per_second(self):
+        if self.elapsed <= 0:
+            return float(self.rows)
+        return self.rows / self.elapsed
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'updated': self.updated,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+            'elapsed_seconds': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+        }
+
+
+class ProductCSVImporter:
+    """按批次导入商品 CSV。
+
+    Expected CSV headers: name,sku,price,stock,category（只有 sku 必填）
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, encoding='utf-8', on_checkpoint=None):
+        self.batch_size = batch_size
+        self.encoding = encoding
+        # on_checkpoint(result, offset, line_no) 在每批数据的事务内调用，用于保存断点
+        self.on_checkpoint = on_checkpoint
+        self.offset = 0
+        self.fieldnames = []
+
+    def _iter_lines(self, stream, line_offset=0):
+        """从流的当前位置逐行解码，并累计已消费的字节数（self.offset）。
+
+        UTF-8 中换行符不会出现在多字节字符内部，按行解码是安全的。
+        """
+        decoder = codecs.getdecoder(self.encoding)
+        line_no = line_offset
+        pending = b''
+        while True:
+            chunk = stream.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            pending += chunk
+            lines = pending.split(b'\n')
+            pending = lines.pop()
+            for raw in lines:
+                line_no += 1
+                yield self._decode_line(decoder, raw + b'\n', line_no)
+        if pending:
+            yield self._decode_line(decoder, pending, line_no + 1)
+
+    def _decode_line(self, decoder, raw, line_no):
+        self.offset += len(raw)
+        if self.offset == len(raw) and raw.startswith(codecs.BOM_UTF8):
+            raw = raw[len(codecs.BOM_UTF8):]
+        try:
+            return decoder(raw)[0]
+        except UnicodeDecodeError as e:
+            raise CSVImportError(f'第 {line_no} 行不是有效的 {self.encoding} 编码: {e}')
+
+    def _parse_row(self, row):
+        """把一行 CSV 转为字段字典，只包含该行实际提供的字段"""
+        values = {}
+        name = (row.get('name') or '').strip()
+        if name:
+            values['name'] = name[:200]
+        price = (row.get('price') or '').strip()
+        if price:
+            try:
+                values['price'] = Decimal(price).quantize(Decimal('0.01'))
+            except InvalidOperation:
+                raise ValueError(f'价格格式错误: {price}')
+            if values['price'] < 0:
+                raise ValueError(f'价格不能为负数: {price}')
+        stock = (row.get('stock') or '').strip()
+        if stock:
+            try:
+                values['stock'] = int(stock)
+            except ValueError:
+                raise ValueError(f'库存格式错误: {stock}')
+        category = (row.get('category') or '').strip()
+        if category:
+            values['category'] = category[:100]
+        return values
+
+    def _flush(self, batch, result, checkpoint=None):
+        """在一个事务内写入一批数据：一次查询已有 SKU，批量新增和更新。
+
+        checkpoint 为 (offset, line_no)，会连同批次数据在同一事务内交给 on_checkpoint，
+        保证断点位置与已落库的数据严格一致。
+        """
+        if not batch and checkpoint is None:
+            return
+        with transaction.atomic():
+            to_create = []
+            to_update = []
+            if batch:
+                existing = Product.objects.only('id', 'sku', *UPDATE_FIELDS).in_bulk(list(batch), field_name='sku')
+                for sku, values in batch.items():
+                    product = existing.get(sku)
+                    if product is None:
+                        to_create.append(Product(
+                            sku=sku,
+                            name=values.get('name', ''),
+                            price=values.get('price', Decimal('0.00')),
+                            stock=values.get('stock', 0),
+                            category=values.get('category', 'Uncategorized'),
+                        ))
+                    else:
+                        for field, value in values.items():
+                            setattr(product, field, value)
+                        # 价格/库存/分类可能变化，交给增量评分任务按指纹判断是否需要重新评分
+                        product.score_dirty = True
+                        to_update.append(product)
+                if to_create:
+                    Product.objects.bulk_create(to_create, batch_size=self.batch_size)
+                if to_update:
+                    Product.objects.bulk_update(to_update, UPDATE_FIELDS + ['score_dirty'], batch_size=self.batch_size)
+                # 批量写入不触发 post_save，这里手动同步搜索索引和目录版本号
+                index_product_ids(p.pk for p in to_create + to_update)
+                bump_catalog_version()
+            result.created += len(to_create)
+            result.updated += len(to_update)
+            if checkpoint is not None and self.on_checkpoint is not None:
+                self.on_checkpoint(result, *checkpoint)
+        batch.clear()
+
+    def _rows(self, reader, line_offset):
+        """逐行读取；CSV 格式错误（字段超过长度上限等）之后的内容无法可靠解析，整个文件停止导入"""
+        try:
+            yield from reader
+        except csv.Error as e:
+            # 出错的行尚未计入 line_num
+            raise CSVImportError(f'第 {line_offset + reader.line_num + 1} 行 CSV 格式错误: {e}')
+
+    def run(self, stream, result=None, fieldnames=None, line_offset=0):
+        """导入二进制流（上传文件或 open(path, 'rb')），返回 ImportResult。
+
+        断点续传时传入已保存的 result、表头 fieldnames 和起始行号 line_offset，
+        并事先把 stream seek 到断点位置。
+        """
+        result = result or ImportResult()
+        self.offset = stream.tell() if hasattr(stream, 'tell') else 0
+        reader = csv.DictReader(self._iter_lines(stream, line_offset), fieldnames=fieldnames)
+        try:
+            fieldnames = [name.strip() for name in (reader.fieldnames or [])]
+        except csv.Error as e:
+            raise CSVImportError(f'CSV 表头格式错误: {e}')
+        missing = [col for col in REQUIRED_COLUMNS if col not in fieldnames]
+        if missing:
+            raise CSVImportError(f'CSV 缺少必需列: {", ".join(missing)}')
+        reader.fieldnames = fieldnames
+        self.fieldnames = fieldnames
+
+        batch = {}
+        # 上一行处理完之后的位置，即可以安全续传的断点
+        checkpoint = (self.offset, line_offset + reader.line_num)
+        for row in self._rows(reader, line_offset):
+            sku = (row.get('sku') or '').strip()
+            # 同一批次内重复的 SKU：先落库前面的数据，保证后一行按"更新"处理
+            if sku in batch:
+                self._flush(batch, result, checkpoint)
+            result.rows += 1
+            line_no = line_offset + reader.line_num
+            if not sku:
+                result.add_error(line_no, '', '缺少 SKU')
+            elif len(sku) > 50:
+                result.add_error(line_no, sku, 'SKU 长度超过 50')
+            else:
+                try:
+                    batch[sku] = self._parse_row(row)
+                except ValueError as e:
+                    result.add_error(line_no, sku, str(e))
+            checkpoint = (self.offset, line_no)
+            if len(batch) >= self.batch_size:
+                self._flush(batch, result, checkpoint)
+        self._flush(batch, result, checkpoint)
+        result.finish()
+        return result
+
+
+def claim_import_job(job_id):
+    """原子地把任务标记为 RUNNING；任务已完成或正被其他 worker 处理时返回 None"""
+    now = timezone.now()
+    claimable = Q(status='PENDING') | Q(status='RUNNING', heartbeat_at__lt=now - STALE_JOB_AFTER)
+    claimed = ProductImportJob.objects.filter(claimable, id=job_id).update(status='RUNNING', heartbeat_at=now)
+    if not claimed:
+        return None
+    job = ProductImportJob.objects.get(id=job_id)
+    if job.started_at is None:
+        job.started_at = now
+        job.save(update_fields=['started_at'])
+    return job
+
+
+def run_import_job(job_id, batch_size=DEFAULT_BATCH_SIZE):
+    """从上次断点继续处理导入任务。
+
+    每批数据与断点（字节偏移、行号、计数）在同一事务内提交，
+    worker 崩溃后重新执行只会从最后一个已提交的批次之后继续。
+    """
+    job = claim_import_job(job_id)
+    if job is None:
+        return None
+
+    def save_checkpoint(result, offset, line_no):
+        ProductImportJob.objects.filter(id=job.id).update(
+            offset=offset,
+            line_no=line_no,
+            header=importer.fieldnames,
+            rows_processed=result.rows,
+            rows_failed=result.failed,
+            created_count=result.created,
+            updated_count=result.updated,
+            errors=result.errors,
+            heartbeat_at=timezone.now(),
+        )
+
+    importer = ProductCSVImporter(batch_size=batch_size, on_checkpoint=save_checkpoint)
+    result = ImportResult(
+        rows=job.rows_processed,
+        created=job.created_count,
+        updated=job.updated_count,
+        failed=job.rows_failed,
+        errors=job.errors,
+    )
+    try:
+        with job.file.open('rb') as stream:
+            stream.seek(job.offset)
+            importer.run(
+                stream,
+                result=result,
+                fieldnames=job.header if job.offset else None,
+                line_offset=job.line_no,
+            )
+    except CSVImportError as e:
+        # 文件本身无法解析（编码、表头、CSV 格式），重试也不会成功：记录在任务上，不再抛出
+        ProductImportJob.objects.filter(id=job.id).update(
+            status='FAILED', error_message=str(e), finished_at=timezone.now(),
+        )
+        job.refresh_from_db()
+        return job
+    except Exception as e:
+        ProductImportJob.objects.filter(id=job.id).update(
+            status='FAILED', error_message=str(e), finished_at=timezone.now(),
+        )
+        raise
+    ProductImportJob.objects.filter(id=job.id).update(status='COMPLETED', finished_at=timezone.now())
+    job.refresh_from_db()
+    return job
+
+
+def stalled_import_job_ids():
+    """需要重新投递的任务：心跳过期的 RUNNING 任务（worker 崩溃后遗留）和长时间未被消费的 PENDING 任务"""
+    cutoff = timezone.now() - STALE_JOB_AFTER
+    return list(ProductImportJob.objects.filter(
+        Q(status='RUNNING', heartbeat_at__lt=cutoff) | Q(status='PENDING', created_at__lt=cutoff),
+    ).values_list('id', flat=True))
+
+
+def import_job_progress(job):
+    """导入任务进度：已处理/失败行数、吞吐量和预计剩余时间"""
+    done = job.offset
+    remaining = max(job.total_bytes - done, 0)
+    elapsed = None
+    eta = None
+    rows_per_second = None
+    if job.started_at:
+        end = job.finished_at or job.heartbeat_at or timezone.now()
+        elapsed = max((end - job.started_at).total_seconds(), 0.0)
+        if elapsed > 0:
+            rows_per_second = round(job.rows_processed / elapsed, 1)
+            if done > 0 and job.status == 'RUNNING':
+                eta = round(remaining * elapsed / done, 1)
+    if job.status == 'COMPLETED':
+        eta = 0
+    return {
+        'job_id': job.id,
+        'status': job.status,
+        'rows_processed': job.rows_processed,
+        'rows_failed': job.rows_failed,
+        'created': job.created_count,
+        'updated': job.updated_count,
+        'bytes_processed': done,
+        'total_bytes': job.total_bytes,
+        'percent': round(done * 100 / job.total_bytes, 1) if job.total_bytes else 0,
+        'rows_per_second': rows_per_second,
+        'eta_seconds': eta,
+        'errors': job.errors,
+        'error_message': job.error_message,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
@@ -0,0 +1,15 @@
+# core_ecommerce/management/benchmark.py
+
+"""基准测试命令（bench_*）的公共工具"""
+
+from contextlib import contextmanager
+
+from django.db import transaction
+
+
+@contextmanager
+def rolled_back():
+    """在事务中生成测试数据并执行基准，结束后回滚（出错时同样回滚），不在数据库中留下数据"""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
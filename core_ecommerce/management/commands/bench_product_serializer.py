@@ -0,0 +1,57 @@
+"""
+Django管理命令：对比商品列表的 ProductSerializer 与 .values() 快速序列化的耗时
+使用方法: python manage.py bench_product_serializer [--rows 100 1000 10000] [--repeat 3]
+
+测试数据在事务中生成，结束后回滚，不影响已有数据。
+"""
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from core_ecommerce.management.benchmark import rolled_back
+from core_ecommerce.models import Product
+from core_ecommerce.serializers import ProductSerializer, product_list_values, serialize_product_rows
+
+
+class Command(BaseCommand):
+    help = '商品列表序列化基准测试（ProductSerializer vs 快速序列化）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[100, 1000, 10000], help='列表行数')
+        parser.add_argument('--repeat', type=int, default=3, help='每种规模重复次数（取最快一次）')
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self.run(options['rows'], options['repeat'])
+
+    def run(self, sizes, repeat):
+        renderer = JSONRenderer()
+        Product.objects.bulk_create([
+            Product(
+                name=f'Bench {i}', sku=f'BENCH-{i:06d}', price=Decimal('19.90') + i % 50,
+                original_price=Decimal('29.90') if i % 3 else None, stock=i % 100, category=f'Cat {i % 20}',
+                description='benchmark product ' * 5, image_url='' if i % 4 == 0 else f'https://example.com/{i}.jpg',
+                rating=4.0 + (i % 10) / 10, sales_count=i, potential_score=(i % 97) / 97,
+            )
+            for i in range(max(sizes))
+        ], batch_size=1000)
+
+        self.stdout.write(f'{"rows":>8} {"serializer(ms)":>16} {"fast(ms)":>10} {"speedup":>8}')
+        for size in sizes:
+            queryset = Product.objects.filter(sku__startswith='BENCH-').order_by('-potential_score', '-id')[:size]
+            slow = fast = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                slow_body = renderer.render(ProductSerializer(list(queryset), many=True).data)
+                slow = min(slow, time.perf_counter() - start)
+
+                start = time.perf_counter()
+                fast_body = renderer.render(serialize_product_rows(product_list_values(queryset)))
+                fast = min(fast, time.perf_counter() - start)
+            if slow_body != fast_body:
+                self.stderr.write(self.style.ERROR(f'{size} 行：两种序列化输出不一致'))
+                return
+            self.stdout.write(f'{size:>8} {slow * 1000:>16.1f} {fast * 1000:>10.1f} {slow / fast:>7.1f}x')
+        self.stdout.write(self.style.SUCCESS('完成！两种序列化输出逐字节一致'))
@@ -0,0 +1,19 @@
+"""
+Django管理命令：按商品名称/分类/描述重新计算语义向量并切换到新版本
+使用方法: python manage.py build_product_embeddings [--dimensions 64]
+"""
+from django.core.management.base import BaseCommand
+from core_ecommerce import embeddings
+
+
+class Command(BaseCommand):
+    help = '重新计算商品语义向量（内存映射文件）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dimensions', type=int, default=None, help='向量维数（默认取 settings.PRODUCT_EMBEDDINGS）')
+
+    def handle(self, *args, **options):
+        result = embeddings.build_product_embeddings(dimensions=options['dimensions'])
+        self.stdout.write(self.style.SUCCESS(
+            f'完成！{result["products"]} 个商品，{result["dimensions"]} 维，版本 {result["version"]}'
+        ))
@@ -0,0 +1,21 @@
+"""
+Django管理命令：按共同浏览/共同购买重新计算相关商品索引
+使用方法: python manage.py build_related_products [--top-k 20] [--days 90] [--min-support 2]
+"""
+from django.core.management.base import BaseCommand
+from core_ecommerce import related
+
+
+class Command(BaseCommand):
+    help = '重新计算相关商品索引（RelatedProduct）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=related.RELATED_TOP_K, help='每个商品保留的相关商品数')
+        parser.add_argument('--days', type=int, default=related.LOOKBACK_DAYS, help='只使用最近 N 天的订单和行为')
+        parser.add_argument('--min-support', type=int, default=related.MIN_SUPPORT, help='最少共现篮子数')
+
+    def handle(self, *args, **options):
+        result = related.rebuild_related_products(
+            top_k=options['top_k'], days=options['days'], min_support=options['min_support'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'完成！{result["products"]} 个商品共写入 {result["links"]} 条相关商品'))
@@ -0,0 +1,23 @@
+"""
+Django管理命令：按用户行为和订单重新训练个性化推荐（item-kNN）
+使用方法: python manage.py build_user_recommendations [--top-k 20] [--neighbours 50] [--days 180] [--min-support 2]
+"""
+from django.core.management.base import BaseCommand
+from core_ecommerce import recommendations
+
+
+class Command(BaseCommand):
+    help = '重新计算每个用户的个性化推荐（UserRecommendation）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=recommendations.RECOMMENDATION_TOP_K, help='每个用户保留的推荐数')
+        parser.add_argument('--neighbours', type=int, default=recommendations.NEIGHBOURS, help='每个商品保留的相似商品数')
+        parser.add_argument('--days', type=int, default=recommendations.LOOKBACK_DAYS, help='只使用最近 N 天的订单和行为')
+        parser.add_argument('--min-support', type=int, default=recommendations.MIN_SUPPORT, help='最少共同交互用户数')
+
+    def handle(self, *args, **options):
+        result = recommendations.rebuild_user_recommendations(
+            top_k=options['top_k'], neighbours=options['neighbours'], days=options['days'],
+            min_support=options['min_support'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'完成！{result["users"]} 个用户共写入 {result["items"]} 条推荐'))
@@ -0,0 +1,17 @@
+"""
+Django管理命令：按全部订单重建每日/每小时销售汇总表
+使用方法: python manage.py rebuild_sales_rollups [--days 30]
+"""
+from django.core.management.base import BaseCommand
+from core_ecommerce.rollups import reconcile_sales_rollups
+
+
+class Command(BaseCommand):
+    help = '按原始订单重建销售汇总表（默认全部日期）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='只重建最近 N 天')
+
+    def handle(self, *args, **options):
+        result = reconcile_sales_rollups(days=options['days'])
+        self.stdout.write(self.style.SUCCESS(f'完成！已写入 {result["days"]} 天、{result["hours"]} 个小时的汇总数据'))
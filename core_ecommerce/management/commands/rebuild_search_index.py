@@ -0,0 +1,16 @@
+"""
+Django管理命令：全量重建商品搜索索引
+使用方法: python manage.py rebuild_search_index
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core_ecommerce.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = '全量重建商品全文检索索引'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'完成！已索引 {total} 个商品'))
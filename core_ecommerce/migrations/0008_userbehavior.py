@@ -0,0 +1,33 @@
+# Generated by Django 4.2.18 on 2026-10-17 01:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core_ecommerce', '0007_restocksuggestion_inventoryalert'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserBehavior',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_id', models.CharField(blank=True, max_length=100, verbose_name='会话ID')),
+                ('behavior_type', models.CharField(choices=[('view', '浏览'), ('click', '点击'), ('add_to_cart', '加入购物车'), ('purchase', '购买'), ('like', '点赞/收藏'), ('review', '评价')], max_length=20, verbose_name='行为类型')),
+                ('metadata', models.JSONField(blank=True, default=dict, verbose_name='元数据')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='行为时间')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core_ecommerce.product', verbose_name='商品')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='用户')),
+            ],
+            options={
+                'verbose_name': '用户行为',
+                'verbose_name_plural': '用户行为',
+                'indexes': [models.Index(fields=['user', 'behavior_type'], name='core_ecomme_user_id_b6451c_idx'), models.Index(fields=['product', 'behavior_type'], name='core_ecomme_product_339acc_idx'), models.Index(fields=['created_at'], name='core_ecomme_created_5a3d1b_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.18 on 2026-10-17 01:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core_ecommerce', '0008_userbehavior'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(upload_to='imports/%Y%m%d/', verbose_name='上传文件')),
+                ('status', models.CharField(choices=[('PENDING', '排队中'), ('RUNNING', '导入中'), ('COMPLETED', '已完成'), ('FAILED', '失败')], default='PENDING', max_length=20, verbose_name='状态')),
+                ('total_bytes', models.BigIntegerField(default=0, verbose_name='文件大小')),
+                ('offset', models.BigIntegerField(default=0, verbose_name='已处理字节')),
+                ('line_no', models.IntegerField(default=0, verbose_name='已处理行号')),
+                ('header', models.JSONField(blank=True, default=list, verbose_name='CSV表头')),
+                ('rows_processed', models.IntegerField(default=0, verbose_name='已处理行数')),
+                ('rows_failed', models.IntegerField(default=0, verbose_name='失败行数')),
+                ('created_count', models.IntegerField(default=0, verbose_name='新增数')),
+                ('updated_count', models.IntegerField(default=0, verbose_name='更新数')),
+                ('errors', models.JSONField(blank=True, default=list, verbose_name='错误明细')),
+                ('error_message', models.TextField(blank=True, verbose_name='失败原因')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='开始时间')),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True, verbose_name='最后心跳')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='完成时间')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='创建人')),
+            ],
+            options={
+                'verbose_name': '商品导入任务',
+                'verbose_name_plural': '商品导入任务',
+            },
+        ),
+    ]
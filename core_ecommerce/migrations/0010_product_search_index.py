@@ -0,0 +1,45 @@
+# Generated by Django 4.2.18 on 2026-10-17 02:05
+
+from django.db import migrations
+
+SEARCH_TABLE = 'core_ecommerce_product_search'
+
+
+def create_search_index(apps, schema_editor):
+    """SQLite 下创建 FTS5 虚拟表并回填已有商品；其他数据库使用 ORM 回退实现，无需建表"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    from core_ecommerce.search import INDEXED_FIELDS, document_for
+
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+        f"{', '.join(INDEXED_FIELDS)}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    Product = apps.get_model('core_ecommerce', 'Product')
+    rows = [
+        [row['id'], *document_for(row)]
+        for row in Product.objects.values('id', *INDEXED_FIELDS).iterator()
+    ]
+    if rows:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, {', '.join(INDEXED_FIELDS)}) VALUES (%s, %s, %s, %s, %s)",
+                rows,
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_ecommerce', '0009_productimportjob'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
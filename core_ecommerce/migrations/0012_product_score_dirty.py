@@ -0,0 +1,27 @@
+# Generated by Django 4.2.18 on 2026-10-17 01:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_ecommerce', '0011_product_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='score_dirty',
+            field=models.BooleanField(default=True, verbose_name='待重新评分'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='score_fingerprint',
+            field=models.CharField(blank=True, max_length=16, verbose_name='评分输入指纹'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('score_dirty', True)), fields=['id'], name='product_score_dirty_idx'),
+        ),
+    ]
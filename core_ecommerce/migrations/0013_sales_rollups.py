@@ -0,0 +1,56 @@
+# Generated by Django 4.2.18 on 2026-10-17 01:51
+
+from django.db import migrations, models
+
+
+def backfill_rollups(apps, schema_editor):
+    """按已有订单全量回填汇总表，上线后看板即可看到历史数据"""
+    from core_ecommerce.rollups import reconcile_sales_rollups
+
+    reconcile_sales_rollups(days=None, apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_ecommerce', '0012_product_score_dirty'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='日期')),
+                ('order_count', models.IntegerField(default=0, verbose_name='订单数')),
+                ('paid_orders', models.IntegerField(default=0, verbose_name='已付款订单数')),
+                ('paid_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='销售额')),
+                ('new_buyers', models.IntegerField(default=0, verbose_name='首次下单用户数')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '每日销售汇总',
+                'verbose_name_plural': '每日销售汇总',
+            },
+        ),
+        migrations.CreateModel(
+            name='HourlySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(unique=True, verbose_name='小时')),
+                ('order_count', models.IntegerField(default=0, verbose_name='订单数')),
+                ('paid_orders', models.IntegerField(default=0, verbose_name='已付款订单数')),
+                ('paid_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='销售额')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '每小时销售汇总',
+                'verbose_name_plural': '每小时销售汇总',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_at'], name='order_created_idx'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.18 on 2026-10-17 01:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_ecommerce', '0013_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(verbose_name='预占数量')),
+                ('status', models.CharField(choices=[('ACTIVE', '预占中'), ('COMMITTED', '已出库'), ('CONVERTED', '已转为订单'), ('RELEASED', '已释放')], default='ACTIVE', max_length=20, verbose_name='状态')),
+                ('expires_at', models.DateTimeField(verbose_name='过期时间')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('cart', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reservations', to='core_ecommerce.cart', verbose_name='购物车')),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reservations', to='core_ecommerce.order', verbose_name='订单')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='core_ecommerce.product', verbose_name='商品')),
+            ],
+            options={
+                'verbose_name': '库存预占',
+                'verbose_name_plural': '库存预占',
+                'indexes': [models.Index(condition=models.Q(('status', 'ACTIVE')), fields=['expires_at'], name='reservation_active_exp_idx'), models.Index(condition=models.Q(('status', 'ACTIVE')), fields=['product'], name='reservation_active_prod_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.18 on 2026-10-17 01:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('core_ecommerce', '0014_stockreservation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CounterShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='对象ID')),
+                ('field', models.CharField(max_length=50, verbose_name='字段')),
+                ('shard', models.PositiveSmallIntegerField(verbose_name='分片')),
+                ('value', models.BigIntegerField(default=0, verbose_name='待合并增量')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype', verbose_name='模型')),
+            ],
+            options={
+                'verbose_name': '计数器分片',
+                'verbose_name_plural': '计数器分片',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='countershard',
+            constraint=models.UniqueConstraint(fields=('content_type', 'object_id', 'field', 'shard'), name='counter_shard_unique'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.18 on 2026-10-17 02:08
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_ecommerce', '0017_relatedproduct'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userbehavior',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='行为时间'),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 4.2.18 on 2026-10-17 02:10
+
+import datetime
+
+import core_ecommerce.models
+from django.db import migrations, models
+from django.db.models import Max, Min
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def backfill_partitions(apps, schema_editor):
+    """按月份区间批量回填已有行为的分区键"""
+    UserBehavior = apps.get_model('core_ecommerce', 'UserBehavior')
+    bounds = UserBehavior.objects.aggregate(first=Min('created_at'), last=Max('created_at'))
+    if bounds['first'] is None:
+        return
+    first = timezone.localtime(bounds['first'])
+    month = timezone.make_aware(datetime.datetime(first.year, first.month, 1))
+    while month <= bounds['last']:
+        following = timezone.make_aware(datetime.datetime(month.year + month.month // 12, month.month % 12 + 1, 1))
+        UserBehavior.objects.filter(created_at__gte=month, created_at__lt=following).update(
+            partition=month.year * 100 + month.month,
+        )
+        month = following
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_ecommerce', '0018_userbehavior_created_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BehaviorDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='日期')),
+                ('behavior_type', models.CharField(choices=[('view', '浏览'), ('click', '点击'), ('add_to_cart', '加入购物车'), ('purchase', '购买'), ('like', '点赞/收藏'), ('review', '评价')], max_length=20, verbose_name='行为类型')),
+                ('count', models.IntegerField(default=0, verbose_name='次数')),
+            ],
+            options={
+                'verbose_name': '每日用户行为汇总',
+                'verbose_name_plural': '每日用户行为汇总',
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='userbehavior',
+            name='core_ecomme_created_5a3d1b_idx',
+        ),
+        migrations.AddField(
+            model_name='userbehavior',
+            name='partition',
+            field=models.PositiveIntegerField(default=core_ecommerce.models.current_behavior_partition, editable=False, verbose_name='月分区'),
+        ),
+        migrations.RunPython(backfill_partitions, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='userbehavior',
+            index=models.Index(fields=['partition', 'created_at'], name='behavior_partition_idx'),
+        ),
+        migrations.AddField(
+            model_name='behaviordailyrollup',
+            name='product',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core_ecommerce.product', verbose_name='商品'),
+        ),
+        migrations.AddIndex(
+            model_name='behaviordailyrollup',
+            index=models.Index(fields=['product', 'date'], name='behavior_rollup_product_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='behaviordailyrollup',
+            constraint=models.UniqueConstraint(fields=('date', 'product', 'behavior_type'), name='behavior_rollup_unique'),
+        ),
+    ]
@@ -1,9 +1,20 @@
 # core_ecommerce/models.py
 
 from django.db import models
+from django.db.models import F, Q
+from django.db.models.functions import Lower
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
 import json
 
+# 低库存部分索引的覆盖范围：库存低于该值的商品才进入 product_low_stock_idx
+LOW_STOCK_LIMIT = 20
+# AI 选品评分的输入字段：这些字段变化后商品需要重新评分
+SCORE_INPUT_FIELDS = {'category', 'price', 'stock', 'sales_count'}
+# 计入销售额的订单状态
+PAID_ORDER_STATUSES = ['PAID', 'SHIPPED', 'COMPLETED']
+
 class UserProfile(models.Model):
     """用户画像（用于 AI 导购精准推荐） [cite: 1196, 1230]"""
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -14,6 +25,24 @@ class UserProfile(models.Model):
     def __str__(self):
         return f"Profile of {self.user.username}"
 
+class ProductQuerySet(models.QuerySet):
+    """商品查询：封装能命中 Meta.indexes 的过滤写法"""
+
+    def in_category(self, category):
+        """分类忽略大小写匹配；用 LOWER(category) = ? 代替 iexact 的 LIKE，以命中表达式索引"""
+        return self.alias(category_lower=Lower('category')).filter(category_lower=category.lower())
+
+    def low_stock(self, threshold=10):
+        """库存低于 threshold 的商品。
+
+        额外带上部分索引的条件 stock < LOW_STOCK_LIMIT，查询规划器才能确认可以使用该部分索引。
+        """
+        qs = self
+        if threshold <= LOW_STOCK_LIMIT:
+            qs = qs.filter(stock__lt=LOW_STOCK_LIMIT)
+        return qs.filter(stock__lt=threshold)
+
+
 class Product(models.Model):
     """商品管理（包含 AI 选品结果字段） [cite: 1197]"""
     name = models.CharField(max_length=200, verbose_name="商品名称")
@@ -32,13 +61,45 @@ class Product(models.Model):
     # AI 选品模块输出：商品潜力评分 [cite: 1221]
     potential_score = models.FloatField(default=0.0, verbose_name="AI潜力评分")
     selection_reason = models.TextField(blank=True, verbose_name="AI选品推荐理由")
+    # 增量评分：输入变化后置脏，评分任务只处理脏数据；指纹用于跳过输入实际未变的商品
+    score_dirty = models.BooleanField(default=True, verbose_name="待重新评分")
+    score_fingerprint = models.CharField(max_length=16, blank=True, verbose_name="评分输入指纹")
+
+    objects = ProductQuerySet.as_manager()
 
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.score_dirty = True
+        elif SCORE_INPUT_FIELDS.intersection(update_fields):
+            self.score_dirty = True
+            kwargs['update_fields'] = set(update_fields) | {'score_dirty'}
+        super().save(*args, **kwargs)
     
     class Meta:
         verbose_name = "商品"
         verbose_name_plural = "商品管理"
+        # 与实际查询形态对应的索引（见 tests/test_query_plans.py）
+        indexes = [
+            # 商品列表默认排序 / keyset 分页；AI 导购按潜力评分排序
+            models.Index(fields=['-potential_score', '-id'], name='product_score_idx'),
+            # 按价格排序
+            models.Index(fields=['price', 'id'], name='product_price_idx'),
+            # 分类筛选 + 默认排序 / 价格排序
+            models.Index(Lower('category'), F('potential_score').desc(), F('id').desc(), name='product_cat_score_idx'),
+            models.Index(Lower('category'), F('price'), F('id'), name='product_cat_price_idx'),
+            # 热销排行：推荐、看板 TOP 商品、AI 导购兜底
+            models.Index(fields=['-sales_count'], name='product_sales_idx'),
+            # 分类销量统计（覆盖索引，GROUP BY 无需回表）
+            models.Index(fields=['category', 'sales_count'], name='product_cat_sales_idx'),
+            # 低库存监控与预警
+            models.Index(fields=['stock'], condition=Q(stock__lt=LOW_STOCK_LIMIT), name='product_low_stock_idx'),
+            # 增量评分只扫描待评分商品
+            models.Index(fields=['id'], condition=Q(score_dirty=True), name='product_score_dirty_idx'),
+        ]
 
 class Order(models.Model):
     """订单管理 [cite: 1197]"""
@@ -60,9 +121,26 @@ class Order(models.Model):
     # 记录导购/推荐来源，用于效果追踪
     source = models.CharField(max_length=50, blank=True, null=True, verbose_name="来源") 
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='order_created_idx'),
+        ]
+
     def __str__(self):
         return f"Order {self.id} ({self.status})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 记录加载时的状态/金额，保存时据此增量更新销售汇总表（见 rollups.py）
+        instance._rollup_state = instance.rollup_state()
+        return instance
+
+    def rollup_state(self):
+        if self.created_at is None:
+            return None
+        return (self.status, self.total_amount, self.created_at, self.user_id)
+
 
 class OrderItem(models.Model):
     """订单商品项"""
@@ -152,7 +230,7 @@ class ProductReview(models.Model):
 
 class Cart(models.Model):
     """购物车"""
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='carts', verbose_name="用户")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='carts', verbose_name="用户")
     session_key = models.CharField(max_length=40, blank=True, null=True, verbose_name="会话键（未登录用户）")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
@@ -161,6 +239,10 @@ class Cart(models.Model):
         verbose_name = "购物车"
         verbose_name_plural = "购物车"
         unique_together = [['user', 'session_key']]
+        indexes = [
+            # 定时清理长期未更新的匿名购物车
+            models.Index(fields=['updated_at'], condition=models.Q(user__isnull=True), name='cart_guest_updated_idx'),
+        ]
     
     def __str__(self):
         return f"Cart for {self.user.username if self.user else 'Anonymous'}"
@@ -236,8 +318,40 @@ class RestockSuggestion(models.Model):
         return f"{self.product.name} - 建议补货 {self.suggested_quantity} 件"
 
 
+def behavior_partition(moment):
+    """行为事件所属的月分区键：本地时间的 YYYYMM"""
+    local = timezone.localtime(moment)
+    return local.year * 100 + local.month
+
+
+def current_behavior_partition():
+    return behavior_partition(timezone.now())
+
+
+class UserBehaviorQuerySet(models.QuerySet):
+    """行为查询：按时间过滤时同时带上分区键条件，只扫描相关月份的索引范围"""
+
+    def since(self, start):
+        return self.filter(partition__gte=behavior_partition(start), created_at__gte=start)
+
+    def before(self, end):
+        return self.filter(partition__lte=behavior_partition(end), created_at__lt=end)
+
+    def recent(self, limit=20):
+        """最新的 limit 条：从最新分区开始逐个分区向前取，凑够即停"""
+        rows = []
+        partitions = self.order_by('-partition').values_list('partition', flat=True)
+        partition = partitions.first()
+        while partition is not None:
+            rows.extend(self.filter(partition=partition).order_by('-created_at', '-id')[:limit - len(rows)])
+            if len(rows) >= limit:
+                break
+            partition = partitions.filter(partition__lt=partition).first()
+        return rows
+
+
 class UserBehavior(models.Model):
-    """用户行为追踪"""
+    """用户行为追踪（按月分区键 partition 存储，超过保留期的事件压缩为 BehaviorDailyRollup）"""
     BEHAVIOR_TYPES = [
         ('view', '浏览'),
         ('click', '点击'),
@@ -252,7 +366,12 @@ class UserBehavior(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, null=True, blank=True, verbose_name="商品")
     behavior_type = models.CharField(max_length=20, choices=BEHAVIOR_TYPES, verbose_name="行为类型")
     metadata = models.JSONField(default=dict, blank=True, verbose_name="元数据")
-    created_at = models.DateTimeField(auto_now_add=True, verbose_name="行为时间")
+    # 批量写入时保留接收时间（auto_now_add 会覆盖为写入时间，见 events.py）
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="行为时间")
+    # 分区键：created_at 的本地年月（YYYYMM），由 save() 维护，批量写入时需自行设置
+    partition = models.PositiveIntegerField(default=current_behavior_partition, editable=False, verbose_name="月分区")
+
+    objects = UserBehaviorQuerySet.as_manager()
     
     class Meta:
         verbose_name = "用户行为"
@@ -260,12 +379,198 @@ class UserBehavior(models.Model):
         indexes = [
             models.Index(fields=['user', 'behavior_type']),
             models.Index(fields=['product', 'behavior_type']),
-            models.Index(fields=['created_at']),
+            # 按时间的查询先按分区键裁剪（见 UserBehaviorQuerySet）
+            models.Index(fields=['partition', 'created_at'], name='behavior_partition_idx'),
         ]
     
     def __str__(self):
         return f"{self.user or 'Anonymous'} - {self.get_behavior_type_display()} - {self.product}"
 
+    def save(self, *args, **kwargs):
+        self.partition = behavior_partition(self.created_at)
+        super().save(*args, **kwargs)
+
+
+class BehaviorDailyRollup(models.Model):
+    """用户行为按天（本地时区）汇总：超过保留期的原始事件压缩到这里（见 behavior_retention.py）"""
+    date = models.DateField(verbose_name="日期")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, null=True, blank=True, verbose_name="商品")
+    behavior_type = models.CharField(max_length=20, choices=UserBehavior.BEHAVIOR_TYPES, verbose_name="行为类型")
+    count = models.IntegerField(default=0, verbose_name="次数")
+
+    class Meta:
+        verbose_name = "每日用户行为汇总"
+        verbose_name_plural = "每日用户行为汇总"
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product', 'behavior_type'], name='behavior_rollup_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['product', 'date'], name='behavior_rollup_product_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.product_id} {self.behavior_type} x{self.count}"
+
+class ProductImportJob(models.Model):
+    """商品 CSV 后台导入任务（分批处理，支持断点续传）"""
+    STATUS_CHOICES = [
+        ('PENDING', '排队中'),
+        ('RUNNING', '导入中'),
+        ('COMPLETED', '已完成'),
+        ('FAILED', '失败'),
+    ]
+
+    file = models.FileField(upload_to='imports/%Y%m%d/', verbose_name="上传文件")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING', verbose_name="状态")
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="创建人")
+    total_bytes = models.BigIntegerField(default=0, verbose_name="文件大小")
+    # 断点：已落库数据对应的字节偏移、行号以及 CSV 表头
+    offset = models.BigIntegerField(default=0, verbose_name="已处理字节")
+    line_no = models.IntegerField(default=0, verbose_name="已处理行号")
+    header = models.JSONField(default=list, blank=True, verbose_name="CSV表头")
+    rows_processed = models.IntegerField(default=0, verbose_name="已处理行数")
+    rows_failed = models.IntegerField(default=0, verbose_name="失败行数")
+    created_count = models.IntegerField(default=0, verbose_name="新增数")
+    updated_count = models.IntegerField(default=0, verbose_name="更新数")
+    errors = models.JSONField(default=list, blank=True, verbose_name="错误明细")
+    error_message = models.TextField(blank=True, verbose_name="失败原因")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="开始时间")
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name="最后心跳")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="完成时间")
+
+    class Meta:
+        verbose_name = "商品导入任务"
+        verbose_name_plural = "商品导入任务"
+
+    def __str__(self):
+        return f"ImportJob {self.id} ({self.status})"
+
+
+class StockReservation(models.Model):
+    """库存预占：购物车/待付款订单占用的库存，过期后由定时任务释放（见 reservations.py）"""
+    STATUS_CHOICES = [
+        ('ACTIVE', '预占中'),
+        ('COMMITTED', '已出库'),
+        ('CONVERTED', '已转为订单'),
+        ('MERGED', '已并入用户购物车'),
+        ('RELEASED', '已释放'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations', verbose_name="商品")
+    # 购物车/订单删除后预占保留到过期，由定时任务释放库存
+    cart = models.ForeignKey(Cart, on_delete=models.SET_NULL, null=True, blank=True, related_name='reservations', verbose_name="购物车")
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name='reservations', verbose_name="订单")
+    quantity = models.IntegerField(verbose_name="预占数量")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='ACTIVE', verbose_name="状态")
+    expires_at = models.DateTimeField(verbose_name="过期时间")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+
+    class Meta:
+        verbose_name = "库存预占"
+        verbose_name_plural = "库存预占"
+        indexes = [
+            # 过期扫描和按商品汇总预占量只关心 ACTIVE 记录
+            models.Index(fields=['expires_at'], condition=Q(status='ACTIVE'), name='reservation_active_exp_idx'),
+            models.Index(fields=['product'], condition=Q(status='ACTIVE'), name='reservation_active_prod_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} x{self.quantity} ({self.status})"
+
+
+class CounterShard(models.Model):
+    """分片计数器：热点计数（评价的有用数等）分散累加到多行，定期合并回原字段（见 counters.py）"""
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, verbose_name="模型")
+    object_id = models.PositiveBigIntegerField(verbose_name="对象ID")
+    field = models.CharField(max_length=50, verbose_name="字段")
+    shard = models.PositiveSmallIntegerField(verbose_name="分片")
+    value = models.BigIntegerField(default=0, verbose_name="待合并增量")
+
+    class Meta:
+        verbose_name = "计数器分片"
+        verbose_name_plural = "计数器分片"
+        constraints = [
+            models.UniqueConstraint(fields=['content_type', 'object_id', 'field', 'shard'], name='counter_shard_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.content_type_id}:{self.object_id}.{self.field}[{self.shard}] +{self.value}"
+
+
+class DailySalesRollup(models.Model):
+    """按天（本地时区）汇总的订单与销售额，由订单信号增量维护、定时任务校准"""
+    date = models.DateField(unique=True, verbose_name="日期")
+    order_count = models.IntegerField(default=0, verbose_name="订单数")
+    paid_orders = models.IntegerField(default=0, verbose_name="已付款订单数")
+    paid_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="销售额")
+    new_buyers = models.IntegerField(default=0, verbose_name="首次下单用户数")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+
+    class Meta:
+        verbose_name = "每日销售汇总"
+        verbose_name_plural = "每日销售汇总"
+
+    def __str__(self):
+        return f"{self.date} ¥{self.paid_amount}"
+
+
+class HourlySalesRollup(models.Model):
+    """按小时汇总的订单与销售额"""
+    hour = models.DateTimeField(unique=True, verbose_name="小时")
+    order_count = models.IntegerField(default=0, verbose_name="订单数")
+    paid_orders = models.IntegerField(default=0, verbose_name="已付款订单数")
+    paid_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="销售额")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+
+    class Meta:
+        verbose_name = "每小时销售汇总"
+        verbose_name_plural = "每小时销售汇总"
+
+    def __str__(self):
+        return f"{self.hour:%Y-%m-%d %H:00} ¥{self.paid_amount}"
+
+
+class RelatedProduct(models.Model):
+    """相关商品索引：按共同浏览/共同购买离线计算的 Top-K 相似商品（见 related.py）"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='related_links', verbose_name="商品")
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='related_to', verbose_name="相关商品")
+    rank = models.PositiveSmallIntegerField(verbose_name="排名")
+    score = models.FloatField(verbose_name="相似度")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="计算时间")
+
+    class Meta:
+        verbose_name = "相关商品"
+        verbose_name_plural = "相关商品"
+        constraints = [
+            # 详情页按 (product, rank) 一次索引查询取出 Top-K
+            models.UniqueConstraint(fields=['product', 'rank'], name='related_product_rank_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.related_id} ({self.score:.3f})"
+
+
+class UserRecommendation(models.Model):
+    """个性化推荐：按用户行为和订单离线计算的每个用户 Top-K 商品（见 recommendations.py）"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recommendations', verbose_name="用户")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommended_to', verbose_name="商品")
+    rank = models.PositiveSmallIntegerField(verbose_name="排名")
+    score = models.FloatField(verbose_name="推荐分")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="计算时间")
+
+    class Meta:
+        verbose_name = "个性化推荐"
+        verbose_name_plural = "个性化推荐"
+        constraints = [
+            # 推荐接口按 (user, rank) 一次索引查询取出 Top-K
+            models.UniqueConstraint(fields=['user', 'rank'], name='user_recommendation_rank_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} -> {self.product_id} ({self.score:.3f})"
+
+
 # 注册到 Admin
 from django.contrib import admin
 
@@ -281,4 +586,11 @@ admin.site.register(CartItem)
 admin.site.register(ShippingAddress)
 admin.site.register(InventoryAlert)
 admin.site.register(RestockSuggestion)
-admin.site.register(UserBehavior)
\ No newline at end of file
+admin.site.register(UserBehavior)
+admin.site.register(ProductImportJob)
+admin.site.register(StockReservation)
+admin.site.register(CounterShard)
+admin.site.register(DailySalesRollup)
+admin.site.register(HourlySalesRollup)
+admin.site.register(RelatedProduct)
+admin.site.register(BehaviorDailyRollup)
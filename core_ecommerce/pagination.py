@@ -0,0 +1,182 @@
+# core_ecommerce/pagination.py
+
+"""Keyset（游标）分页。
+
+按 queryset 的排序字段 + id 作为游标键，用 WHERE 条件直接定位到下一页，
+不使用 OFFSET，也不执行 COUNT(*)，深分页的代价与第一页相同。
+排序字段必须非空（当前用到的 potential_score/price/created_at 均为 NOT NULL）。
+"""
+
+import base64
+import json
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Page
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """基于 (排序字段..., id) 的游标分页。
+
+    请求携带 ?cursor= （首页为空值）即启用；响应只包含 next/previous/results。
+    """
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, queryset):
+        """取 queryset 的排序并补上与首个字段同向的 id，保证排序键唯一"""
+        ordering = [str(field) for field in queryset.query.order_by] or ['-id']
+        names = {field.lstrip('-') for field in ordering}
+        if 'id' not in names and 'pk' not in names:
+            ordering.append('-id' if ordering[0].startswith('-') else 'id')
+        return ordering
+
+    def encode_cursor(self, values, reverse=False):
+        payload = json.dumps({
+            'v': [str(v) if isinstance(v, Decimal) else v.isoformat() if hasattr(v, 'isoformat') else v for v in values],
+            'r': int(reverse),
+        }, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, cursor, queryset, ordering):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            raw_values, reverse = payload['v'], bool(payload['r'])
+            if len(raw_values) != len(ordering):
+                raise ValueError
+            values = []
+            for field, raw in zip(ordering, raw_values):
+                try:
+                    model_field = queryset.model._meta.get_field(field.lstrip('-'))
+                    values.append(model_field.to_python(raw))
+                except FieldDoesNotExist:
+                    # 注解字段（如搜索相关度排名）直接使用原值
+                    values.append(raw)
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def keyset_filter(self, ordering, values, reverse):
+        """(a, b) 之后的行：a 超过游标值，或 a 相等且 b 超过游标值……"""
+        condition = Q()
+        for i, field in enumerate(ordering):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            step = Q(**{f'{name}__{"lt" if descending else "gt"}': values[i]})
+            for prev_field, prev_value in zip(ordering[:i], values[:i]):
+                step &= Q(**{prev_field.lstrip('-'): prev_value})
+            condition |= step
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        ordering = self.get_ordering(queryset)
+        cursor = request.query_params.get(self.cursor_query_param) or ''
+
+        reverse = False
+        if cursor:
+            values, reverse = self.decode_cursor(cursor, queryset, ordering)
+            queryset = queryset.filter(self.keyset_filter(ordering, values, reverse))
+        if reverse:
+            ordering_sql = [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+        else:
+            ordering_sql = ordering
+
+        rows = list(queryset.order_by(*ordering_sql)[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.ordering = ordering
+        if reverse:
+            self.has_next, self.has_previous = bool(cursor), has_more
+        else:
+            self.has_next, self.has_previous = has_more, bool(cursor)
+        # 首行/末行的排序键：生成 previous/next 游标用
+        self.bounds = (self._row_values(rows[0]), self._row_values(rows[-1])) if rows else None
+        return rows
+
+    def _row_values(self, row):
+        if isinstance(row, dict):
+            # .values() 查询集
+            return [row[field.lstrip('-')] for field in self.ordering]
+        return [getattr(row, field.lstrip('-')) for field in self.ordering]
+
+    def page_state(self):
+        """生成分页链接所需的状态（可序列化，不含请求地址），供结果缓存保存"""
+        return {'has_next': self.has_next, 'has_previous': self.has_previous, 'bounds': self.bounds}
+
+    def restore_page(self, request, state):
+        """用缓存的 page_state() 恢复分页状态，链接按当前请求生成"""
+        self.request = request
+        self.has_next, self.has_previous, self.bounds = state['has_next'], state['has_previous'], state['bounds']
+
+    def get_next_link(self):
+        if not self.has_next or self.bounds is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.bounds[1]))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.bounds is None:
+            # 游标已越过末尾：回到第一页
+            return replace_query_param(url, self.cursor_query_param, '')
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.bounds[0], reverse=True),
+        )
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class CacheablePageNumberPagination(PageNumberPagination):
+    """页码分页，支持与 KeysetPagination 相同的 page_state()/restore_page()"""
+
+    def page_state(self):
+        return {'count': self.page.paginator.count, 'number': self.page.number}
+
+    def restore_page(self, request, state):
+        self.request = request
+        paginator = self.django_paginator_class([], self.get_page_size(request))
+        paginator.count = state['count']  # cached_property：直接写入缓存的总数，不再 COUNT(*)
+        self.page = Page([], state['number'], paginator)
+
+
+class OptionalKeysetPaginationMixin:
+    """请求带 cursor 参数时改用 keyset 分页，否则沿用视图原有的页码分页"""
+    keyset_pagination_class = KeysetPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if self.keyset_pagination_class.cursor_query_param in self.request.query_params:
+                self._paginator = self.keyset_pagination_class()
+            else:
+                return super().paginator
+        return self._paginator
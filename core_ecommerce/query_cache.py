@@ -0,0 +1,276 @@
+# core_ecommerce/query_cache.py
+
+"""商品列表查询结果缓存。
+
+缓存键 = 查询实际使用的过滤值 + 分页参数 + 目录版本号（见 catalog.py），商品写入后
+版本号递增，旧结果自然失效，不需要逐个删除。缓存值只有本页数据和分页状态，
+next/previous 链接由视图按当前请求生成。后端可插拔（settings.PRODUCT_QUERY_CACHE）：
+- locmem：进程内 LRU，按条目数上限淘汰最久未使用的结果；
+- redis：多进程共享（默认复用 Celery 的 Redis），按写入顺序淘汰最早的结果。
+
+同一个键同时未命中时只有一个请求执行查询（防缓存击穿），其余请求等待结果写入；
+命中/未命中/等待等次数记录在后端的计数器中，可通过 stats() 查看。
+缓存后端不可用（Redis 故障）时直接执行查询，不缓存结果。
+"""
+
+import hashlib
+import logging
+import pickle
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+
+from .catalog import catalog_state
+
+DEFAULTS = {
+    'BACKEND': 'locmem',
+    'LOCATION': None,
+    'MAX_ENTRIES': 1024,
+    'TIMEOUT': 60,
+    # 查询执行者持有锁的最长时间；等待者超过该时间后自行查询
+    'LOCK_TIMEOUT': 5,
+    'KEY_PREFIX': 'product_query',
+}
+WAIT_INTERVAL = 0.02
+MISSING = object()
+
+logger = logging.getLogger(__name__)
+
+
+class LocMemLRUBackend:
+    """进程内 LRU：OrderedDict + 过期时间，所有操作加锁"""
+
+    # 后端故障时抛出的异常（QueryCache 捕获后不经缓存直接查询）
+    errors = ()
+
+    def __init__(self, max_entries, timeout, lock_timeout, **kwargs):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.lock_timeout = lock_timeout
+        self._data = OrderedDict()
+        self._locks = {}
+        self._metrics = Counter()
+        self._mutex = threading.Lock()
+
+    def get(self, key):
+        with self._mutex:
+            entry = self._data.get(key)
+            if entry is None:
+                return MISSING
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._mutex:
+            self._data[key] = (time.monotonic() + self.timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self._metrics['evictions'] += 1
+
+    def acquire(self, key):
+        """拿到锁时返回令牌（释放时校验），否则返回 None"""
+        now = time.monotonic()
+        with self._mutex:
+            if key in self._locks and self._locks[key][0] > now:
+                return None
+            token = uuid.uuid4().hex
+            self._locks[key] = (now + self.lock_timeout, token)
+            return token
+
+    def release(self, key, token):
+        """只释放自己持有的锁：锁超时后可能已被其他请求重新获取"""
+        with self._mutex:
+            if key in self._locks and self._locks[key][1] == token:
+                del self._locks[key]
+
+    def incr(self, metric):
+        with self._mutex:
+            self._metrics[metric] += 1
+
+    def metrics(self):
+        with self._mutex:
+            return {**self._metrics, 'entries': len(self._data)}
+
+    def clear(self):
+        with self._mutex:
+            self._data.clear()
+            self._locks.clear()
+            self._metrics.clear()
+
+
+class RedisBackend:
+    """Redis 后端：值带 TTL；写入时间记录在有序集合中，超出条目上限时删除最早写入的结果"""
+
+    # 锁的值是持有者的随机令牌，比较与删除在同一个脚本中执行
+    RELEASE_SCRIPT = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('DEL', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, max_entries, timeout, lock_timeout, location=None, key_prefix='product_query'):
+        import redis
+
+        self.errors = (redis.RedisError,)
+        self.client = redis.Redis.from_url(location or settings.CELERY_BROKER_URL)
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.lock_timeout = lock_timeout
+        self.prefix = key_prefix
+        self.index_key = f'{key_prefix}:index'
+        self.metrics_key = f'{key_prefix}:metrics'
+        self._release = self.client.register_script(self.RELEASE_SCRIPT)
+
+    def _key(self, key):
+        return f'{self.prefix}:value:{key}'
+
+    def get(self, key):
+        raw = self.client.get(self._key(key))
+        return MISSING if raw is None else pickle.loads(raw)
+
+    def set(self, key, value):
+        pipe = self.client.pipeline()
+        pipe.set(self._key(key), pickle.dumps(value, pickle.HIGHEST_PROTOCOL), ex=self.timeout)
+        pipe.zadd(self.index_key, {key: time.time()})
+        # 已过期的键从索引中移除
+        pipe.zremrangebyscore(self.index_key, '-inf', time.time() - self.timeout)
+        pipe.zcard(self.index_key)
+        size = pipe.execute()[-1]
+        if size > self.max_entries:
+            evicted = [k.decode() for k, _ in self.client.zpopmin(self.index_key, size - self.max_entries)]
+            if evicted:
+                self.client.delete(*[self._key(k) for k in evicted])
+                self.client.hincrby(self.metrics_key, 'evictions', len(evicted))
+
+    def acquire(self, key):
+        token = uuid.uuid4().hex
+        if self.client.set(f'{self.prefix}:lock:{key}', token, nx=True, ex=self.lock_timeout):
+            return token
+        return None
+
+    def release(self, key, token):
+        self._release(keys=[f'{self.prefix}:lock:{key}'], args=[token])
+
+    def incr(self, metric):
+        self.client.hincrby(self.metrics_key, metric, 1)
+
+    def metrics(self):
+        metrics = {k.decode(): int(v) for k, v in self.client.hgetall(self.metrics_key).items()}
+        metrics['entries'] = self.client.zcard(self.index_key)
+        return metrics
+
+    def clear(self):
+        keys = [self._key(k.decode()) for k in self.client.zrange(self.index_key, 0, -1)]
+        self.client.delete(self.index_key, self.metrics_key, *keys)
+
+
+BACKENDS = {
+    'locmem': LocMemLRUBackend,
+    'redis': RedisBackend,
+}
+
+
+class QueryCache:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def get_or_compute(self, key, compute):
+        """返回缓存结果；未命中时只有拿到锁的请求执行 compute()，其余请求等待其结果。
+
+        后端出错时不经缓存直接返回 compute() 的结果（已经执行过的查询不再重复执行）。
+        """
+        computed = []
+
+        def run():
+            computed.append(compute())
+            return computed[0]
+
+        try:
+            return self._get_or_compute(key, run)
+        except self.backend.errors:
+            logger.warning('Product query cache unavailable, querying without cache', exc_info=True)
+            return computed[0] if computed else compute()
+
+    def _get_or_compute(self, key, compute):
+        value = self.backend.get(key)
+        if value is not MISSING:
+            self.backend.incr('hits')
+            return value
+        self.backend.incr('misses')
+
+        deadline = time.monotonic() + self.backend.lock_timeout
+        token = self.backend.acquire(key)
+        while token is None:
+            time.sleep(WAIT_INTERVAL)
+            value = self.backend.get(key)
+            if value is not MISSING:
+                self.backend.incr('waited_hits')
+                return value
+            if time.monotonic() > deadline:
+                # 持有锁的请求太慢（或已崩溃）：不再等待，自行查询
+                self.backend.incr('lock_timeouts')
+                return compute()
+            token = self.backend.acquire(key)
+        try:
+            # 等锁期间结果可能已经写入
+            value = self.backend.get(key)
+            if value is not MISSING:
+                self.backend.incr('waited_hits')
+                return value
+            value = compute()
+            self.backend.set(key, value)
+            self.backend.incr('fills')
+            return value
+        finally:
+            self.backend.release(key, token)
+
+    def stats(self):
+        metrics = self.backend.metrics()
+        lookups = metrics.get('hits', 0) + metrics.get('misses', 0)
+        metrics['hit_rate'] = round(metrics.get('hits', 0) / lookups, 4) if lookups else 0.0
+        return metrics
+
+    def clear(self):
+        self.backend.clear()
+
+
+_query_cache = None
+
+
+def get_query_cache():
+    global _query_cache
+    if _query_cache is None:
+        config = {**DEFAULTS, **getattr(settings, 'PRODUCT_QUERY_CACHE', {})}
+        backend_class = BACKENDS[config['BACKEND']]
+        _query_cache = QueryCache(backend_class(
+            max_entries=config['MAX_ENTRIES'],
+            timeout=config['TIMEOUT'],
+            lock_timeout=config['LOCK_TIMEOUT'],
+            location=config['LOCATION'],
+            key_prefix=config['KEY_PREFIX'],
+        ))
+    return _query_cache
+
+
+def reset_query_cache():
+    """丢弃当前实例（修改 settings.PRODUCT_QUERY_CACHE 后调用）"""
+    global _query_cache
+    _query_cache = None
+
+
+def product_list_cache_key(filters, params):
+    """查询实际使用的过滤值（ProductListAPI.get_list_filters）+ 分页参数 + 目录版本号"""
+    version, _ = catalog_state()
+    # 缺省页码即第一页；空 cursor（keyset 分页第一页）与不带 cursor 区分
+    pagination = (params.get('page') or '1', params.get('page_size'), params.get('cursor'))
+    raw = repr((version, sorted(filters.items()), pagination))
+    return hashlib.blake2b(raw.encode('utf-8'), digest_size=16).hexdigest()
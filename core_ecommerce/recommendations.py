@@ -0,0 +1,144 @@
+# core_ecommerce/recommendations.py
+
+"""个性化推荐（UserRecommendation），基于物品的协同过滤（item-kNN）。
+
+离线任务把近期的订单和登录用户的行为整理成稀疏的"用户 × 商品"隐式反馈矩阵 R
+（权重与 related.py 相同，同一用户同一商品的权重相加后取 log1p），然后：
+1. 按列计算商品间的余弦相似度，每个商品只保留 Top-N 邻居，得到稀疏矩阵 S；
+2. 用户对商品的推荐分 = R · S（用户交互过的商品与其邻居相似度的加权和），
+   去掉用户已经交互过的商品后取 Top-K；
+3. 按用户分块计算，内存占用与块大小成正比；结果整表替换写入 UserRecommendation。
+
+订单回看 LOOKBACK_DAYS 天；原始行为超过保留期（behavior_retention.RETAIN_DAYS）后被压缩为
+不含用户的日汇总，因此行为的回看窗口不超过保留期，压缩任务是否已经运行不影响训练结果。
+
+推荐接口按 (user, rank) 一次索引查询读取；没有推荐结果的用户（新用户、近期无行为）
+由调用方退回销量排序。
+"""
+
+from datetime import timedelta
+
+import numpy as np
+from scipy import sparse
+from django.db import transaction
+from django.utils import timezone
+
+from .behavior_retention import RETAIN_DAYS
+from .models import OrderItem, PAID_ORDER_STATUSES, Product, UserBehavior, UserRecommendation
+from .related import BEHAVIOR_WEIGHTS, ORDER_WEIGHT, READ_CHUNK_SIZE, WRITE_BATCH_SIZE, top_k_neighbours
+
+RECOMMENDATION_TOP_K = 20
+NEIGHBOURS = 50
+LOOKBACK_DAYS = 180
+MIN_SUPPORT = 2
+USER_BLOCK_SIZE = 2000
+
+
+def _interactions(since, behavior_since):
+    """(用户 ID, 商品 ID, 权重)：since 之后的订单和 behavior_since 之后的行为"""
+    orders = (
+        OrderItem.objects.filter(order__created_at__gte=since, order__status__in=PAID_ORDER_STATUSES,
+                                 order__user__isnull=False, product__isnull=False)
+        .values_list('order__user_id', 'product_id')
+    )
+    for user_id, product_id in orders.iterator(chunk_size=READ_CHUNK_SIZE):
+        yield user_id, product_id, ORDER_WEIGHT
+
+    behaviors = (
+        UserBehavior.objects.since(behavior_since)
+        .filter(user__isnull=False, product__isnull=False, behavior_type__in=list(BEHAVIOR_WEIGHTS))
+        .values_list('user_id', 'product_id', 'behavior_type')
+    )
+    for user_id, product_id, behavior_type in behaviors.iterator(chunk_size=READ_CHUNK_SIZE):
+        yield user_id, product_id, BEHAVIOR_WEIGHTS[behavior_type]
+
+
+def user_item_matrix(days=LOOKBACK_DAYS, now=None):
+    """返回 (CSR 稀疏矩阵 用户 × 商品, 行对应的用户 ID 数组, 列对应的商品 ID 数组)"""
+    now = now or timezone.now()
+    since = now - timedelta(days=days)
+    behavior_since = now - timedelta(days=min(days, RETAIN_DAYS))
+    users = {}
+    products = {}
+    rows, cols, weights = [], [], []
+    for user_id, product_id, weight in _interactions(since, behavior_since):
+        rows.append(users.setdefault(user_id, len(users)))
+        cols.append(products.setdefault(product_id, len(products)))
+        weights.append(weight)
+    matrix = sparse.coo_matrix(
+        (np.asarray(weights, dtype=np.float64), (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64))),
+        shape=(len(users), len(products)),
+    ).tocsr()  # 转换时重复的 (用户, 商品) 权重相加
+    matrix.data = np.log1p(matrix.data)
+    return (
+        matrix,
+        np.fromiter(users, dtype=np.int64, count=len(users)),
+        np.fromiter(products, dtype=np.int64, count=len(products)),
+    )
+
+
+def item_similarity(matrix, neighbours=NEIGHBOURS, min_support=MIN_SUPPORT):
+    """商品 × 商品的稀疏相似度矩阵，每行只保留 Top-N 邻居"""
+    rows, cols, scores = [], [], []
+    for column, links in top_k_neighbours(matrix.tocsc(), top_k=neighbours, min_support=min_support):
+        for related, score in links:
+            rows.append(column)
+            cols.append(related)
+            scores.append(score)
+    n_products = matrix.shape[1]
+    return sparse.csr_matrix(
+        (np.asarray(scores, dtype=np.float64), (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64))),
+        shape=(n_products, n_products),
+    )
+
+
+def top_k_items(matrix, similarity, top_k=RECOMMENDATION_TOP_K, block_size=USER_BLOCK_SIZE):
+    """逐用户产出 (行号, [(列号, 推荐分), ...])，按推荐分降序，不含用户已交互过的商品"""
+    for start in range(0, matrix.shape[0], block_size):
+        end = min(start + block_size, matrix.shape[0])
+        block = matrix[start:end]
+        scores = (block @ similarity).tocsr()
+        seen = block.copy()
+        seen.data[:] = 1.0
+        scores = (scores - scores.multiply(seen)).tocsr()
+        scores.eliminate_zeros()
+        for offset in range(end - start):
+            lo, hi = scores.indptr[offset], scores.indptr[offset + 1]
+            indices = scores.indices[lo:hi]
+            values = scores.data[lo:hi]
+            if not len(indices):
+                continue
+            if len(indices) > top_k:
+                best = np.argpartition(-values, top_k - 1)[:top_k]
+                indices, values = indices[best], values[best]
+            order = np.lexsort((indices, -values))
+            yield start + offset, list(zip(indices[order].tolist(), values[order].tolist()))
+
+
+def rebuild_user_recommendations(top_k=RECOMMENDATION_TOP_K, neighbours=NEIGHBOURS, days=LOOKBACK_DAYS,
+                                 min_support=MIN_SUPPORT, now=None):
+    """重新训练并整表替换个性化推荐，返回 {'users': 有推荐结果的用户数, 'items': 写入行数}"""
+    matrix, user_ids, product_ids = user_item_matrix(days=days, now=now)
+    similarity = item_similarity(matrix, neighbours=neighbours, min_support=min_support)
+    users = items = 0
+    batch = []
+    with transaction.atomic():
+        UserRecommendation.objects.all().delete()
+        for row, ranked in top_k_items(matrix, similarity, top_k=top_k):
+            user_id = int(user_ids[row])
+            for rank, (column, score) in enumerate(ranked, start=1):
+                batch.append(UserRecommendation(
+                    user_id=user_id, product_id=int(product_ids[column]), rank=rank, score=score,
+                ))
+            users += 1
+            items += len(ranked)
+            if len(batch) >= WRITE_BATCH_SIZE:
+                UserRecommendation.objects.bulk_create(batch)
+                batch = []
+        UserRecommendation.objects.bulk_create(batch)
+    return {'users': users, 'items': items}
+
+
+def recommended_products(user_id, limit=10):
+    """按推荐排名返回用户的个性化推荐（一次 JOIN 查询，走 (user, rank) 唯一索引）"""
+    return Product.objects.filter(recommended_to__user_id=user_id).order_by('recommended_to__rank')[:limit]
@@ -0,0 +1,139 @@
+# core_ecommerce/related.py
+
+"""相关商品索引（RelatedProduct）。
+
+离线任务把近期的订单和用户行为整理成稀疏的"篮子 × 商品"矩阵：
+- 每个订单是一个篮子（共同购买）；
+- 浏览、加购等行为按会话（没有会话 ID 时按用户）归为一个篮子（共同浏览）；
+- 同一篮子内同一商品的行为权重相加后取 log1p，削弱刷屏式重复浏览的影响。
+
+商品向量按 L2 归一化后，相似度矩阵 S = Xᵀ·X 即余弦相似度；按商品分块计算，
+每块只保留共现篮子数不少于 min_support 的 Top-K，内存占用与块大小成正比。
+结果整表替换写入 RelatedProduct，详情页和推荐接口按 (product, rank) 一次索引查询读取。
+"""
+
+from datetime import timedelta
+
+import numpy as np
+from scipy import sparse
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OrderItem, PAID_ORDER_STATUSES, Product, RelatedProduct, UserBehavior
+
+BEHAVIOR_WEIGHTS = {
+    'view': 1.0,
+    'click': 1.0,
+    'like': 2.0,
+    'add_to_cart': 2.0,
+    'purchase': 3.0,
+}
+ORDER_WEIGHT = 3.0
+RELATED_TOP_K = 20
+LOOKBACK_DAYS = 90
+MIN_SUPPORT = 2
+BLOCK_SIZE = 2000
+READ_CHUNK_SIZE = 5000
+WRITE_BATCH_SIZE = 1000
+
+
+def _interactions(since):
+    """(篮子键, 商品 ID, 权重)"""
+    orders = (
+        OrderItem.objects.filter(order__created_at__gte=since, order__status__in=PAID_ORDER_STATUSES,
+                                 product__isnull=False)
+        .values_list('order_id', 'product_id')
+    )
+    for order_id, product_id in orders.iterator(chunk_size=READ_CHUNK_SIZE):
+        yield ('order', order_id), product_id, ORDER_WEIGHT
+
+    behaviors = (
+        UserBehavior.objects.since(since).filter(product__isnull=False, behavior_type__in=list(BEHAVIOR_WEIGHTS))
+        .values_list('session_id', 'user_id', 'product_id', 'behavior_type')
+    )
+    for session_id, user_id, product_id, behavior_type in behaviors.iterator(chunk_size=READ_CHUNK_SIZE):
+        if session_id:
+            basket = ('session', session_id)
+        elif user_id:
+            basket = ('user', user_id)
+        else:
+            continue
+        yield basket, product_id, BEHAVIOR_WEIGHTS[behavior_type]
+
+
+def interaction_matrix(days=LOOKBACK_DAYS, now=None):
+    """返回 (CSC 稀疏矩阵 篮子 × 商品, 列对应的商品 ID 数组)"""
+    since = (now or timezone.now()) - timedelta(days=days)
+    baskets = {}
+    products = {}
+    rows, cols, weights = [], [], []
+    for basket, product_id, weight in _interactions(since):
+        rows.append(baskets.setdefault(basket, len(baskets)))
+        cols.append(products.setdefault(product_id, len(products)))
+        weights.append(weight)
+    matrix = sparse.coo_matrix(
+        (np.asarray(weights, dtype=np.float64), (np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64))),
+        shape=(len(baskets), len(products)),
+    ).tocsc()  # 转换时重复的 (篮子, 商品) 权重相加
+    matrix.data = np.log1p(matrix.data)
+    return matrix, np.fromiter(products, dtype=np.int64, count=len(products))
+
+
+def top_k_neighbours(matrix, top_k=RELATED_TOP_K, min_support=MIN_SUPPORT, block_size=BLOCK_SIZE):
+    """逐商品产出 (列号, [(相关列号, 余弦相似度), ...])，按相似度降序"""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    norms[norms == 0] = 1.0
+    normalized = (matrix @ sparse.diags(1.0 / norms)).tocsc()
+    normalized_t = normalized.T.tocsr()
+    binary = matrix.copy()
+    binary.data[:] = 1.0
+    binary_t = binary.T.tocsr()
+
+    n_products = matrix.shape[1]
+    for start in range(0, n_products, block_size):
+        end = min(start + block_size, n_products)
+        similarity = (normalized_t[start:end] @ normalized).tocsr()
+        # 共现篮子数不足的商品对视为噪声
+        support = (binary_t[start:end] @ binary).tocsr()
+        similarity = similarity.multiply(support >= min_support).tocsr()
+        for offset in range(end - start):
+            column = start + offset
+            lo, hi = similarity.indptr[offset], similarity.indptr[offset + 1]
+            indices = similarity.indices[lo:hi]
+            scores = similarity.data[lo:hi]
+            keep = indices != column
+            indices, scores = indices[keep], scores[keep]
+            if not len(indices):
+                continue
+            if len(indices) > top_k:
+                best = np.argpartition(-scores, top_k - 1)[:top_k]
+                indices, scores = indices[best], scores[best]
+            order = np.lexsort((indices, -scores))
+            yield column, list(zip(indices[order].tolist(), scores[order].tolist()))
+
+
+def rebuild_related_products(top_k=RELATED_TOP_K, days=LOOKBACK_DAYS, min_support=MIN_SUPPORT, now=None):
+    """重新计算并整表替换相关商品索引，返回 {'products': 有相关商品的商品数, 'links': 写入行数}"""
+    matrix, product_ids = interaction_matrix(days=days, now=now)
+    products = links = 0
+    batch = []
+    with transaction.atomic():
+        RelatedProduct.objects.all().delete()
+        for column, neighbours in top_k_neighbours(matrix, top_k=top_k, min_support=min_support):
+            product_id = int(product_ids[column])
+            for rank, (related, score) in enumerate(neighbours, start=1):
+                batch.append(RelatedProduct(
+                    product_id=product_id, related_id=int(product_ids[related]), rank=rank, score=score,
+                ))
+            products += 1
+            links += len(neighbours)
+            if len(batch) >= WRITE_BATCH_SIZE:
+                RelatedProduct.objects.bulk_create(batch)
+                batch = []
+        RelatedProduct.objects.bulk_create(batch)
+    return {'products': products, 'links': links}
+
+
+def related_products(product_id, limit=8):
+    """按相似度排名返回相关商品（一次 JOIN 查询，走 (product, rank) 唯一索引）"""
+    return Product.objects.filter(related_to__product_id=product_id).order_by('related_to__rank')[:limit]
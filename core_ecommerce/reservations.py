@@ -0,0 +1,286 @@
+# core_ecommerce/reservations.py
+
+"""库存预占（StockReservation）台账。
+
+购物车和待付款订单通过预占记录占用库存，每条记录都有过期时间：
+- Product.stock 是尚未卖出的库存，只在下单（条件 UPDATE 扣减）和订单预占释放（加回）时修改；
+- 购物车预占只写台账，不修改商品行：可加入购物车的数量 = stock - 未过期的购物车预占之和
+  （见 available_stock），加购/减购不会在热门商品的行上排队，也不会使目录缓存失效；
+- 下单时扣减条件为 stock >= 购买数量 + 其他购物车的预占，当前用户购物车中的预占转给订单；
+- 订单付款后预占转为 COMMITTED，订单取消或预占过期时释放（加回库存、扣回销量）；
+- release_expired_reservations() 由定时任务调用，按批释放过期预占并取消超时未付款的订单。
+
+下单扣减库存是带条件的单条 UPDATE，行锁持有时间只有一条语句，不会超卖。
+购物车预占不锁商品行：并发加购同一件商品时可能略微超额预占，由下单时的条件 UPDATE 兜底。
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .catalog import bump_catalog_version
+from .models import Order, Product, StockReservation, PAID_ORDER_STATUSES
+
+# 购物车预占保留时长（每次修改购物车时续期）
+CART_HOLD_TTL = timedelta(minutes=10)
+# 待付款订单的预占保留时长，超时未付款的订单会被自动取消
+ORDER_HOLD_TTL = timedelta(minutes=15)
+RELEASE_BATCH_SIZE = 500
+
+
+def _case(deltas):
+    return Case(
+        *[When(id=product_id, then=Value(delta)) for product_id, delta in deltas.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def active_cart_holds(now=None):
+    """占用库存的购物车预占：ACTIVE、未过期、尚未转给订单（过期的不必等定时任务释放）"""
+    return StockReservation.objects.filter(status='ACTIVE', order__isnull=True, expires_at__gt=now or timezone.now())
+
+
+def available_stock(product_ids, exclude=None, now=None):
+    """{product_id: stock - 购物车预占}（一次查询）；exclude 匹配的预占（自己的购物车）不扣除"""
+    holds = active_cart_holds(now).filter(product_id=OuterRef('pk'))
+    if exclude is not None:
+        holds = holds.exclude(exclude)
+    held = holds.values('product_id').annotate(total=Sum('quantity')).values('total')
+    rows = (
+        Product.objects.filter(id__in=list(product_ids))
+        .annotate(held=Coalesce(Subquery(held, output_field=IntegerField()), Value(0)))
+        .values_list('id', 'stock', 'held')
+    )
+    return {product_id: stock - held for product_id, stock, held in rows}
+
+
+class _StockShortage(Exception):
+    """adjust_stock 内部使用：回滚到保存点"""
+
+
+def adjust_stock(stock_deltas, sales_deltas=None, reserved=None):
+    """一条 UPDATE 调整一批商品的库存（负数为扣减）和销量。
+
+    扣减库存的商品要求 stock >= 扣减数量 + reserved[product_id]（需要保留给其他购物车的数量），
+    否则不做任何修改并返回 False：
+    UPDATE 在保存点内执行，只要有一行不满足条件（其余行已被修改）就回滚到保存点，
+    调用方事务中的其他写入不受影响。
+    """
+    sales_deltas = {pid: delta for pid, delta in (sales_deltas or {}).items() if delta}
+    stock_deltas = {pid: delta for pid, delta in stock_deltas.items() if delta}
+    reserved = reserved or {}
+    product_ids = set(stock_deltas) | set(sales_deltas)
+    if not product_ids:
+        return True
+    condition = Q()
+    for product_id in product_ids:
+        delta = stock_deltas.get(product_id, 0)
+        condition |= Q(id=product_id, stock__gte=reserved.get(product_id, 0) - delta) if delta < 0 else Q(id=product_id)
+    updates = {
+        # 库存和销量是选品评分输入，交给增量评分任务处理
+        'score_dirty': True,
+    }
+    if stock_deltas:
+        updates['stock'] = F('stock') + _case(stock_deltas)
+    if sales_deltas:
+        updates['sales_count'] = F('sales_count') + _case(sales_deltas)
+    try:
+        with transaction.atomic():
+            if Product.objects.filter(condition).update(**updates) != len(product_ids):
+                raise _StockShortage
+    except _StockShortage:
+        return False
+    # 库存和销量出现在商品列表/详情接口中
+    bump_catalog_version()
+    return True
+
+
+def hold_cart_quantities(cart, quantities, now=None):
+    """把购物车中各商品的预占数量调整为 quantities[product_id]（不超过可加入购物车的数量）。
+
+    只读写预占台账，不修改商品行；返回 {product_id: 实际预占的数量}，不存在的商品不在返回结果中。
+    """
+    now = now or timezone.now()
+    product_ids = list(quantities)
+    with transaction.atomic():
+        holds = {
+            hold.product_id: hold
+            for hold in StockReservation.objects.filter(
+                cart=cart, product_id__in=product_ids, status='ACTIVE',
+            ).select_for_update()
+        }
+        available = available_stock(product_ids, exclude=Q(cart=cart), now=now)
+        granted = {
+            # 商品不存在：不出现在返回结果中
+            product_id: min(max(quantity, 0), max(available[product_id], 0))
+            for product_id, quantity in quantities.items() if product_id in available
+        }
+        to_create = []
+        to_update = []
+        for product_id, quantity in granted.items():
+            hold = holds.get(product_id)
+            if hold is None:
+                if quantity:
+                    to_create.append(StockReservation(
+                        product_id=product_id, cart=cart, quantity=quantity, expires_at=now + CART_HOLD_TTL,
+                    ))
+                continue
+            hold.quantity = quantity
+            hold.expires_at = now + CART_HOLD_TTL
+            if not quantity:
+                hold.status = 'RELEASED'
+            to_update.append(hold)
+        StockReservation.objects.bulk_create(to_create)
+        StockReservation.objects.bulk_update(to_update, ['quantity', 'expires_at', 'status'])
+    return granted
+
+
+def hold_cart_quantity(cart, product_id, quantity, now=None):
+    """把购物车中某商品的预占数量调整为 quantity，返回实际预占的数量"""
+    return hold_cart_quantities(cart, {product_id: quantity}, now=now).get(product_id, 0)
+
+
+def reserve_for_order(order, quantities, cart_owner=None, now=None):
+    """为订单扣减库存、计入销量并记录预占；必须在调用方的事务内执行。
+
+    扣减时为其他购物车的预占保留库存；cart_owner 购物车中的同款预占转给订单。
+    库存不足时返回 False（不做任何修改），调用方应回滚事务。
+    """
+    now = now or timezone.now()
+    others = defaultdict(int)
+    owned = False
+    holds = active_cart_holds(now).filter(product_id__in=list(quantities))
+    for product_id, quantity, user_id in holds.values_list('product_id', 'quantity', 'cart__user_id'):
+        if cart_owner is not None and user_id == cart_owner.id:
+            owned = True
+        else:
+            others[product_id] += quantity
+    stock_deltas = {product_id: -quantity for product_id, quantity in quantities.items()}
+    if not adjust_stock(stock_deltas, sales_deltas=quantities, reserved=others):
+        return False
+    if owned:
+        holds.filter(cart__user=cart_owner).update(status='CONVERTED')
+    StockReservation.objects.bulk_create([
+        StockReservation(product_id=product_id, order=order, quantity=quantity, expires_at=now + ORDER_HOLD_TTL)
+        for product_id, quantity in quantities.items()
+    ])
+    return True
+
+
+def transfer_cart_holds(source_cart_ids, cart, now=None):
+    """把 source_cart_ids 购物车的预占转给 cart（需在事务内调用），库存不变。
+
+    cart 已预占的同款商品合并为一条预占，被合并的记录标记为 MERGED；返回转移的记录数。
+    """
+    now = now or timezone.now()
+    moved = list(
+        StockReservation.objects.filter(cart_id__in=list(source_cart_ids), status='ACTIVE').select_for_update()
+    )
+    if not moved:
+        return 0
+    targets = {
+        hold.product_id: hold
+        for hold in StockReservation.objects.filter(
+            cart=cart, product_id__in={hold.product_id for hold in moved}, status='ACTIVE',
+        ).select_for_update()
+    }
+    updated = {hold.id: hold for hold in targets.values()}
+    for hold in moved:
+        target = targets.get(hold.product_id)
+        hold.cart = cart
+        if target is None:
+            targets[hold.product_id] = hold
+        else:
+            target.quantity += hold.quantity
+            hold.status = 'MERGED'
+        hold.expires_at = now + CART_HOLD_TTL
+        updated[hold.id] = hold
+    for hold in targets.values():
+        hold.expires_at = now + CART_HOLD_TTL
+    StockReservation.objects.bulk_update(list(updated.values()), ['cart', 'quantity', 'status', 'expires_at'])
+    return len(moved)
+
+
+def commit_order_reservations(order):
+    """订单已付款：预占转为正式出库，库存不再加回"""
+    return StockReservation.objects.filter(order=order, status='ACTIVE').update(status='COMMITTED')
+
+
+def _release(holds):
+    """释放一批预占（需在事务内调用）：订单预占加回库存、扣回销量，购物车预占只改状态"""
+    rows = list(holds.filter(status='ACTIVE').select_for_update().values_list('id', 'product_id', 'quantity', 'order_id'))
+    if not rows:
+        return []
+    stock = defaultdict(int)
+    sales = defaultdict(int)
+    for _, product_id, quantity, order_id in rows:
+        if order_id is not None:
+            stock[product_id] += quantity
+            sales[product_id] -= quantity
+    StockReservation.objects.filter(id__in=[row[0] for row in rows]).update(status='RELEASED')
+    adjust_stock(stock, sales_deltas=sales)
+    return rows
+
+
+def release_order_reservations(order):
+    """订单取消：释放该订单的全部预占"""
+    with transaction.atomic():
+        return len(_release(StockReservation.objects.filter(order=order)))
+
+
+def release_cart_reservation(cart, product_id):
+    with transaction.atomic():
+        return len(_release(StockReservation.objects.filter(cart=cart, product_id=product_id)))
+
+
+def release_expired_reservations(now=None, batch_size=RELEASE_BATCH_SIZE):
+    """释放所有过期预占，并取消因此失去库存的待付款订单；返回释放数和取消的订单数"""
+    now = now or timezone.now()
+    released = cancelled = 0
+    # 订单状态被绕过信号改为已付款时，预占直接出库而不是释放
+    StockReservation.objects.filter(
+        status='ACTIVE', expires_at__lt=now, order__status__in=PAID_ORDER_STATUSES,
+    ).update(status='COMMITTED')
+    while True:
+        with transaction.atomic():
+            ids = list(
+                StockReservation.objects.filter(status='ACTIVE', expires_at__lt=now)
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            rows = _release(StockReservation.objects.filter(id__in=ids))
+            order_ids = {order_id for *_, order_id in rows if order_id is not None}
+            if order_ids:
+                # 超时未付款的订单：同一订单的其他预占一并释放
+                rows += _release(StockReservation.objects.filter(order_id__in=order_ids))
+                cancelled += Order.objects.filter(id__in=order_ids, status='PENDING').update(status='CANCELLED')
+            released += len(rows)
+    return {'released': released, 'cancelled_orders': cancelled}
+
+
+def stock_levels(product_ids, now=None):
+    """{product_id: {'available': 可加入购物车, 'reserved': 已预占, 'on_hand': 在库}}
+
+    在库 = stock + 待付款订单的预占（已扣减但尚未出库）；已预占包括购物车和待付款订单。
+    """
+    now = now or timezone.now()
+    product_ids = list(product_ids)
+    cart_held = dict(
+        active_cart_holds(now).filter(product_id__in=product_ids)
+        .values('product_id').annotate(total=Sum('quantity')).values_list('product_id', 'total')
+    )
+    order_held = dict(
+        StockReservation.objects.filter(product_id__in=product_ids, status='ACTIVE', order__isnull=False)
+        .values('product_id').annotate(total=Sum('quantity')).values_list('product_id', 'total')
+    )
+    levels = {}
+    for product_id, stock in Product.objects.filter(id__in=product_ids).values_list('id', 'stock'):
+        carts, orders = cart_held.get(product_id, 0), order_held.get(product_id, 0)
+        levels[product_id] = {'available': max(stock - carts, 0), 'reserved': carts + orders, 'on_hand': stock + orders}
+    return levels
@@ -0,0 +1,225 @@
+# core_ecommerce/rollups.py
+
+"""订单销售汇总表（DailySalesRollup / HourlySalesRollup）。
+
+订单保存/删除时由信号按差量更新所在的天、小时两行（见 signals.py），
+看板只需读取几十行汇总数据，而不是对全部订单做聚合。
+queryset.update() 等绕过信号的写入由 reconcile_sales_rollups() 定时按原始订单重算校准；
+上线时由迁移 0013 全量回填；汇总表损坏时用 ``python manage.py rebuild_sales_rollups`` 全量重建。
+"""
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Min, Q, Sum
+from django.db.models.functions import Trunc, TruncDate, TruncHour
+from django.utils import timezone
+
+from .models import DailySalesRollup, HourlySalesRollup, Order, PAID_ORDER_STATUSES
+
+# 定时校准覆盖的天数（今天和昨天）
+RECONCILE_DAYS = 2
+ROLLUP_FIELDS = ['order_count', 'paid_orders', 'paid_amount']
+TREND_GRANULARITIES = ['day', 'week', 'month']
+# 趋势接口允许查询的最长区间
+MAX_TREND_DAYS = 3 * 366
+
+
+def _buckets(created_at):
+    """订单所属的（本地日期, 本地整点）"""
+    local = timezone.localtime(created_at)
+    return local.date(), local.replace(minute=0, second=0, microsecond=0)
+
+
+def _contribution(state):
+    """一个订单对汇总行的贡献：(订单数, 已付款订单数, 销售额)"""
+    status, total_amount, created_at, user_id = state
+    if status not in PAID_ORDER_STATUSES:
+        return 1, 0, Decimal('0')
+    return 1, 1, Decimal(str(total_amount or 0))
+
+
+def _add(model, lookup, deltas):
+    """对汇总行做原子的 F() 累加，行不存在时创建"""
+    deltas = {field: value for field, value in deltas.items() if value}
+    if not deltas:
+        return
+    updates = {field: F(field) + value for field, value in deltas.items()}
+    updates['updated_at'] = timezone.now()
+    if model.objects.filter(**lookup).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # 并发请求先创建了这一行
+        model.objects.filter(**lookup).update(**updates)
+
+
+def apply_order_change(old_state, new_state):
+    """按订单变更前后的 rollup_state() 差量更新汇总表（新建订单 old_state 为 None，删除时 new_state 为 None）"""
+    changes = defaultdict(lambda: [0, 0, Decimal('0')])
+    for state, sign in ((old_state, -1), (new_state, 1)):
+        if state is None:
+            continue
+        totals = changes[_buckets(state[2])]
+        for i, value in enumerate(_contribution(state)):
+            totals[i] += sign * value
+    for (day, hour), totals in changes.items():
+        deltas = dict(zip(ROLLUP_FIELDS, totals))
+        _add(HourlySalesRollup, {'hour': hour}, deltas)
+        _add(DailySalesRollup, {'date': day}, deltas)
+
+
+def add_new_buyer(created_at, delta=1):
+    """用户首单所在日期的首次下单用户数加减 delta（累计即为有订单的用户数）"""
+    _add(DailySalesRollup, {'date': _buckets(created_at)[0]}, {'new_buyers': delta})
+
+
+def reconcile_sales_rollups(days=RECONCILE_DAYS, now=None, apps=None):
+    """按原始订单重算最近 days 天（days=None 为全部）的汇总行，返回写入的天数和小时数。
+
+    删除旧行、聚合订单、写入新行在同一个事务中完成：先删除旧行（持有这些行的锁），
+    期间提交的订单由信号更新汇总行时会等待本事务结束，不会被过期的聚合结果覆盖。
+    apps 为迁移中的历史模型注册表（数据迁移回填时传入）。
+    """
+    if apps is not None:
+        order_model, daily_model, hourly_model = (
+            apps.get_model('core_ecommerce', name) for name in ['Order', 'DailySalesRollup', 'HourlySalesRollup']
+        )
+    else:
+        order_model, daily_model, hourly_model = Order, DailySalesRollup, HourlySalesRollup
+    orders = order_model.objects.all()
+    daily_rows = daily_model.objects.all()
+    hourly_rows = hourly_model.objects.all()
+    first_orders = order_model.objects.filter(user__isnull=False).values('user').annotate(first=Min('created_at'))
+    if days is not None:
+        start_date = timezone.localdate(now) - timedelta(days=days - 1)
+        start = timezone.make_aware(datetime.combine(start_date, time.min))
+        orders = orders.filter(created_at__gte=start)
+        daily_rows = daily_rows.filter(date__gte=start_date)
+        hourly_rows = hourly_rows.filter(hour__gte=start)
+        first_orders = first_orders.filter(first__gte=start)
+
+    paid = Q(status__in=PAID_ORDER_STATUSES)
+    metrics = {
+        'order_count': Count('id'),
+        'paid_orders': Count('id', filter=paid),
+        'paid_amount': Sum('total_amount', filter=paid),
+    }
+    with transaction.atomic():
+        daily_rows.delete()
+        hourly_rows.delete()
+
+        new_buyers = defaultdict(int)
+        for row in first_orders:
+            new_buyers[timezone.localdate(row['first'])] += 1
+        daily = {}
+        for row in orders.annotate(bucket=TruncDate('created_at')).values('bucket').annotate(**metrics):
+            daily[row['bucket']] = daily_model(
+                date=row['bucket'], order_count=row['order_count'], paid_orders=row['paid_orders'],
+                paid_amount=row['paid_amount'] or 0, new_buyers=new_buyers.pop(row['bucket'], 0),
+            )
+        hourly = [
+            hourly_model(
+                hour=row['bucket'], order_count=row['order_count'], paid_orders=row['paid_orders'],
+                paid_amount=row['paid_amount'] or 0,
+            )
+            for row in orders.annotate(bucket=TruncHour('created_at')).values('bucket').annotate(**metrics)
+        ]
+
+        daily_model.objects.bulk_create(list(daily.values()), batch_size=500)
+        hourly_model.objects.bulk_create(hourly, batch_size=500)
+    return {'days': len(daily), 'hours': len(hourly)}
+
+
+def _period_start(day, granularity):
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _next_period(start, granularity):
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    if granularity == 'month':
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def sales_trend(start, end, granularity='day'):
+    """[start, end] 日期区间内按天/周（周一开始）/月汇总的销售趋势。
+
+    一条 GROUP BY 查询得到有数据的周期，缺失的周期在 Python 中补零。
+    """
+    if granularity not in TREND_GRANULARITIES:
+        raise ValueError(f'granularity 只能是 {"/".join(TREND_GRANULARITIES)}')
+    if start > end:
+        raise ValueError('start 不能晚于 end')
+    if (end - start).days >= MAX_TREND_DAYS:
+        raise ValueError(f'查询区间不能超过 {MAX_TREND_DAYS} 天')
+
+    rows = (
+        DailySalesRollup.objects.filter(date__gte=start, date__lte=end)
+        .annotate(period=Trunc('date', granularity))
+        .values('period')
+        .annotate(orders=Sum('order_count'), paid_orders=Sum('paid_orders'), sales=Sum('paid_amount'))
+    )
+    by_period = {row['period']: row for row in rows}
+
+    series = []
+    period = _period_start(start, granularity)
+    while period <= end:
+        row = by_period.get(period)
+        series.append({
+            'period': period.strftime('%Y-%m-%d'),
+            'orders': row['orders'] if row else 0,
+            'paid_orders': row['paid_orders'] if row else 0,
+            'sales': float(row['sales'] or 0) if row else 0.0,
+        })
+        period = _next_period(period, granularity)
+    return series
+
+
+def sales_dashboard(trend_days=7, now=None):
+    """看板销售数据：只读取汇总表，固定 3 条查询"""
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+
+    totals = DailySalesRollup.objects.aggregate(
+        total_sales=Sum('paid_amount'), total_orders=Sum('order_count'), active_users=Sum('new_buyers'),
+    )
+
+    daily = sales_trend(today - timedelta(days=trend_days - 1), today)
+    sales_trend_data = [{'date': row['period'], 'sales': row['sales']} for row in daily]
+
+    current_hour = _buckets(now)[1]
+    first_hour = current_hour - timedelta(hours=23)
+    by_hour = {
+        row['hour']: row
+        for row in HourlySalesRollup.objects.filter(hour__gte=first_hour, hour__lte=current_hour)
+        .values('hour', 'order_count', 'paid_amount')
+    }
+    hourly_sales = []
+    for i in range(24):
+        hour = first_hour + timedelta(hours=i)
+        row = by_hour.get(hour)
+        hourly_sales.append({
+            'hour': timezone.localtime(hour).strftime('%Y-%m-%d %H:00'),
+            'orders': row['order_count'] if row else 0,
+            'sales': float(row['paid_amount']) if row else 0.0,
+        })
+
+    return {
+        'total_sales': float(totals['total_sales'] or 0),
+        'today_sales': daily[-1]['sales'],
+        'total_orders': totals['total_orders'] or 0,
+        'today_orders': daily[-1]['orders'],
+        'active_users': totals['active_users'] or 0,
+        'sales_trend': sales_trend_data,
+        'hourly_sales': hourly_sales,
+    }
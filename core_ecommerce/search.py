@@ -0,0 +1,189 @@
+# core_ecommerce/search.py
+
+"""商品全文检索索引。
+
+中文（CJK）文本按单字 + 相邻二字（bigram）切分，英文/数字按单词切分。
+SQLite 下使用 FTS5 虚拟表并按 bm25 排序；其他数据库退化为 icontains 查询，
+接口保持一致：search_product_ids() 返回按相关度排序的前 limit 个商品 ID，
+search_filter() 返回匹配全部命中商品的查询条件（子查询，不截断），
+供需要在同一条 SQL 中再过滤、排序和分页的调用方使用。
+
+索引在 Product 保存/删除时通过信号增量维护（见 signals.py）；
+bulk_create/bulk_update 等绕过信号的批量写入需要自行调用 index_product_ids()。
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Product
+
+SEARCH_TABLE = 'core_ecommerce_product_search'
+INDEXED_FIELDS = ['name', 'sku', 'category', 'description']
+# bm25 列权重，与 INDEXED_FIELDS 顺序一致：名称命中最重要，描述最弱
+FIELD_WEIGHTS = [10.0, 5.0, 3.0, 1.0]
+DEFAULT_LIMIT = 500
+
+CJK_RANGES = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff'
+TOKEN_RE = re.compile(rf'(?P<cjk>[{CJK_RANGES}]+)|(?P<word>[^\W_{CJK_RANGES}]+)')
+
+
+def _cjk_grams(run, with_unigrams):
+    if len(run) == 1:
+        return [run]
+    bigrams = [run[i:i + 2] for i in range(len(run) - 1)]
+    return list(run) + bigrams if with_unigrams else bigrams
+
+
+def tokenize(text):
+    """切分待索引文本。
+
+    CJK 同时产出单字和 bigram，这样单字查询也能命中；
+    查询时只用 bigram（单字查询除外），既减少匹配项又保证相邻性，见 _match_expression。
+    """
+    tokens = []
+    for match in TOKEN_RE.finditer((text or '').lower()):
+        if match.group('cjk'):
+            tokens.extend(_cjk_grams(match.group('cjk'), with_unigrams=True))
+        else:
+            tokens.append(match.group('word'))
+    return tokens
+
+
+def document_for(values):
+    """把商品字段转为预先切分好的索引文档（空格分隔的词元）"""
+    return [' '.join(tokenize(values.get(field) or '')) for field in INDEXED_FIELDS]
+
+
+class SQLiteFTSBackend:
+    """基于 SQLite FTS5 的索引（见迁移 0010_product_search_index）"""
+
+    def index(self, rows):
+        rows = list(rows)
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [(row['id'],) for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {SEARCH_TABLE} (rowid, {", ".join(INDEXED_FIELDS)}) VALUES (%s, %s, %s, %s, %s)',
+                [[row['id'], *document_for(row)] for row in rows],
+            )
+
+    def remove(self, ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [(pk,) for pk in ids])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+
+    def _match_expression(self, query, match_any):
+        terms = []
+        for match in TOKEN_RE.finditer((query or '').lower()):
+            if match.group('cjk'):
+                terms.extend(f'"{gram}"' for gram in _cjk_grams(match.group('cjk'), with_unigrams=False))
+            else:
+                # 英文/数字按前缀匹配，输入过程中的半个单词也能命中
+                terms.append(f'"{match.group("word")}"*')
+        return (' OR ' if match_any else ' AND ').join(terms)
+
+    def match_condition(self, query, match_any=False):
+        expression = self._match_expression(query, match_any)
+        if not expression:
+            return Q(pk__in=[])
+        return Q(id__in=RawSQL(f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s', [expression]))
+
+    def search(self, query, limit, match_any=False):
+        expression = self._match_expression(query, match_any)
+        if not expression:
+            return []
+        weights = ', '.join(str(w) for w in FIELD_WEIGHTS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s '
+                f'ORDER BY bm25({SEARCH_TABLE}, {weights}) LIMIT %s',
+                [expression, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class ORMFallbackBackend:
+    """无 FTS 支持的数据库：退化为 icontains 过滤，按潜力评分排序"""
+
+    def index(self, rows):
+        pass
+
+    def remove(self, ids):
+        pass
+
+    def clear(self):
+        pass
+
+    def match_condition(self, query, match_any=False):
+        words = (query or '').split()
+        if not words:
+            return Q(pk__in=[])
+        condition = Q() if match_any else None
+        for word in words:
+            word_q = Q(name__icontains=word) | Q(sku__icontains=word) | Q(category__icontains=word) | Q(description__icontains=word)
+            if condition is None:
+                condition = word_q
+            elif match_any:
+                condition |= word_q
+            else:
+                condition &= word_q
+        return condition
+
+    def search(self, query, limit, match_any=False):
+        if not (query or '').split():
+            return []
+        qs = Product.objects.filter(self.match_condition(query, match_any)).order_by('-potential_score', 'id')
+        return list(qs.values_list('id', flat=True)[:limit])
+
+
+def get_backend():
+    if connection.vendor == 'sqlite':
+        return SQLiteFTSBackend()
+    return ORMFallbackBackend()
+
+
+def search_product_ids(query, limit=DEFAULT_LIMIT, match_any=False):
+    """按相关度返回商品 ID；match_any=True 时任一词命中即可（用于 AI 导购关键词召回）"""
+    return get_backend().search(query, limit, match_any=match_any)
+
+
+def search_filter(query, match_any=False):
+    """匹配全部命中商品的查询条件（不按相关度截断），与其他过滤、排序、分页在同一条 SQL 中执行"""
+    return get_backend().match_condition(query, match_any=match_any)
+
+
+def index_product_ids(ids):
+    """重新索引指定商品（批量写入后调用）"""
+    ids = list(ids)
+    if not ids:
+        return
+    backend = get_backend()
+    rows = Product.objects.filter(id__in=ids).values('id', *INDEXED_FIELDS)
+    backend.index(rows)
+
+
+def remove_product_ids(ids):
+    get_backend().remove(list(ids))
+
+
+def rebuild_index(batch_size=2000):
+    """全量重建索引，返回索引的商品数"""
+    backend = get_backend()
+    backend.clear()
+    total = 0
+    batch = []
+    for row in Product.objects.values('id', *INDEXED_FIELDS).iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            backend.index(batch)
+            total += len(batch)
+            batch = []
+    backend.index(batch)
+    return total + len(batch)
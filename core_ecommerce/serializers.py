@@ -1,7 +1,11 @@
+from operator import itemgetter
+
 from rest_framework import serializers
 from .models import Product, ProductReview
 from django.contrib.auth.models import User
 
+DEFAULT_PRODUCT_IMAGE = 'https://images.unsplash.com/photo-1603789955942-64ca8f2d7c54?w=800&h=800&fit=crop'
+
 
 class ProductSerializer(serializers.ModelSerializer):
     # 为了兼容前端，添加一些计算字段
@@ -13,18 +17,64 @@ class ProductSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'name', 'sku', 'price', 'original_price', 'stock', 'category', 
             'description', 'image_url', 'image', 'rating', 'sales_count', 'sales',
-            'potential_score', 'selection_reason', 'created_at', 'updated_at'
+            'potential_score', 'selection_reason'
         ]
-        read_only_fields = ['created_at', 'updated_at']
     
     def get_image(self, obj):
         """返回图片URL，优先使用image_url，如果没有则返回默认图片"""
-        return obj.image_url or 'https://images.unsplash.com/photo-1603789955942-64ca8f2d7c54?w=800&h=800&fit=crop'
+        return obj.image_url or DEFAULT_PRODUCT_IMAGE
+
+
+def _compile_product_row_serializer():
+    """按 ProductSerializer 的字段生成 (需要查询的列, 行转 dict 函数)。
+
+    字段顺序、名称和取值格式都取自 ProductSerializer 本身，输出的 JSON 与其逐字节一致：
+    字符串和整数列原样输出；Decimal/浮点列调用对应 DRF 字段的 to_representation
+    （Decimal 按 COERCE_DECIMAL_TO_STRING 格式化为字符串）；image 与 get_image 规则相同。
+    """
+    fields = ProductSerializer().fields
+    columns = []
+    for name, field in fields.items():
+        source = 'image_url' if name == 'image' else field.source
+        if source not in columns:
+            columns.append(source)
+    keys = list(fields)
+    getter = itemgetter(*['image_url' if name == 'image' else field.source for name, field in fields.items()])
+    converters = [
+        (name, field.to_representation)
+        for name, field in fields.items()
+        if isinstance(field, (serializers.DecimalField, serializers.FloatField))
+    ]
+
+    def row_to_dict(row):
+        data = dict(zip(keys, getter(row)))
+        for name, convert in converters:
+            value = data[name]
+            if value is not None:
+                data[name] = convert(value)
+        data['image'] = data['image'] or DEFAULT_PRODUCT_IMAGE
+        return data
+
+    return columns, row_to_dict
+
+
+PRODUCT_LIST_COLUMNS, product_row_to_dict = _compile_product_row_serializer()
+
+
+def product_list_values(queryset):
+    """商品列表的 .values() 投影：只查询 ProductSerializer 用到的列（保留排序用的注解，不含 alias()）"""
+    return queryset.values(*PRODUCT_LIST_COLUMNS, *queryset.query.annotation_select)
+
+
+def serialize_product_rows(rows):
+    """product_list_values() 的结果 -> 与 ProductSerializer(many=True).data 相同的列表，不创建模型实例"""
+    return [product_row_to_dict(row) for row in rows]
 
 
 class ProductReviewSerializer(serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.username', read_only=True)
     user_full_name = serializers.SerializerMethodField()
+    helpful_count = serializers.SerializerMethodField()
     
     class Meta:
         model = ProductReview
@@ -34,6 +84,10 @@ class ProductReviewSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['user', 'helpful_count', 'created_at']
     
+    def get_helpful_count(self, obj):
+        # 列表查询通过 counters.with_counter 注解了包含未合并分片的计数
+        return getattr(obj, 'helpful_count_total', obj.helpful_count)
+    
     def get_user_full_name(self, obj):
         # 如果有用户全名字段，返回它，否则返回用户名
         return obj.user.get_full_name() or obj.user.username
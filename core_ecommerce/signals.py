@@ -0,0 +1,96 @@
+# core_ecommerce/signals.py
+
+"""模型信号：保持派生数据（搜索索引、销售汇总等）与源数据同步"""
+
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from .models import Cart, CartItem, Order, Product, PAID_ORDER_STATUSES
+from . import carts, catalog, reservations, rollups, search
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def bump_catalog_version(sender, raw=False, **kwargs):
+    if not raw:
+        catalog.bump_catalog_version()
+
+
+@receiver(post_save, sender=Product)
+def index_saved_product(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    search.get_backend().index([{
+        'id': instance.pk,
+        **{field: getattr(instance, field) for field in search.INDEXED_FIELDS},
+    }])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_deleted_product(sender, instance, **kwargs):
+    search.remove_product_ids([instance.pk])
+
+
+@receiver(post_save, sender=Order)
+def roll_up_saved_order(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old_state = getattr(instance, '_rollup_state', None)
+    new_state = instance.rollup_state()
+    if old_state == new_state:
+        return
+    rollups.apply_order_change(old_state, new_state)
+    if created and instance.user_id and not Order.objects.filter(user_id=instance.user_id).exclude(pk=instance.pk).exists():
+        rollups.add_new_buyer(instance.created_at)
+    old_status = old_state[0] if old_state else None
+    if old_status != instance.status:
+        # 付款后预占转为出库；取消时释放预占的库存
+        if instance.status in PAID_ORDER_STATUSES:
+            reservations.commit_order_reservations(instance)
+        elif instance.status == 'CANCELLED':
+            reservations.release_order_reservations(instance)
+    instance._rollup_state = new_state
+
+
+@receiver(pre_delete, sender=Order)
+def release_deleted_order_reservations(sender, instance, **kwargs):
+    reservations.release_order_reservations(instance)
+
+
+@receiver(post_delete, sender=Order)
+def roll_up_deleted_order(sender, instance, **kwargs):
+    state = getattr(instance, '_rollup_state', None) or instance.rollup_state()
+    if state is None:
+        return
+    rollups.apply_order_change(state, None)
+    if instance.user_id:
+        # 删除的是用户的首单：首单日期顺延到剩余订单中最早的一单
+        first_remaining = Order.objects.filter(user_id=instance.user_id).order_by('created_at') \
+            .values_list('created_at', flat=True).first()
+        if first_remaining is None or state[2] < first_remaining:
+            rollups.add_new_buyer(state[2], -1)
+            if first_remaining is not None:
+                rollups.add_new_buyer(first_remaining)
+
+
+@receiver(post_save, sender=Cart)
+@receiver(post_delete, sender=Cart)
+def invalidate_cart_cache(sender, instance, **kwargs):
+    carts.invalidate_cart(instance.user_id, instance.session_key)
+
+
+@receiver(post_save, sender=CartItem)
+@receiver(post_delete, sender=CartItem)
+def invalidate_cart_item_cache(sender, instance, **kwargs):
+    carts.invalidate_cart_ids([instance.cart_id])
+
+
+@receiver(user_logged_in)
+def merge_guest_cart_on_login(sender, request, user, **kwargs):
+    """只合并服务端会话中记录的匿名购物车；客户端提交的会话键（X-Session-Key）不可信，不参与合并"""
+    if request is None:
+        return
+    session = getattr(request, 'session', None)
+    cart_id = session.pop(carts.SESSION_CART_KEY, None) if session is not None else None
+    carts.merge_guest_carts(user, cart_ids=[cart_id])
@@ -0,0 +1,75 @@
+from celery import shared_task
+from .importer import run_import_job, stalled_import_job_ids
+from . import behavior_retention, carts, counters, embeddings, events, recommendations, related, reservations, rollups
+
+
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def run_product_import(job_id):
+    """Process a ProductImportJob from its last checkpoint."""
+    job = run_import_job(job_id)
+    if job is None:
+        return {'job_id': job_id, 'status': 'skipped'}
+    return {'job_id': job.id, 'status': job.status, 'rows': job.rows_processed}
+
+
+@shared_task
+def resume_stalled_import_jobs():
+    """Re-enqueue import jobs whose worker died mid-run."""
+    job_ids = stalled_import_job_ids()
+    for job_id in job_ids:
+        run_product_import.delay(job_id)
+    return {'resumed': len(job_ids)}
+
+
+@shared_task
+def reconcile_sales_rollups(days=rollups.RECONCILE_DAYS):
+    """Recompute recent sales rollup rows from the orders table."""
+    return rollups.reconcile_sales_rollups(days=days)
+
+
+@shared_task
+def release_expired_reservations():
+    """Release expired cart/order stock holds and cancel unpaid orders."""
+    return reservations.release_expired_reservations()
+
+
+@shared_task
+def compact_counters():
+    """Fold sharded counter increments back into their model fields."""
+    return {'compacted': counters.compact_counters()}
+
+
+@shared_task
+def purge_abandoned_carts(days=carts.GUEST_CART_TTL_DAYS):
+    """Delete anonymous carts nobody has touched for `days` days."""
+    return {'purged': carts.purge_abandoned_carts(days=days)}
+
+
+@shared_task
+def rebuild_related_products():
+    """Recompute the top-K related products index from co-views and co-purchases."""
+    return related.rebuild_related_products()
+
+
+@shared_task
+def rebuild_user_recommendations():
+    """Retrain the item-kNN model and replace every user's precomputed top-K recommendations."""
+    return recommendations.rebuild_user_recommendations()
+
+
+@shared_task
+def build_product_embeddings():
+    """Recompute product embeddings and atomically switch readers to the new files."""
+    return embeddings.build_product_embeddings()
+
+
+@shared_task
+def drain_behavior_events(max_batches=20):
+    """Bulk-insert buffered UserBehavior events."""
+    return {'written': events.drain_events(max_batches=max_batches)}
+
+
+@shared_task
+def compact_behavior_events(retain_days=behavior_retention.RETAIN_DAYS):
+    """Roll expired raw UserBehavior events up into daily counts and delete them."""
+    return behavior_retention.compact_behavior_events(retain_days=retain_days)
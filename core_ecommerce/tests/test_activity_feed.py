@@ -0,0 +1,149 @@
+import threading
+import time
+from decimal import Decimal
+from unittest import mock, skipIf
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from core_ecommerce.activity_feed import (
+    ActivityRing, RedisActivityFeed, StreamSlots, activity_ring, sse_stream, stream_slots,
+)
+from core_ecommerce.events import reset_event_buffer
+from core_ecommerce.models import Product, UserBehavior
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+class ActivityRingTest(SimpleTestCase):
+    def test_resume_after_id_and_overflow(self):
+        ring = ActivityRing(size=3)
+        ring.publish([{'event': name} for name in 'abcde'])
+        self.assertEqual(ring.last_id, 5)
+        # 只保留最近 3 条；落后太多的客户端从最早的一条开始
+        self.assertEqual([item['event'] for item in ring.read(0)], ['c', 'd', 'e'])
+        self.assertEqual([item['id'] for item in ring.read(3)], [4, 5])
+        self.assertEqual(ring.read(5), [])
+        # 进程重启后 ID 重新计数：客户端的 ID 超前时从头返回
+        self.assertEqual(len(ring.read(99)), 3)
+
+    def test_wait_wakes_up_on_publish(self):
+        ring = ActivityRing()
+        threading.Timer(0.05, ring.publish, args=[[{'event': 'view'}]]).start()
+        started = time.monotonic()
+        items = ring.wait(0, timeout=5)
+        self.assertEqual([item['id'] for item in items], [1])
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(ring.wait(1, timeout=0.01), [])
+
+    def test_sse_stream_format(self):
+        ring = ActivityRing()
+        ring.publish([{'event': 'view'}, {'event': 'click'}])
+        stream = sse_stream(1, duration=0.2, heartbeat=0.05, ring=ring)
+        self.assertEqual(next(stream), 'retry: 3000\n\n')
+        message = next(stream)
+        self.assertTrue(message.startswith('id: 2\nevent: behavior\ndata: {'))
+        self.assertIn('"event": "click"', message)
+        self.assertEqual(next(stream), ': keep-alive\n\n')
+        stream.close()
+
+
+@skipIf(fakeredis is None, 'fakeredis[lua] is not installed')
+class RedisActivityFeedTest(SimpleTestCase):
+    def setUp(self):
+        server = fakeredis.FakeServer()
+        with mock.patch('redis.Redis.from_url', return_value=fakeredis.FakeRedis(server=server)):
+            self.feed = RedisActivityFeed(size=100, location='redis://test')
+        # 另一个进程：共享同一个 Redis
+        with mock.patch('redis.Redis.from_url', return_value=fakeredis.FakeRedis(server=server)):
+            self.other = RedisActivityFeed(size=100, location='redis://test')
+
+    def test_publish_and_read_share_ids_across_processes(self):
+        self.feed.publish([{'event': 'view'}, {'event': 'like'}])
+        self.other.publish([{'event': 'click'}])
+        self.assertEqual(self.feed.last_id, 3)
+        self.assertEqual([(item['id'], item['event']) for item in self.other.read(0)],
+                         [(1, 'view'), (2, 'like'), (3, 'click')])
+        self.assertEqual([item['id'] for item in self.feed.read(1, limit=1)], [2])
+        self.assertEqual(self.feed.read(3), [])
+        # 计数器被清空后客户端的 ID 超前：从头返回
+        self.feed.clear()
+        self.feed.publish([{'event': 'view'}])
+        self.assertEqual([item['id'] for item in self.feed.read(99)], [1])
+
+    def test_wait_returns_pending_items_and_wakes_up_on_publish(self):
+        self.feed.publish([{'event': 'view'}, {'event': 'like'}])
+        self.assertEqual([item['id'] for item in self.other.wait(1, timeout=5)], [2])
+        self.assertEqual([item['id'] for item in self.other.wait(0, timeout=0)], [1, 2])
+        self.assertEqual(self.other.wait(2, timeout=0.05), [])
+
+        threading.Timer(0.05, self.feed.publish, args=[[{'event': 'click'}]]).start()
+        started = time.monotonic()
+        self.assertEqual([item['id'] for item in self.other.wait(2, timeout=5)], [3])
+        self.assertLess(time.monotonic() - started, 2)
+
+
+@override_settings(BEHAVIOR_EVENT_BUFFER={'BACKEND': 'locmem', 'FLUSH_INTERVAL': None})
+class BehaviorFeedAPITest(TestCase):
+    def setUp(self):
+        reset_event_buffer()
+        activity_ring.clear()
+        self.product = Product.objects.create(name='P', sku='P', price=Decimal('1.00'))
+        self.admin = User.objects.create_superuser(username='admin', password='pass')
+
+    def tearDown(self):
+        reset_event_buffer()
+        activity_ring.clear()
+
+    def test_ingested_events_reach_long_poll_and_sse(self):
+        self.client.post(reverse('api_user_behavior'), {'events': [
+            {'type': 'view', 'product_id': self.product.id}, {'type': 'like', 'product_id': self.product.id},
+        ]}, content_type='application/json')
+        self.client.force_login(self.admin)
+        url = reverse('api_behavior_feed')
+
+        data = self.client.get(url, {'after': 1, 'timeout': 0}).json()
+        self.assertEqual(data['last_id'], 2)
+        self.assertEqual([(e['id'], e['event'], e['product_id']) for e in data['events']], [(2, 'like', self.product.id)])
+        self.assertEqual(self.client.get(url, {'after': 2, 'timeout': 0}).json(), {'events': [], 'last_id': 2})
+
+        resp = self.client.get(url, HTTP_ACCEPT='text/event-stream', HTTP_LAST_EVENT_ID='1')
+        self.assertEqual(resp['Content-Type'], 'text/event-stream')
+        chunks = iter(resp.streaming_content)
+        next(chunks)
+        self.assertTrue(next(chunks).decode().startswith('id: 2\n'))
+        resp.close()
+
+    def test_recent_behaviors_return_model_fields(self):
+        record = UserBehavior.objects.create(product=self.product, behavior_type='view', metadata={'from': 'home'})
+        data = self.client.get(reverse('api_user_behavior')).json()
+        behavior = data['behaviors'][0]
+        self.assertEqual((behavior['behavior_id'], behavior['event'], behavior['meta'], behavior['product_id']),
+                         (record.id, 'view', {'from': 'home'}, self.product.id))
+        # 记录 ID 不能与动态流的事件 ID（last_event_id）混淆
+        self.assertNotIn('id', behavior)
+        self.assertIsNotNone(behavior['timestamp'])
+        self.assertEqual(data['last_event_id'], 0)
+
+    def test_feed_requires_admin(self):
+        self.assertEqual(self.client.get(reverse('api_behavior_feed'), {'timeout': 0}).status_code, 403)
+
+    def test_open_streams_are_capped(self):
+        self.client.force_login(self.admin)
+        url = reverse('api_behavior_feed')
+        with mock.patch('core_ecommerce.activity_feed.stream_slots', StreamSlots(limit=1)) as slots, \
+                mock.patch('core_ecommerce.api_views.stream_slots', slots):
+            resp = self.client.get(url, HTTP_ACCEPT='text/event-stream')
+            self.assertEqual(slots.active, 1)
+            busy = self.client.get(url, {'timeout': 0})
+            self.assertEqual(busy.status_code, 503)
+            self.assertEqual(busy['Retry-After'], '3')
+            # 尚未开始迭代就关闭的响应也归还名额
+            resp.close()
+            self.assertEqual(slots.active, 0)
+            self.assertEqual(self.client.get(url, {'timeout': 0}).status_code, 200)
+            self.assertEqual(slots.active, 0)
+        self.assertEqual(stream_slots.active, 0)
@@ -1,7 +1,14 @@
-from django.test import TestCase, Client
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth.models import User
-from core_ecommerce.models import Product
+from django.utils import timezone
+from core_ecommerce.models import Product, ProductImportJob
+from core_ecommerce.tasks import run_product_import
 from django.core.files.uploadedfile import SimpleUploadedFile
 
 class ProductImportAPITest(TestCase):
@@ -23,3 +30,128 @@ class ProductImportAPITest(TestCase):
         self.assertIn('created', data)
         # product exists
         self.assertTrue(Product.objects.filter(sku='SKU-001').exists())
+
+    def test_import_csv_updates_existing_and_reports_row_errors(self):
+        Product.objects.create(name='Old Name', sku='SKU-EXIST', price=5, stock=1, category='Old')
+        csv_content = (
+            'name,sku,price,stock,category\n'
+            'New Name,SKU-EXIST,9.90,,\n'
+            'Bad Price,SKU-BAD,abc,1,Cat\n'
+            'No Sku,,1.00,1,Cat\n'
+            '"Quoted, Name",SKU-NEW,3,7,Cat\n'
+        )
+        upload = SimpleUploadedFile('products.csv', csv_content.encode('utf-8-sig'), content_type='text/csv')
+        resp = self.client.post(reverse('api_product_import'), {'file': upload})
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertEqual(data['rows'], 4)
+        self.assertEqual(data['created'], 1)
+        self.assertEqual(data['updated'], 1)
+        self.assertEqual(data['failed'], 2)
+        self.assertEqual([e['line'] for e in data['errors']], [3, 4])
+        self.assertIn('rows_per_second', data)
+
+        existing = Product.objects.get(sku='SKU-EXIST')
+        self.assertEqual(existing.name, 'New Name')
+        self.assertEqual(str(existing.price), '9.90')
+        # 空值不覆盖已有字段
+        self.assertEqual(existing.stock, 1)
+        self.assertEqual(existing.category, 'Old')
+        self.assertEqual(Product.objects.get(sku='SKU-NEW').name, 'Quoted, Name')
+        self.assertFalse(Product.objects.filter(sku='SKU-BAD').exists())
+
+    def test_import_csv_without_sku_column_is_rejected(self):
+        upload = SimpleUploadedFile('products.csv', b'name,price\nA,1\n', content_type='text/csv')
+        resp = self.client.post(reverse('api_product_import'), {'file': upload})
+        self.assertEqual(resp.status_code, 400)
+
+
+    def test_import_csv_with_malformed_row_is_rejected(self):
+        content = 'name,sku\nA,SKU-1\nB,' + 'x' * 200000 + '\n'
+        upload = SimpleUploadedFile('products.csv', content.encode('utf-8'), content_type='text/csv')
+        resp = self.client.post(reverse('api_product_import'), {'file': upload})
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('第 3 行', resp.json()['error'])
+
+
+class ProductImportJobTest(TestCase):
+    csv_content = (
+        'name,sku,price,stock,category\n'
+        'A,JOB-1,1.00,1,Cat\n'
+        'B,JOB-2,2.00,2,Cat\n'
+        'C,JOB-3,oops,3,Cat\n'
+        'D,JOB-4,4.00,4,Cat\n'
+    )
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.user = User.objects.create_user(username='admin', password='pass', is_staff=True)
+        self.client.login(username='admin', password='pass')
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def upload(self):
+        return SimpleUploadedFile('products.csv', self.csv_content.encode('utf-8'), content_type='text/csv')
+
+    def test_async_upload_creates_job_and_reports_progress(self):
+        with mock.patch('core_ecommerce.tasks.run_product_import.delay') as delay:
+            resp = self.client.post(reverse('api_product_import'), {'file': self.upload(), 'async': '1'})
+        self.assertEqual(resp.status_code, 202)
+        job_id = resp.json()['job_id']
+        delay.assert_called_once_with(job_id)
+        self.assertFalse(Product.objects.exists())
+
+        run_product_import(job_id)
+
+        status_resp = self.client.get(resp.json()['status_url'])
+        data = status_resp.json()
+        self.assertEqual(data['status'], 'COMPLETED')
+        self.assertEqual(data['rows_processed'], 4)
+        self.assertEqual(data['rows_failed'], 1)
+        self.assertEqual(data['bytes_processed'], data['total_bytes'])
+        self.assertEqual(data['eta_seconds'], 0)
+        self.assertEqual(Product.objects.count(), 3)
+
+    def test_crashed_job_resumes_from_checkpoint(self):
+        job = ProductImportJob.objects.create(file=self.upload(), total_bytes=len(self.csv_content))
+        # 模拟 worker 在提交前两行之后崩溃：断点停在第 3 行（JOB-2）末尾
+        lines = self.csv_content.splitlines(keepends=True)
+        job.offset = len(''.join(lines[:3]).encode('utf-8'))
+        job.line_no = 3
+        job.header = ['name', 'sku', 'price', 'stock', 'category']
+        job.rows_processed = 2
+        job.created_count = 2
+        job.status = 'RUNNING'
+        job.started_at = job.heartbeat_at = timezone.now() - timedelta(hours=1)
+        job.save()
+
+        run_product_import(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'COMPLETED')
+        self.assertEqual(job.rows_processed, 4)
+        self.assertEqual(job.created_count, 3)
+        self.assertEqual(job.errors[0]['line'], 4)
+        # 断点之前的行不会被重复导入
+        self.assertFalse(Product.objects.filter(sku__in=['JOB-1', 'JOB-2']).exists())
+        self.assertTrue(Product.objects.filter(sku='JOB-4').exists())
+
+    def test_running_job_with_fresh_heartbeat_is_not_claimed_twice(self):
+        job = ProductImportJob.objects.create(
+            file=self.upload(), total_bytes=len(self.csv_content),
+            status='RUNNING', heartbeat_at=timezone.now(),
+        )
+        self.assertEqual(run_product_import(job.id)['status'], 'skipped')
+        self.assertFalse(Product.objects.exists())
+
+    def test_malformed_csv_fails_the_job(self):
+        self.csv_content = 'name,sku\nA,JOB-1\nB,' + 'x' * 200000 + '\n'
+        job = ProductImportJob.objects.create(file=self.upload(), total_bytes=len(self.csv_content))
+        self.assertEqual(run_product_import(job.id)['status'], 'FAILED')
+        job.refresh_from_db()
+        self.assertIn('CSV 格式错误', job.error_message)
+        self.assertIsNotNone(job.finished_at)
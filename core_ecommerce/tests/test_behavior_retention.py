@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from core_ecommerce.behavior_retention import compact_behavior_events
+from core_ecommerce.models import BehaviorDailyRollup, Product, UserBehavior, behavior_partition
+
+
+def local(*args):
+    return timezone.make_aware(datetime(*args))
+
+
+class BehaviorPartitionTest(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name='P', sku='P', price=1)
+
+    def track(self, created_at, behavior_type='view', product=None):
+        return UserBehavior.objects.create(
+            product=product or self.product, behavior_type=behavior_type, created_at=created_at,
+        )
+
+    def test_partition_key_follows_local_month(self):
+        # 上海时间 3 月 1 日 07:00 = UTC 2 月 28 日 23:00
+        event = self.track(local(2026, 3, 1, 7))
+        self.assertEqual(event.partition, 202603)
+        self.assertEqual(behavior_partition(local(2026, 12, 31, 23)), 202612)
+
+    def test_time_filters_prune_partitions(self):
+        self.track(local(2026, 1, 20))
+        self.track(local(2026, 2, 5))
+        newest = self.track(local(2026, 3, 2))
+        self.assertEqual(UserBehavior.objects.since(local(2026, 2, 1)).count(), 2)
+        self.assertEqual(UserBehavior.objects.before(local(2026, 2, 1)).count(), 1)
+        self.assertIn('"partition" >= 202602', str(UserBehavior.objects.since(local(2026, 2, 1)).query))
+
+        # recent() 逐个分区向前取
+        with self.assertNumQueries(4):
+            rows = UserBehavior.objects.recent(2)
+        self.assertEqual([row.created_at.month for row in rows], [3, 2])
+        self.assertEqual(UserBehavior.objects.recent(1), [newest])
+        self.assertEqual(len(UserBehavior.objects.recent(10)), 3)
+
+    def test_compaction_rolls_up_and_deletes_expired_events(self):
+        now = local(2026, 6, 15, 12)
+        other = Product.objects.create(name='Q', sku='Q', price=1)
+        for created_at, behavior_type, product in [
+            (local(2026, 2, 27, 9), 'view', None),
+            (local(2026, 2, 27, 23), 'view', None),
+            (local(2026, 2, 27, 10), 'click', None),
+            (local(2026, 3, 1, 8), 'view', other),
+            (local(2026, 6, 1, 8), 'view', None),
+        ]:
+            self.track(created_at, behavior_type, product)
+        BehaviorDailyRollup.objects.create(date=local(2026, 2, 27).date(), product=self.product,
+                                           behavior_type='view', count=5)
+
+        result = compact_behavior_events(retain_days=30, now=now)
+        self.assertEqual(result, {'partitions': 2, 'compacted': 4})
+        self.assertEqual(UserBehavior.objects.count(), 1)
+        rollups = set(BehaviorDailyRollup.objects.values_list('date', 'product_id', 'behavior_type', 'count'))
+        self.assertEqual(rollups, {
+            (local(2026, 2, 27).date(), self.product.id, 'view', 7),
+            (local(2026, 2, 27).date(), self.product.id, 'click', 1),
+            (local(2026, 3, 1).date(), other.id, 'view', 1),
+        })
+        self.assertEqual(compact_behavior_events(retain_days=30, now=now), {'partitions': 0, 'compacted': 0})
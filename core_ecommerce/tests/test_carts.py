@@ -0,0 +1,200 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_in
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from core_ecommerce.carts import GUEST_CART_TTL_DAYS, get_cart_data, merge_guest_carts, purge_abandoned_carts
+from core_ecommerce.models import Cart, CartItem, Product, StockReservation
+from core_ecommerce.reservations import stock_levels
+
+
+class CartReadModelTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='buyer', password='pass')
+        self.cart = Cart.objects.create(user=self.user)
+        self.p1 = Product.objects.create(name='P1', sku='P1', price=Decimal('0.10'), stock=9, category='Cat')
+        self.p2 = Product.objects.create(name='P2', sku='P2', price=Decimal('0.20'), stock=9, category='Cat', image_url='x.jpg')
+        CartItem.objects.create(cart=self.cart, product=self.p1, quantity=1)
+        CartItem.objects.create(cart=self.cart, product=self.p2, quantity=1)
+
+    def test_single_query_then_cached(self):
+        with self.assertNumQueries(1):
+            data = get_cart_data(user_id=self.user.id)
+        # Decimal 计算：0.1 + 0.2 恰好等于 0.3
+        self.assertEqual(data['total'], Decimal('0.30'))
+        self.assertEqual(data['count'], 2)
+        self.assertEqual([item['product_id'] for item in data['items']], [self.p1.id, self.p2.id])
+        self.assertEqual(data['items'][1]['image'], 'x.jpg')
+        with self.assertNumQueries(0):
+            get_cart_data(user_id=self.user.id)
+
+    def test_item_writes_invalidate_cache(self):
+        get_cart_data(user_id=self.user.id)
+        item = CartItem.objects.get(product=self.p1)
+        item.quantity = 3
+        item.save()
+        self.assertEqual(get_cart_data(user_id=self.user.id)['total'], Decimal('0.50'))
+        item.delete()
+        self.assertEqual(get_cart_data(user_id=self.user.id)['count'], 1)
+
+    def test_get_does_not_create_cart(self):
+        data = self.client.get(reverse('api_cart')).json()
+        self.assertEqual(data, {'id': None, 'items': [], 'count': 0, 'total': 0.0})
+        self.assertEqual(Cart.objects.count(), 1)
+
+        self.client.force_login(self.user)
+        data = self.client.get(reverse('api_cart')).json()
+        self.assertEqual(data['id'], self.cart.id)
+        self.assertEqual(data['total'], 0.3)
+
+
+class CartBatchAPITest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='buyer', password='pass')
+        self.client.force_login(self.user)
+        self.products = [
+            Product.objects.create(name=f'P{i}', sku=f'P{i}', price=Decimal('2.50'), stock=5, category='Cat')
+            for i in range(4)
+        ]
+
+    def batch(self, operations):
+        return self.client.post(reverse('api_cart_batch'), {'operations': operations}, content_type='application/json')
+
+    def test_batch_applies_operations_in_order_and_clamps_to_stock(self):
+        p0, p1, p2, p3 = self.products
+        resp = self.batch([
+            {'op': 'add', 'product_id': p0.id, 'quantity': 2},
+            {'op': 'add', 'product_id': p0.id, 'quantity': 1},
+            {'op': 'update', 'product_id': p1.id, 'quantity': 9},
+            {'op': 'add', 'product_id': p2.id},
+            {'op': 'add', 'product_id': p3.id, 'quantity': 1},
+            {'op': 'remove', 'product_id': p3.id},
+        ])
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertEqual(data['adjusted'], [{'product_id': p1.id, 'requested': 9, 'quantity': 5}])
+        self.assertEqual({item['product_id']: item['quantity'] for item in data['cart']['items']},
+                         {p0.id: 3, p1.id: 5, p2.id: 1})
+        self.assertEqual(data['cart']['total'], 22.5)
+        # 预占只写台账，商品行不变
+        p1.refresh_from_db()
+        self.assertEqual((p1.stock, stock_levels([p1.id])[p1.id]['available']), (5, 0))
+
+        # 再次批量修改：更新、删除已有商品项
+        data = self.batch([{'op': 'update', 'product_id': p0.id, 'quantity': 1},
+                           {'op': 'remove', 'product_id': p1.id}]).json()
+        self.assertEqual({item['product_id']: item['quantity'] for item in data['cart']['items']},
+                         {p0.id: 1, p2.id: 1})
+        self.assertEqual(stock_levels([p1.id])[p1.id]['available'], 5)
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        p0, p1, p2, p3 = self.products
+        self.batch([{'op': 'add', 'product_id': p0.id}])
+        small = self._queries([{'op': 'add', 'product_id': p1.id}])
+        large = self._queries([{'op': 'add', 'product_id': p2.id}, {'op': 'add', 'product_id': p3.id, 'quantity': 2}])
+        self.assertEqual(len(small), len(large))
+
+    def _queries(self, operations):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.batch(operations).status_code, 200)
+        return ctx.captured_queries
+
+    def test_invalid_batches_change_nothing(self):
+        p0 = self.products[0]
+        for operations in [[], [{'op': 'explode', 'product_id': p0.id}], [{'op': 'add'}],
+                           [{'op': 'add', 'product_id': p0.id}, {'op': 'add', 'product_id': 999999}]]:
+            self.assertEqual(self.batch(operations).status_code, 400)
+        self.assertFalse(CartItem.objects.exists())
+        p0.refresh_from_db()
+        self.assertEqual(p0.stock, 5)
+
+
+class GuestCartMergeTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='buyer', password='pass')
+        self.p1 = Product.objects.create(name='P1', sku='P1', price=Decimal('1.00'), stock=10, category='Cat')
+        self.p2 = Product.objects.create(name='P2', sku='P2', price=Decimal('2.00'), stock=10, category='Cat')
+
+    def add(self, product, quantity):
+        return self.client.post(reverse('api_cart'), {'product_id': product.id, 'quantity': quantity},
+                                content_type='application/json')
+
+    def test_login_merges_guest_cart_into_user_cart(self):
+        user_cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=user_cart, product=self.p1, quantity=2)
+        StockReservation.objects.create(product=self.p1, cart=user_cart, quantity=2,
+                                        expires_at=timezone.now() + timedelta(minutes=5))
+        self.add(self.p1, 3)
+        self.add(self.p2, 1)
+        guest_cart = Cart.objects.get(user__isnull=True)
+        self.assertEqual(self.client.get(reverse('api_cart')).json()['count'], 4)
+
+        self.assertTrue(self.client.login(username='buyer', password='pass'))
+
+        self.assertFalse(Cart.objects.filter(id=guest_cart.id).exists())
+        data = self.client.get(reverse('api_cart')).json()
+        self.assertEqual(data['id'], user_cart.id)
+        self.assertEqual({item['product_id']: item['quantity'] for item in data['items']}, {self.p1.id: 5, self.p2.id: 1})
+        # 预占随之转移：同款商品合并为一条，可售数量不变
+        holds = dict(StockReservation.objects.filter(cart=user_cart, status='ACTIVE').values_list('product_id', 'quantity'))
+        self.assertEqual(holds, {self.p1.id: 5, self.p2.id: 1})
+        self.assertEqual(stock_levels([self.p1.id])[self.p1.id], {'available': 5, 'reserved': 5, 'on_hand': 10})
+
+    def test_login_merges_guest_cart_with_released_holds(self):
+        self.add(self.p1, 2)
+        self.add(self.p2, 1)
+        item = CartItem.objects.get(product=self.p1)
+        self.client.delete(reverse('api_cart'), {'item_id': item.id}, content_type='application/json')
+        released = StockReservation.objects.get(product=self.p1)
+        self.assertEqual(released.status, 'RELEASED')
+
+        self.assertTrue(self.client.login(username='buyer', password='pass'))
+        self.assertEqual(Cart.objects.get().user, self.user)
+        self.assertEqual([item['product_id'] for item in self.client.get(reverse('api_cart')).json()['items']], [self.p2.id])
+        released.refresh_from_db()
+        self.assertIsNone(released.cart_id)
+
+    def test_login_does_not_merge_carts_named_by_the_client(self):
+        other = Cart.objects.create(session_key='victim')
+        CartItem.objects.create(cart=other, product=self.p1, quantity=1)
+        request = RequestFactory().post('/', HTTP_X_SESSION_KEY='victim')
+        request.session = SessionStore()
+        user_logged_in.send(sender=User, request=request, user=self.user)
+        self.assertEqual(Cart.objects.get(id=other.id).items.get().product, self.p1)
+        self.assertFalse(Cart.objects.filter(user=self.user).exists())
+
+    def test_login_without_guest_cart_does_nothing(self):
+        with self.assertNumQueries(0):
+            merge_guest_carts(self.user, cart_ids=[None])
+        self.assertTrue(self.client.login(username='buyer', password='pass'))
+        self.assertFalse(Cart.objects.exists())
+
+    def test_purge_abandoned_guest_carts(self):
+        now = timezone.now()
+        old = now - timedelta(days=GUEST_CART_TTL_DAYS + 1)
+        stale = [Cart.objects.create(session_key=f'stale{i}') for i in range(3)]
+        touched = Cart.objects.create(session_key='touched')
+        fresh = Cart.objects.create(session_key='fresh')
+        user_cart = Cart.objects.create(user=self.user)
+        for cart in stale + [touched, user_cart]:
+            CartItem.objects.create(cart=cart, product=self.p1)
+        hold = StockReservation.objects.create(product=self.p1, cart=stale[0], quantity=1, expires_at=old)
+        Cart.objects.exclude(id=fresh.id).update(updated_at=old)
+        CartItem.objects.exclude(cart=touched).update(updated_at=old)
+
+        self.assertEqual(purge_abandoned_carts(batch_size=2, now=now), 3)
+        self.assertEqual(set(Cart.objects.values_list('id', flat=True)), {touched.id, fresh.id, user_cart.id})
+        self.assertEqual(CartItem.objects.count(), 2)
+        hold.refresh_from_db()
+        self.assertIsNone(hold.cart_id)
+        self.assertEqual(purge_abandoned_carts(now=now), 0)
@@ -0,0 +1,101 @@
+import random
+import threading
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import OperationalError, close_old_connections, connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from core_ecommerce.checkout import InsufficientStock, place_order
+from core_ecommerce.models import Order, OrderItem, Product
+
+
+class OrderAPITest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='pass')
+        self.p1 = Product.objects.create(name='P1', sku='P1', price=Decimal('12.50'), stock=5, category='Cat')
+        self.p2 = Product.objects.create(name='P2', sku='P2', price=Decimal('3.00'), stock=1, category='Cat')
+        Product.objects.update(score_dirty=False)
+
+    def post(self, items):
+        return self.client.post(reverse('api_orders'), {'user_id': self.user.id, 'items': items}, content_type='application/json')
+
+    def test_order_reserves_stock_in_constant_queries(self):
+        items = [{'product_id': self.p1.id, 'quantity': 2}, {'product_id': self.p2.id, 'quantity': 1},
+                 {'product_id': self.p1.id, 'quantity': 1}]
+        resp = self.post(items)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['total_amount'], 40.5)
+        self.p1.refresh_from_db()
+        self.assertEqual((self.p1.stock, self.p1.sales_count, self.p1.score_dirty), (2, 3, True))
+        order = Order.objects.get(id=resp.json()['order_id'])
+        self.assertEqual(sorted(order.items.values_list('product_id', 'quantity')), [(self.p1.id, 3), (self.p2.id, 1)])
+
+        # 查询数与订单项数量无关（其中 3 条来自销售汇总信号，2 条读写库存预占，2 条是扣减库存的保存点）
+        more = [Product.objects.create(name=f'M{i}', sku=f'M{i}', price=1, stock=10, category='Cat') for i in range(10)]
+        with self.assertNumQueries(13):
+            place_order(self.user, [{'product_id': self.p1.id, 'quantity': 1}])
+        with self.assertNumQueries(13):
+            place_order(self.user, [{'product_id': p.id, 'quantity': 1} for p in more])
+
+    def test_insufficient_stock_rolls_back_everything(self):
+        resp = self.post([{'product_id': self.p1.id, 'quantity': 1}, {'product_id': self.p2.id, 'quantity': 2}])
+        self.assertEqual(resp.status_code, 409)
+        self.assertEqual(resp.json()['shortages'], [{'product_id': self.p2.id, 'requested': 2, 'available': 1}])
+        self.p1.refresh_from_db()
+        self.assertEqual((self.p1.stock, self.p1.sales_count), (5, 0))
+        self.assertFalse(Order.objects.exists())
+
+    def test_invalid_items(self):
+        self.assertEqual(self.post([]).status_code, 400)
+        self.assertEqual(self.post([{'quantity': 1}]).status_code, 400)
+        self.assertEqual(self.post([{'product_id': self.p1.id, 'quantity': 0}]).status_code, 400)
+        self.assertEqual(self.post([{'product_id': 999999, 'quantity': 1}]).status_code, 404)
+
+
+class ConcurrentCheckoutTest(TransactionTestCase):
+    """多线程同时抢购同一商品：成功订单数恰好等于库存，不超卖"""
+    STOCK = 10
+    BUYERS = 24
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='pass')
+        self.product = Product.objects.create(name='Hot', sku='HOT', price=1, stock=self.STOCK, category='Cat')
+
+    def _buy(self, results, barrier):
+        barrier.wait()
+        try:
+            for _ in range(1000):
+                try:
+                    place_order(self.user, [{'product_id': self.product.id, 'quantity': 1}])
+                    results.append('ok')
+                    return
+                except InsufficientStock:
+                    results.append('sold_out')
+                    return
+                except OperationalError:
+                    # SQLite 只允许一个写事务，"database is locked" 时稍后重试
+                    time.sleep(random.uniform(0.001, 0.01))
+            results.append('gave_up')
+        finally:
+            close_old_connections()
+            connection.close()
+
+    def test_no_oversell_under_parallel_checkout(self):
+        results = []
+        barrier = threading.Barrier(self.BUYERS)
+        threads = [threading.Thread(target=self._buy, args=(results, barrier)) for _ in range(self.BUYERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertNotIn('gave_up', results)
+        self.assertEqual(results.count('ok'), self.STOCK)
+        self.assertEqual(results.count('sold_out'), self.BUYERS - self.STOCK)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 0)
+        self.assertEqual(self.product.sales_count, self.STOCK)
+        self.assertEqual(Order.objects.count(), self.STOCK)
+        self.assertEqual(sum(OrderItem.objects.values_list('quantity', flat=True)), self.STOCK)
@@ -0,0 +1,82 @@
+import threading
+
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from core_ecommerce import counters
+from core_ecommerce.models import CounterShard, Product, ProductReview
+
+
+class ShardedCounterTest(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='u', password='pass')
+        self.product = Product.objects.create(name='P', sku='P', price=1, stock=1, category='Cat', sales_count=5)
+        self.review = ProductReview.objects.create(product=self.product, user=user, rating=5, helpful_count=2)
+
+    def test_increments_are_merged_on_read_and_compacted(self):
+        for _ in range(20):
+            counters.increment(ProductReview, self.review.id, 'helpful_count')
+        self.assertLessEqual(CounterShard.objects.count(), counters.COUNTER_SHARDS)
+        # 原字段未变，合并读取包含分片增量
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.helpful_count, 2)
+        self.assertEqual(counters.get_count(self.review, 'helpful_count'), 22)
+        self.assertEqual(counters.with_counter(ProductReview.objects.all(), 'helpful_count').get().helpful_count_total, 22)
+
+        self.assertEqual(counters.compact_counters(), 1)
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.helpful_count, 22)
+        self.assertFalse(CounterShard.objects.exists())
+        self.assertEqual(counters.get_count(self.review, 'helpful_count'), 22)
+
+    def test_unregistered_field_is_rejected(self):
+        with self.assertRaises(ValueError):
+            counters.increment(Product, self.product.id, 'stock')
+        # 销量随下单扣减库存的 UPDATE 一起累加，不走分片
+        with self.assertRaises(ValueError):
+            counters.increment(Product, self.product.id, 'sales_count')
+
+    def test_helpful_api_and_review_list(self):
+        url = reverse('api_review_helpful', args=[self.review.id])
+        self.assertEqual(self.client.post(url).json()['helpful_count'], 3)
+        self.assertEqual(self.client.post(url).json()['helpful_count'], 4)
+        reviews = self.client.get(reverse('api_product_reviews', args=[self.product.id])).json()
+        results = reviews['results'] if isinstance(reviews, dict) else reviews
+        self.assertEqual(results[0]['helpful_count'], 4)
+        self.assertEqual(self.client.post(reverse('api_review_helpful', args=[999999])).status_code, 404)
+
+
+class ConcurrentVoteTest(TransactionTestCase):
+    """并发投票不丢失计数"""
+    VOTERS = 16
+    VOTES_EACH = 10
+
+    def test_parallel_votes_are_not_lost(self):
+        user = User.objects.create_user(username='u', password='pass')
+        product = Product.objects.create(name='P', sku='P', price=1, stock=1, category='Cat')
+        review = ProductReview.objects.create(product=product, user=user, rating=5)
+        barrier = threading.Barrier(self.VOTERS)
+
+        def vote():
+            barrier.wait()
+            try:
+                for _ in range(self.VOTES_EACH):
+                    while True:
+                        try:
+                            counters.increment(ProductReview, review.id, 'helpful_count')
+                            break
+                        except OperationalError:
+                            # SQLite 同时只允许一个写入者
+                            pass
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=vote) for _ in range(self.VOTERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        counters.compact_counters()
+        review.refresh_from_db()
+        self.assertEqual(review.helpful_count, self.VOTERS * self.VOTES_EACH)
@@ -0,0 +1,102 @@
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+
+import numpy as np
+from django.contrib.auth.models import AnonymousUser
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from ai_guide.ai_service import AIGuideService
+from core_ecommerce.embeddings import (
+    EmbeddingStore, build_product_embeddings, get_embedding_store, reset_embedding_store, search_products,
+    similar_products, tokenize,
+)
+from core_ecommerce.models import Product
+
+
+class ProductEmbeddingsTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.settings = override_settings(PRODUCT_EMBEDDINGS={'PATH': self.tmp.name, 'DIMENSIONS': 8, 'N_FEATURES': 4096})
+        self.settings.enable()
+        reset_embedding_store()
+        products = [
+            ('降噪蓝牙耳机', '数码配件', '主动降噪，蓝牙 5.3，续航 30 小时'),
+            ('无线蓝牙耳机 Pro', '数码配件', '入耳式蓝牙耳机，通话降噪'),
+            ('机械键盘', '电脑外设', 'RGB 背光机械键盘，青轴'),
+            ('游戏机械键盘', '电脑外设', '热插拔机械轴，全键无冲'),
+            ('智能台灯', '智能家居', '护眼台灯，手机 App 调光'),
+        ]
+        self.earbuds, self.earbuds_pro, self.keyboard, self.gaming_keyboard, self.lamp = [
+            Product.objects.create(name=name, sku=f'SKU{i}', category=category, description=description,
+                                   price=Decimal('99.00'), stock=10)
+            for i, (name, category, description) in enumerate(products)
+        ]
+
+    def tearDown(self):
+        reset_embedding_store()
+        self.settings.disable()
+        self.tmp.cleanup()
+
+    def test_tokenize_words_and_cjk_bigrams(self):
+        self.assertEqual(tokenize('RGB 键盘'), ['rgb', '键', '盘', '键盘'])
+
+    def test_store_is_memory_mapped_and_normalized(self):
+        result = build_product_embeddings()
+        self.assertEqual((result['products'], result['dimensions']), (5, 5))
+        snapshot = get_embedding_store().snapshot()
+        self.assertIsInstance(snapshot.vectors, np.memmap)
+        self.assertEqual(snapshot.vectors.dtype, np.float32)
+        self.assertTrue(np.allclose(np.linalg.norm(snapshot.vectors, axis=1), 1.0, atol=1e-5))
+        self.assertEqual(snapshot.ids.tolist(), sorted(snapshot.ids.tolist()))
+
+    def test_similar_products_and_batched_top_k(self):
+        build_product_embeddings()
+        self.assertEqual(similar_products(self.earbuds.id, limit=1), [self.earbuds_pro])
+        self.assertEqual(similar_products(self.gaming_keyboard.id, limit=1), [self.keyboard])
+        self.assertEqual(similar_products(999999), [])
+
+        store = get_embedding_store()
+        snapshot = store.snapshot()
+        vectors = np.asarray(snapshot.vectors)
+        expected = vectors @ vectors.T
+        np.fill_diagonal(expected, -np.inf)
+        # 分块（每块 2 行）合并的 Top-K 与整体计算一致
+        neighbours = store.similar(snapshot.ids.tolist(), k=3, batch_rows=2)
+        for row, ranked in enumerate(neighbours):
+            best = np.argsort(-expected[row], kind='stable')[:3]
+            self.assertEqual([pk for pk, _ in ranked], snapshot.ids[best].tolist())
+            self.assertTrue(np.allclose([score for _, score in ranked], expected[row, best], atol=1e-5))
+
+    def test_text_search_and_version_switch(self):
+        build_product_embeddings()
+        self.assertEqual(search_products('降噪 通话', limit=2), [self.earbuds_pro, self.earbuds])
+        self.assertEqual(search_products('xyz'), [])
+
+        # 打开着的实例在下一次查询时切换到新版本，旧版本目录按 KEEP_VERSIONS 清理
+        store = get_embedding_store()
+        old_version = store.version
+        new = Product.objects.create(name='蓝牙降噪耳机 Lite', sku='NEW', category='数码配件', price=Decimal('1.00'))
+        build_product_embeddings()
+        build_product_embeddings()
+        self.assertIn(new.id, [pk for pk, _ in store.search('蓝牙降噪耳机', k=5)])
+        self.assertNotEqual(store.version, old_version)
+        self.assertEqual(len([p for p in Path(self.tmp.name).iterdir() if p.is_dir()]), 2)
+        self.assertIsNone(EmbeddingStore(Path(self.tmp.name) / 'missing').snapshot())
+
+    def test_ai_guide_and_recommendation_api_use_embeddings(self):
+        build_product_embeddings()
+        # 消息中没有可识别的商品类型时按语义检索
+        _, products = AIGuideService().get_ai_response_with_products(AnonymousUser(), '想要一个护眼调光的')
+        self.assertEqual(products[0], self.lamp)
+        # 命中经过查询集过滤，保持相似度顺序
+        candidates = Product.objects.exclude(id=self.earbuds_pro.id)
+        self.assertEqual(search_products('降噪 通话', limit=1, queryset=candidates), [self.earbuds])
+        # 缺货的商品不推荐
+        Product.objects.filter(id=self.lamp.id).update(stock=0)
+        _, products = AIGuideService().get_ai_response_with_products(AnonymousUser(), '想要一个护眼调光的')
+        self.assertNotIn(self.lamp, products)
+
+        data = self.client.get(reverse('api_recommendations'), {'product_id': self.keyboard.id}).json()
+        self.assertEqual(data['source'], 'similar')
+        self.assertEqual(data['recommendations'][0]['name'], '游戏机械键盘')
@@ -0,0 +1,97 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipIf
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from core_ecommerce.events import RedisEventBuffer, drain_events, get_event_buffer, reset_event_buffer
+from core_ecommerce.models import Product, UserBehavior
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+@override_settings(BEHAVIOR_EVENT_BUFFER={'BACKEND': 'locmem', 'CAPACITY': 5, 'FLUSH_INTERVAL': None})
+class BehaviorEventIngestionTest(TestCase):
+    def setUp(self):
+        reset_event_buffer()
+        self.product = Product.objects.create(name='P', sku='P', price=Decimal('1.00'))
+        self.url = reverse('api_user_behavior')
+
+    def tearDown(self):
+        reset_event_buffer()
+
+    def post(self, events, **extra):
+        return self.client.post(self.url, {'events': events}, content_type='application/json', **extra)
+
+    def test_events_are_buffered_then_bulk_inserted(self):
+        with self.assertNumQueries(0):
+            resp = self.post([
+                {'type': 'view', 'product_id': self.product.id, 'metadata': {'from': 'home'}},
+                {'type': 'click', 'product_id': str(self.product.id)},
+                {'type': 'teleport', 'product_id': self.product.id},
+                {'type': 'view', 'product_id': self.product.id + 1000},
+            ], HTTP_X_SESSION_KEY='abc')
+        self.assertEqual(resp.status_code, 202)
+        self.assertEqual(resp.json(), {'accepted': 3, 'dropped': 0, 'invalid': 1})
+        self.assertFalse(UserBehavior.objects.exists())
+
+        before = timezone.now()
+        with self.assertNumQueries(2):
+            self.assertEqual(drain_events(), 2)
+        rows = list(UserBehavior.objects.order_by('id'))
+        self.assertEqual([row.behavior_type for row in rows], ['view', 'click'])
+        self.assertEqual(rows[0].metadata, {'from': 'home'})
+        self.assertEqual(rows[0].session_id, 'abc')
+        # 保留接收时间，而不是写入时间
+        self.assertLessEqual(rows[0].created_at, before)
+        self.assertGreater(rows[0].created_at, before - timedelta(minutes=1))
+
+        stats = get_event_buffer().metrics()
+        self.assertEqual((stats['accepted'], stats['written'], stats['invalid'], stats['backlog']), (3, 2, 2, 0))
+
+    def test_full_buffer_drops_and_counts(self):
+        user = User.objects.create_user(username='u', password='pass')
+        self.client.force_login(user)
+        self.assertEqual(self.post([{'type': 'view'}] * 4).json()['dropped'], 0)
+        self.assertEqual(self.post([{'type': 'view'}] * 3).json(), {'accepted': 1, 'dropped': 2, 'invalid': 0})
+        self.assertEqual(drain_events(batch_size=2), 5)
+        self.assertEqual(UserBehavior.objects.filter(user=user).count(), 5)
+
+        admin = User.objects.create_superuser(username='admin', password='pass')
+        self.client.force_login(admin)
+        stats = self.client.get(reverse('api_behavior_stats')).json()
+        self.assertEqual((stats['dropped'], stats['backlog'], stats['capacity']), (2, 0, 5))
+
+    def test_events_of_deleted_users_are_kept_without_user(self):
+        user = User.objects.create_user(username='gone', password='pass')
+        self.client.force_login(user)
+        self.post([{'type': 'view', 'product_id': self.product.id}])
+        self.client.logout()
+        self.post([{'type': 'click', 'product_id': self.product.id}])
+        user.delete()
+        self.assertEqual(drain_events(), 2)
+        self.assertEqual(list(UserBehavior.objects.order_by('id').values_list('behavior_type', 'user_id')),
+                         [('view', None), ('click', None)])
+
+    def test_rejects_oversized_or_malformed_batches(self):
+        self.assertEqual(self.post([{'type': 'view'}] * 501).status_code, 400)
+        self.assertEqual(self.post([]).status_code, 400)
+        self.assertEqual(get_event_buffer().metrics()['backlog'], 0)
+
+
+@skipIf(fakeredis is None, 'fakeredis[lua] is not installed')
+class RedisEventBufferTest(SimpleTestCase):
+    def test_push_never_exceeds_capacity(self):
+        with mock.patch('redis.Redis.from_url', return_value=fakeredis.FakeRedis()):
+            buffer = RedisEventBuffer(capacity=3, location='redis://test')
+        self.assertEqual(buffer.push([{'n': 1}, {'n': 2}]), 2)
+        self.assertEqual(buffer.push([{'n': 3}, {'n': 4}]), 1)
+        self.assertEqual(buffer.push([{'n': 5}]), 0)
+        metrics = buffer.metrics()
+        self.assertEqual((metrics['accepted'], metrics['dropped'], metrics['backlog']), (3, 2, 3))
+        self.assertEqual(buffer.pop(10), [{'n': 1}, {'n': 2}, {'n': 3}])
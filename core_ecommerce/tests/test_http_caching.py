@@ -0,0 +1,60 @@
+from decimal import Decimal
+
+from django.core.cache import cache, caches
+from django.test import TestCase
+from django.urls import reverse
+from core_ecommerce.catalog import catalog_state
+from core_ecommerce.models import Product
+from core_ecommerce.reservations import adjust_stock
+
+
+class CatalogConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(name='P', sku='P', price=Decimal('9.90'), stock=5)
+
+    def test_etag_and_304_without_queries(self):
+        for url in [reverse('api_product_list'), reverse('api_product_detail', args=[self.product.id])]:
+            resp = self.client.get(url)
+            self.assertEqual(resp.status_code, 200)
+            self.assertTrue(resp['ETag'].startswith('"catalog-'))
+            self.assertIn('Last-Modified', resp)
+            self.assertIn('s-maxage=30', resp['Cache-Control'])
+            self.assertIn('public', resp['Cache-Control'])
+
+            with self.assertNumQueries(0):
+                cached = self.client.get(url, HTTP_IF_NONE_MATCH=resp['ETag'])
+            self.assertEqual(cached.status_code, 304)
+            self.assertEqual(cached['ETag'], resp['ETag'])
+
+    def test_writes_bump_version_now_and_after_commit(self):
+        url = reverse('api_product_list')
+        etag = self.client.get(url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.product.name = 'Renamed'
+            self.product.save()
+            during = catalog_state()[0]
+        self.assertTrue(callbacks)
+        self.assertEqual(catalog_state()[0], during + 1)
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['results'][0]['name'], 'Renamed')
+
+        # 绕过信号的批量写入（库存扣减）同样递增版本号
+        version = catalog_state()[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(adjust_stock({self.product.id: -1}))
+        self.assertEqual(catalog_state()[0], version + 2)
+
+    def test_version_is_shared_across_cache_connections(self):
+        # 另一个缓存连接（如 Celery worker 中）递增的版本号，本连接可以读到
+        version = catalog_state()[0]
+        worker_cache = caches.create_connection('default')
+        worker_cache.incr('catalog:version')
+        self.assertEqual(catalog_state()[0], version + 1)
+
+    def test_missing_detail_is_not_cached(self):
+        resp = self.client.get(reverse('api_product_detail', args=[999999]))
+        self.assertEqual(resp.status_code, 404)
+        self.assertNotIn('ETag', resp)
@@ -0,0 +1,77 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from core_ecommerce.models import Product, ProductReview
+
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        # 大量相同评分，验证 id 次级排序能稳定翻页
+        for i in range(25):
+            Product.objects.create(
+                name=f'P{i}', sku=f'SKU-{i:03d}', price=10 + i % 4, potential_score=(i % 3) / 10,
+            )
+
+    def walk(self, url, params):
+        pages = []
+        resp = self.client.get(url, {**params, 'cursor': ''})
+        while True:
+            data = resp.json()
+            pages.append([p['id'] for p in data['results']])
+            if not data['next']:
+                return pages, data
+            resp = self.client.get(data['next'])
+
+    def test_forward_pages_match_full_ordering(self):
+        url = reverse('api_product_list')
+        for ordering, expected_qs in [
+            (None, Product.objects.order_by('-potential_score', '-id')),
+            ('price', Product.objects.order_by('price', 'id')),
+            ('-price', Product.objects.order_by('-price', '-id')),
+        ]:
+            params = {'ordering': ordering} if ordering else {}
+            pages, _ = self.walk(url, params)
+            self.assertEqual([len(p) for p in pages], [9, 9, 7])
+            self.assertEqual(sum(pages, []), list(expected_qs.values_list('id', flat=True)))
+
+    def test_previous_link_returns_preceding_page(self):
+        url = reverse('api_product_list')
+        first = self.client.get(url, {'cursor': ''}).json()
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).json()
+        back = self.client.get(second['previous']).json()
+        self.assertEqual(back['results'], first['results'])
+
+    def test_keyset_page_skips_count_query(self):
+        url = reverse('api_product_list')
+        first = self.client.get(url, {'cursor': ''}).json()
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(first['next'])
+        sql = ' '.join(q['sql'] for q in ctx.captured_queries)
+        self.assertNotIn('COUNT(', sql.upper())
+        self.assertNotIn('OFFSET', sql.upper())
+
+    def test_invalid_cursor_is_404(self):
+        resp = self.client.get(reverse('api_product_list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(resp.status_code, 404)
+
+    def test_page_number_pagination_still_default(self):
+        data = self.client.get(reverse('api_product_list'), {'page': 2}).json()
+        self.assertEqual(data['count'], 25)
+        self.assertEqual(len(data['results']), 9)
+
+    def test_review_cursor_pagination(self):
+        user = User.objects.create_user(username='u')
+        product = Product.objects.first()
+        for i in range(30):
+            ProductReview.objects.create(product=product, user=user, rating=5, content=str(i))
+        url = reverse('api_product_reviews', args=[product.id])
+        pages, last = self.walk(url, {'page_size': 12})
+        self.assertEqual([len(p) for p in pages], [12, 12, 6])
+        self.assertEqual(
+            sum(pages, []),
+            list(ProductReview.objects.order_by('-created_at', '-id').values_list('id', flat=True)),
+        )
+        self.assertNotIn('count', last)
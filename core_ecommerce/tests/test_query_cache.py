@@ -0,0 +1,155 @@
+import threading
+import time
+from decimal import Decimal
+from unittest import mock, skipIf
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from core_ecommerce.models import Product
+from core_ecommerce.query_cache import LocMemLRUBackend, QueryCache, RedisBackend, get_query_cache
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+class QueryCacheTest(SimpleTestCase):
+    def make_cache(self, **options):
+        return QueryCache(LocMemLRUBackend(**{'max_entries': 2, 'timeout': 60, 'lock_timeout': 2, **options}))
+
+    def test_lru_eviction_ttl_and_metrics(self):
+        query_cache = self.make_cache()
+        for key in 'abc':
+            query_cache.get_or_compute(key, lambda key=key: key.upper())
+        # 超出上限：最久未使用的 a 被淘汰
+        self.assertEqual(query_cache.get_or_compute('b', lambda: 'changed'), 'B')
+        self.assertEqual(query_cache.get_or_compute('a', lambda: 'again'), 'again')
+        stats = query_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['fills'], stats['entries']), (1, 4, 4, 2))
+        self.assertEqual(stats['evictions'], 2)
+
+        expired = self.make_cache(timeout=0)
+        expired.get_or_compute('a', lambda: 1)
+        self.assertEqual(expired.get_or_compute('a', lambda: 2), 2)
+
+    def test_concurrent_misses_compute_once(self):
+        query_cache = self.make_cache()
+        calls = []
+        results = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'value'
+
+        threads = [threading.Thread(target=lambda: results.append(query_cache.get_or_compute('k', compute)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 8)
+        self.assertEqual(query_cache.stats()['waited_hits'], 7)
+
+    def test_failed_compute_releases_lock(self):
+        query_cache = self.make_cache()
+        with self.assertRaises(ZeroDivisionError):
+            query_cache.get_or_compute('k', lambda: 1 / 0)
+        self.assertEqual(query_cache.get_or_compute('k', lambda: 1), 1)
+
+
+@skipIf(fakeredis is None, 'fakeredis[lua] is not installed')
+class RedisBackendTest(SimpleTestCase):
+    def make_backend(self, server=None):
+        client = fakeredis.FakeRedis(server=server or fakeredis.FakeServer())
+        with mock.patch('redis.Redis.from_url', return_value=client):
+            return RedisBackend(max_entries=2, timeout=60, lock_timeout=2, location='redis://test')
+
+    def test_release_only_drops_the_lock_it_owns(self):
+        backend = self.make_backend()
+        stale = backend.acquire('k')
+        # 锁超时后被其他请求重新获取：旧持有者释放时不能删掉新的锁
+        backend.client.delete('product_query:lock:k')
+        current = backend.acquire('k')
+        backend.release('k', stale)
+        self.assertIsNone(backend.acquire('k'))
+        backend.release('k', current)
+        self.assertIsNotNone(backend.acquire('k'))
+
+    def test_redis_errors_fall_back_to_an_uncached_query(self):
+        import redis
+
+        query_cache = QueryCache(self.make_backend())
+        self.assertEqual(query_cache.get_or_compute('k', lambda: 1), 1)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return 2
+
+        with self.assertLogs('core_ecommerce.query_cache', 'WARNING'):
+            with mock.patch.object(query_cache.backend.client, 'get', side_effect=redis.ConnectionError):
+                self.assertEqual(query_cache.get_or_compute('k', compute), 2)
+            # 查询完成后写入失败：返回已查到的结果，不重复查询
+            with mock.patch.object(query_cache.backend.client, 'pipeline', side_effect=redis.ConnectionError):
+                self.assertEqual(query_cache.get_or_compute('other', compute), 2)
+        self.assertEqual(len(calls), 2)
+
+
+class ProductListQueryCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        get_query_cache().clear()
+        Product.objects.create(name='P1', sku='P1', price=Decimal('5.00'), potential_score=0.2)
+
+    def test_repeat_requests_skip_the_database_until_catalog_changes(self):
+        url = reverse('api_product_list')
+        first = self.client.get(url, {'ordering': 'price', 'page': 1}).json()
+        with self.assertNumQueries(0):
+            again = self.client.get(url, {'ordering': 'price'}).json()
+        self.assertEqual(again, first)
+
+        Product.objects.create(name='P2', sku='P2', price=Decimal('1.00'))
+        data = self.client.get(url, {'ordering': 'price'}).json()
+        self.assertEqual([p['name'] for p in data['results']], ['P2', 'P1'])
+
+        admin = User.objects.create_superuser(username='admin', password='pass')
+        self.client.force_login(admin)
+        stats = self.client.get(reverse('api_query_cache_stats')).json()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+
+    def test_key_follows_the_filters_the_queryset_applies(self):
+        Product.objects.create(name='P2', sku='P2', price=Decimal('7.00'), category='Toys')
+        url = reverse('api_product_list')
+        self.assertEqual(self.client.get(url, {'category': 'Toys'}).json()['count'], 1)
+        # 分类比较不去空格：结果不同，不能共用缓存
+        self.assertEqual(self.client.get(url, {'category': 'Toys '}).json()['count'], 0)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, {'category': 'toys'}).json()['count'], 1)
+        self.assertEqual(self.client.get(url, {'min_price': '6', 'category': 'TOYS'}).json()['count'], 1)
+        # 6 与 6.0 解析为相同的价格
+        with self.assertNumQueries(0):
+            self.client.get(url, {'min_price': '6.0', 'category': 'Toys'})
+
+    def test_pagination_links_follow_the_current_request(self):
+        Product.objects.create(name='P2', sku='P2', price=Decimal('7.00'))
+        url = reverse('api_product_list')
+        first = self.client.get(url, {'page_size': 1, 'ordering': 'price'}).json()
+        self.assertIn('ordering=price', first['next'])
+        with self.assertNumQueries(0):
+            again = self.client.get(url, {'ordering': 'price', 'page_size': 1, 'ref': 'mail'}).json()
+        self.assertEqual(again['results'], first['results'])
+        self.assertIn('ref=mail', again['next'])
+        self.assertIn('page=2', again['next'])
+
+        keyset = self.client.get(url, {'cursor': '', 'page_size': 1, 'ordering': 'price'}).json()
+        with self.assertNumQueries(0):
+            cached = self.client.get(url, {'cursor': '', 'page_size': 1, 'ordering': 'price', 'ref': 'mail'}).json()
+        self.assertEqual(cached['results'], keyset['results'])
+        self.assertIn('ref=mail', cached['next'])
+        second = self.client.get(cached['next']).json()
+        self.assertEqual([p['name'] for p in second['results']], ['P2'])
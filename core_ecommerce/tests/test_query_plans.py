@@ -0,0 +1,67 @@
+import unittest
+
+from django.db import connection
+from django.db.models import Count, Sum
+from django.test import TestCase
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core_ecommerce.api_views import ProductListAPI
+from core_ecommerce.pagination import KeysetPagination
+from core_ecommerce.models import Product
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'query plans asserted against SQLite')
+class ProductIndexQueryPlanTest(TestCase):
+    """热点查询必须命中 Product.Meta.indexes 中对应的索引"""
+
+    def setUp(self):
+        for i in range(30):
+            Product.objects.create(
+                name=f'P{i}', sku=f'SKU-{i}', price=i, stock=i, category='数码配件' if i % 2 else 'Toys',
+                sales_count=i * 7, potential_score=i / 30,
+            )
+
+    def list_queryset(self, **params):
+        view = ProductListAPI()
+        view.request = Request(APIRequestFactory().get('/', params))
+        view.kwargs = {}
+        return view.get_queryset()
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, plan)
+        self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan, plan)
+
+    def test_product_list_default_ordering(self):
+        self.assertUsesIndex(self.list_queryset()[:9], 'product_score_idx')
+
+    def test_product_list_price_ordering(self):
+        self.assertUsesIndex(self.list_queryset(ordering='price')[:9], 'product_price_idx')
+        self.assertUsesIndex(self.list_queryset(ordering='-price')[:9], 'product_price_idx')
+
+    def test_product_list_category_filter(self):
+        self.assertUsesIndex(self.list_queryset(category='toys')[:9], 'product_cat_score_idx')
+        self.assertUsesIndex(self.list_queryset(category='Toys', ordering='price')[:9], 'product_cat_price_idx')
+        self.assertEqual(self.list_queryset(category='toys').count(), 15)
+
+    def test_product_list_keyset_page(self):
+        ordering = ['-potential_score', '-id']
+        condition = KeysetPagination().keyset_filter(ordering, [0.5, 15], reverse=False)
+        self.assertUsesIndex(self.list_queryset().filter(condition)[:10], 'product_score_idx')
+
+    def test_top_sellers(self):
+        self.assertUsesIndex(Product.objects.order_by('-sales_count')[:10], 'product_sales_idx')
+
+    def test_category_sales_stats(self):
+        qs = Product.objects.values('category').annotate(
+            count=Count('id'), total_sales=Sum('sales_count'),
+        )
+        self.assertIn('product_cat_sales_idx', qs.explain())
+
+    def test_low_stock_uses_partial_index(self):
+        self.assertUsesIndex(Product.objects.low_stock(10).order_by('stock')[:20], 'product_low_stock_idx')
+        self.assertIn('product_low_stock_idx', Product.objects.low_stock(10).explain())
+        self.assertEqual(Product.objects.low_stock(10).count(), 10)
+        # 阈值超出部分索引覆盖范围时结果仍然正确
+        self.assertEqual(Product.objects.low_stock(25).count(), 25)
@@ -0,0 +1,98 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from core_ecommerce.behavior_retention import compact_behavior_events
+from core_ecommerce.models import Order, OrderItem, Product, UserBehavior, UserRecommendation, behavior_partition
+from core_ecommerce.recommendations import (
+    item_similarity, rebuild_user_recommendations, recommended_products, user_item_matrix,
+)
+
+
+class UserRecommendationsTest(TestCase):
+    def setUp(self):
+        self.u1, self.u2, self.u3, self.new = [
+            User.objects.create_user(username=name, password='pass') for name in ['u1', 'u2', 'u3', 'new']
+        ]
+        self.a, self.b, self.c, self.d = [
+            Product.objects.create(name=name, sku=name, price=Decimal('1.00'), sales_count=sales)
+            for name, sales in [('A', 1), ('B', 2), ('C', 3), ('D', 4)]
+        ]
+        for user, products, status in [(self.u1, (self.a, self.b), 'PAID'), (self.u2, (self.a, self.b, self.c), 'PAID'),
+                                       (self.u3, (self.d,), 'CANCELLED')]:
+            order = Order.objects.create(user=user, total_amount=Decimal('2.00'), status=status)
+            for product in products:
+                OrderItem.objects.create(order=order, product=product, price=product.price)
+        for user, product, behavior in [(self.u3, self.a, 'view'), (self.u3, self.a, 'like'),
+                                        (None, self.d, 'view'), (self.u3, self.d, 'review')]:
+            UserBehavior.objects.create(user=user, session_id='s', product=product, behavior_type=behavior)
+
+    def ranked(self, user):
+        return list(UserRecommendation.objects.filter(user=user).order_by('rank').values_list('product__name', 'score'))
+
+    def test_scores_match_dense_item_knn(self):
+        matrix, user_ids, product_ids = user_item_matrix()
+        # 取消的订单、匿名行为、未加权的行为类型不计入
+        self.assertEqual(matrix.shape, (3, 3))
+        self.assertNotIn(self.d.id, product_ids.tolist())
+
+        dense = matrix.toarray()
+        unit = dense / np.linalg.norm(dense, axis=0)
+        similarity = unit.T @ unit
+        np.fill_diagonal(similarity, 0)
+        expected = dense @ similarity
+        self.assertTrue(np.allclose(item_similarity(matrix, min_support=1).toarray(), similarity))
+
+        self.assertEqual(rebuild_user_recommendations(min_support=1), {'users': 2, 'items': 3})
+        row = {pk: i for i, pk in enumerate(user_ids.tolist())}
+        column = {pk: i for i, pk in enumerate(product_ids.tolist())}
+        # 已交互过的商品不再推荐
+        self.assertEqual([name for name, _ in self.ranked(self.u1)], ['C'])
+        self.assertEqual(self.ranked(self.u2), [])
+        u3 = self.ranked(self.u3)
+        self.assertEqual([name for name, _ in u3], ['B', 'C'])
+        self.assertAlmostEqual(u3[0][1], expected[row[self.u3.id], column[self.b.id]])
+        self.assertAlmostEqual(u3[1][1], expected[row[self.u3.id], column[self.c.id]])
+
+    def test_behavior_window_is_capped_at_retention(self):
+        # 120 天前：订单仍在回看窗口内，原始行为已超过保留期
+        old = timezone.now() - timedelta(days=120)
+        Order.objects.filter(user=self.u1).update(created_at=old)
+        UserBehavior.objects.update(created_at=old, partition=behavior_partition(old))
+
+        before = rebuild_user_recommendations(min_support=1)
+        ranked = {user: self.ranked(user) for user in [self.u1, self.u3]}
+        self.assertEqual(compact_behavior_events()['compacted'], 4)
+        # 压缩前后训练结果一致：行为窗口本来就不超过保留期，订单仍按 LOOKBACK_DAYS 计入
+        self.assertEqual(rebuild_user_recommendations(min_support=1), before)
+        self.assertEqual({user: self.ranked(user) for user in [self.u1, self.u3]}, ranked)
+        self.assertEqual([name for name, _ in ranked[self.u1]], ['C'])
+        self.assertEqual(ranked[self.u3], [])
+
+    def test_min_support_and_full_replace(self):
+        rebuild_user_recommendations(min_support=1)
+        # A-B 有 2 个共同用户，A-C、B-C 只有 1 个
+        self.assertEqual(rebuild_user_recommendations(min_support=2), {'users': 1, 'items': 1})
+        self.assertEqual([name for name, _ in self.ranked(self.u3)], ['B'])
+        self.assertEqual(UserRecommendation.objects.count(), 1)
+
+    def test_recommendation_api_serves_lookup_with_sales_fallback(self):
+        rebuild_user_recommendations(min_support=1)
+        with self.assertNumQueries(1):
+            self.assertEqual(list(recommended_products(self.u3.id, limit=1)), [self.b])
+
+        self.client.force_login(self.u3)
+        data = self.client.get(reverse('api_recommendations')).json()
+        self.assertEqual(data['source'], 'personalized')
+        self.assertEqual([row['name'] for row in data['recommendations']], ['B', 'C'])
+        # 冷启动用户和匿名用户按销量排序
+        self.client.force_login(self.new)
+        data = self.client.get(reverse('api_recommendations')).json()
+        self.assertNotIn('source', data)
+        self.assertEqual([row['name'] for row in data['recommendations']], ['D', 'C', 'B', 'A'])
+        self.client.logout()
+        self.assertNotIn('source', self.client.get(reverse('api_recommendations')).json())
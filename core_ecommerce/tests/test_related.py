@@ -0,0 +1,64 @@
+from decimal import Decimal
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from core_ecommerce.models import Order, OrderItem, Product, RelatedProduct, UserBehavior
+from core_ecommerce.related import interaction_matrix, rebuild_related_products, related_products
+
+
+class RelatedProductsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='pass')
+        self.a, self.b, self.c, self.d = [
+            Product.objects.create(name=name, sku=name, price=Decimal('1.00')) for name in 'ABCD'
+        ]
+        for products, status in [((self.a, self.b), 'PAID'), ((self.a, self.b), 'COMPLETED'),
+                                 ((self.a, self.c), 'PAID'), ((self.c, self.d), 'CANCELLED')]:
+            order = Order.objects.create(user=self.user, total_amount=Decimal('2.00'), status=status)
+            for product in products:
+                OrderItem.objects.create(order=order, product=product, price=product.price)
+        for session, product, behavior in [('s1', self.a, 'view'), ('s1', self.b, 'view'), ('s1', self.b, 'view'),
+                                           ('s2', self.a, 'view'), ('s2', self.d, 'add_to_cart'),
+                                           ('s3', self.c, 'review')]:
+            UserBehavior.objects.create(session_id=session, product=product, behavior_type=behavior)
+
+    def links(self, product):
+        return list(RelatedProduct.objects.filter(product=product).order_by('rank').values_list('related__name', 'score'))
+
+    def test_min_support_filters_rare_pairs(self):
+        self.assertEqual(rebuild_related_products(min_support=2), {'products': 2, 'links': 2})
+        self.assertEqual([name for name, _ in self.links(self.a)], ['B'])
+        self.assertEqual([name for name, _ in self.links(self.b)], ['A'])
+
+    def test_scores_are_cosine_similarities(self):
+        matrix, product_ids = interaction_matrix()
+        # 取消的订单、未加权的行为类型不计入
+        self.assertEqual(matrix.shape, (5, 4))
+        dense = matrix.toarray()
+        unit = dense / np.linalg.norm(dense, axis=0)
+        expected = unit.T @ unit
+        column = {pk: i for i, pk in enumerate(product_ids.tolist())}
+
+        rebuild_related_products(top_k=2, min_support=1)
+        links = self.links(self.a)
+        self.assertEqual([name for name, _ in links], ['B', 'D'] if expected[column[self.a.id], column[self.d.id]]
+                         > expected[column[self.a.id], column[self.c.id]] else ['B', 'C'])
+        self.assertAlmostEqual(links[0][1], expected[column[self.a.id], column[self.b.id]])
+        # 重建是整表替换
+        rebuild_related_products(min_support=2)
+        self.assertEqual(RelatedProduct.objects.count(), 2)
+
+    def test_related_lookup_and_recommendation_api(self):
+        rebuild_related_products(min_support=1)
+        with self.assertNumQueries(1):
+            self.assertEqual(list(related_products(self.a.id, limit=1)), [self.b])
+
+        data = self.client.get(reverse('api_recommendations'), {'product_id': self.a.id}).json()
+        self.assertEqual(data['source'], 'related')
+        self.assertEqual(data['recommendations'][0]['name'], 'B')
+        # 没有相关商品时退回按销量排序
+        data = self.client.get(reverse('api_recommendations'), {'product_id': 999999}).json()
+        self.assertNotIn('source', data)
+        self.assertEqual(len(data['recommendations']), 4)
@@ -0,0 +1,101 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from core_ecommerce.catalog import catalog_state
+from core_ecommerce.checkout import InsufficientStock, place_order
+from core_ecommerce.models import Cart, CartItem, Order, Product, StockReservation
+from core_ecommerce.reservations import adjust_stock, hold_cart_quantity, release_expired_reservations, stock_levels
+
+
+class StockReservationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='pass')
+        self.cart = Cart.objects.create(user=self.user)
+        self.product = Product.objects.create(name='P', sku='P', price=5, stock=10, category='Cat')
+
+    def stock(self):
+        return stock_levels([self.product.id])[self.product.id]
+
+    def test_cart_hold_is_capped_and_adjustable(self):
+        self.assertEqual(hold_cart_quantity(self.cart, self.product.id, 4), 4)
+        self.assertEqual(self.stock(), {'available': 6, 'reserved': 4, 'on_hand': 10})
+        # 超出可售库存时只预占到上限
+        self.assertEqual(hold_cart_quantity(self.cart, self.product.id, 50), 10)
+        self.assertEqual(hold_cart_quantity(self.cart, self.product.id, 3), 3)
+        self.assertEqual(self.stock(), {'available': 7, 'reserved': 3, 'on_hand': 10})
+        self.assertEqual(StockReservation.objects.filter(status='ACTIVE').count(), 1)
+
+    def test_cart_holds_only_write_the_ledger(self):
+        version = catalog_state()[0]
+        with self.assertNumQueries(5):
+            hold_cart_quantity(self.cart, self.product.id, 4)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 10)
+        self.assertEqual(catalog_state()[0], version)
+        # 过期的预占不再占用库存，不必等定时任务释放
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.stock()['available'], 10)
+
+    def test_checkout_keeps_other_carts_holds(self):
+        other_cart = Cart.objects.create(user=User.objects.create_user(username='other', password='pass'))
+        hold_cart_quantity(other_cart, self.product.id, 7)
+        self.assertEqual(hold_cart_quantity(self.cart, self.product.id, 5), 3)
+        with self.assertRaises(InsufficientStock) as raised:
+            place_order(self.user, [{'product_id': self.product.id, 'quantity': 4}])
+        self.assertEqual(raised.exception.shortages, [{'product_id': self.product.id, 'requested': 4, 'available': 3}])
+        place_order(self.user, [{'product_id': self.product.id, 'quantity': 3}])
+        self.assertEqual(self.stock(), {'available': 0, 'reserved': 10, 'on_hand': 10})
+
+    def test_adjust_stock_is_all_or_nothing(self):
+        short = Product.objects.create(name='S', sku='S', price=1, stock=2, category='Cat')
+        self.assertFalse(adjust_stock({self.product.id: -6, short.id: -3}, sales_deltas={self.product.id: 6}))
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.sales_count), (10, 0))
+        self.assertTrue(adjust_stock({self.product.id: -6, short.id: -2}))
+        self.assertEqual(dict(Product.objects.values_list('sku', 'stock')), {'P': 4, 'S': 0})
+
+    def test_checkout_converts_cart_hold_and_payment_commits(self):
+        hold_cart_quantity(self.cart, self.product.id, 3)
+        order, _ = place_order(self.user, [{'product_id': self.product.id, 'quantity': 4}])
+        # 购物车的 3 件预占转给订单，可售数量只再减少 1 件
+        self.assertEqual(self.stock(), {'available': 6, 'reserved': 4, 'on_hand': 10})
+        self.assertEqual(StockReservation.objects.get(cart=self.cart).status, 'CONVERTED')
+
+        order.status = 'PAID'
+        order.save()
+        self.assertEqual(self.stock(), {'available': 6, 'reserved': 0, 'on_hand': 6})
+        # 已付款订单的预占不会被释放
+        self.assertEqual(release_expired_reservations(now=timezone.now() + timedelta(days=1))['released'], 0)
+
+    def test_cancel_releases_stock(self):
+        order, _ = place_order(self.user, [{'product_id': self.product.id, 'quantity': 2}])
+        order.status = 'CANCELLED'
+        order.save()
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.sales_count), (10, 0))
+
+    def test_sweeper_releases_expired_holds_and_cancels_unpaid_orders(self):
+        other = Product.objects.create(name='Q', sku='Q', price=1, stock=5, category='Cat')
+        order, _ = place_order(self.user, [{'product_id': self.product.id, 'quantity': 2},
+                                           {'product_id': other.id, 'quantity': 1}])
+        hold_cart_quantity(self.cart, self.product.id, 3)
+        self.assertEqual(release_expired_reservations(), {'released': 0, 'cancelled_orders': 0})
+
+        result = release_expired_reservations(now=timezone.now() + timedelta(hours=1), batch_size=1)
+        self.assertEqual(result, {'released': 3, 'cancelled_orders': 1})
+        self.assertEqual(Order.objects.get(id=order.id).status, 'CANCELLED')
+        self.assertEqual(self.stock(), {'available': 10, 'reserved': 0, 'on_hand': 10})
+        other.refresh_from_db()
+        self.assertEqual((other.stock, other.sales_count), (5, 0))
+
+    def test_cart_api_holds_stock(self):
+        self.client.force_login(self.user)
+        resp = self.client.post(reverse('api_cart'), {'product_id': self.product.id, 'quantity': 12}, content_type='application/json')
+        self.assertEqual(resp.json()['reserved'], 10)
+        item = CartItem.objects.get()
+        self.assertEqual(item.quantity, 10)
+        self.client.delete(reverse('api_cart'), {'item_id': item.id}, content_type='application/json')
+        self.assertEqual(self.stock(), {'available': 10, 'reserved': 0, 'on_hand': 10})
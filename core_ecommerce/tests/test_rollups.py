@@ -0,0 +1,134 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from core_ecommerce.models import DailySalesRollup, HourlySalesRollup, Order, Product
+from core_ecommerce.rollups import reconcile_sales_rollups
+
+
+def rollup_snapshot():
+    """非零的汇总行（增量维护会留下计数归零的行，重算时不会生成）"""
+    daily = DailySalesRollup.objects.order_by('date').values_list('date', 'order_count', 'paid_orders', 'paid_amount', 'new_buyers')
+    hourly = HourlySalesRollup.objects.order_by('hour').values_list('hour', 'order_count', 'paid_orders', 'paid_amount')
+    return [row for row in daily if any(row[1:])], [row for row in hourly if any(row[1:])]
+
+
+class SalesRollupTest(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='pass')
+        self.bob = User.objects.create_user(username='bob', password='pass')
+
+    def test_signals_keep_rollups_in_sync_with_orders(self):
+        first = Order.objects.create(user=self.alice, total_amount=Decimal('100.00'))
+        Order.objects.create(user=self.alice, total_amount=Decimal('30.00'), status='PAID')
+        Order.objects.create(user=self.bob, total_amount=Decimal('50.00'), status='COMPLETED')
+        yesterday = Order.objects.create(user=self.bob, total_amount=Decimal('20.00'), status='PAID')
+        Order.objects.filter(id=yesterday.id).update(created_at=timezone.now() - timedelta(days=1))
+        reconcile_sales_rollups()
+
+        # 状态变化：待付款 -> 已付款 -> 已取消
+        first.status = 'PAID'
+        first.save()
+        today = DailySalesRollup.objects.get(date=timezone.localdate())
+        self.assertEqual((today.order_count, today.paid_orders, today.paid_amount), (3, 3, Decimal('180.00')))
+        self.assertEqual(today.new_buyers, 1)
+
+        first = Order.objects.get(id=first.id)
+        first.status = 'CANCELLED'
+        first.save()
+        Order.objects.get(id=yesterday.id).delete()
+
+        incremental = rollup_snapshot()
+        reconcile_sales_rollups(days=None)
+        self.assertEqual(incremental, rollup_snapshot())
+
+    def test_reconcile_repairs_writes_that_bypass_signals(self):
+        order = Order.objects.create(user=self.alice, total_amount=Decimal('80.00'))
+        Order.objects.filter(id=order.id).update(status='PAID')
+        self.assertEqual(DailySalesRollup.objects.get().paid_amount, 0)
+        reconcile_sales_rollups()
+        self.assertEqual(DailySalesRollup.objects.get().paid_amount, Decimal('80.00'))
+
+    def test_dashboard_reads_rollups_in_constant_queries(self):
+        Product.objects.create(name='P1', sku='P1', price=10, stock=3, category='Cat')
+        for i in range(5):
+            Order.objects.create(user=self.alice if i % 2 else self.bob, total_amount=Decimal('10.00'), status='PAID')
+        Order.objects.create(user=self.alice, total_amount=Decimal('99.00'))
+
+        with self.assertNumQueries(7):
+            data = self.client.get(reverse('api_analytics')).json()
+        stats = data['stats']
+        self.assertEqual(stats['total_sales'], 50.0)
+        self.assertEqual(stats['today_sales'], 50.0)
+        self.assertEqual(stats['total_orders'], 6)
+        self.assertEqual(stats['today_orders'], 6)
+        self.assertEqual(stats['active_users'], 2)
+        self.assertEqual(len(data['sales_trend']), 7)
+        self.assertEqual(data['sales_trend'][-1], {'date': timezone.localdate().strftime('%Y-%m-%d'), 'sales': 50.0})
+        self.assertEqual(len(data['hourly_sales']), 24)
+        self.assertEqual(data['hourly_sales'][-1]['orders'], 6)
+
+
+class SalesTrendAPITest(TestCase):
+    def setUp(self):
+        for day, amount in [(date(2026, 1, 5), '10.00'), (date(2026, 1, 7), '5.00'), (date(2026, 2, 20), '7.50')]:
+            DailySalesRollup.objects.create(date=day, order_count=2, paid_orders=1, paid_amount=Decimal(amount))
+
+    def test_daily_series_is_zero_filled_in_one_query(self):
+        with self.assertNumQueries(1):
+            data = self.client.get(reverse('api_sales_trend'), {'start': '2026-01-04', 'end': '2026-01-08'}).json()
+        self.assertEqual([row['sales'] for row in data['series']], [0.0, 10.0, 0.0, 5.0, 0.0])
+        self.assertEqual(data['series'][1], {'period': '2026-01-05', 'orders': 2, 'paid_orders': 1, 'sales': 10.0})
+        self.assertEqual(data['total_orders'], 4)
+
+    def test_week_and_month_granularity(self):
+        weekly = self.client.get(reverse('api_sales_trend'),
+                                 {'start': '2026-01-01', 'end': '2026-01-20', 'granularity': 'week'}).json()
+        # 周从周一开始：2025-12-29 所在周覆盖到 2026-01-04
+        self.assertEqual([row['period'] for row in weekly['series']],
+                         ['2025-12-29', '2026-01-05', '2026-01-12', '2026-01-19'])
+        self.assertEqual([row['sales'] for row in weekly['series']], [0.0, 15.0, 0.0, 0.0])
+
+        monthly = self.client.get(reverse('api_sales_trend'),
+                                  {'start': '2025-12-15', 'end': '2026-03-01', 'granularity': 'month'}).json()
+        self.assertEqual([(row['period'], row['sales']) for row in monthly['series']],
+                         [('2025-12-01', 0.0), ('2026-01-01', 15.0), ('2026-02-01', 7.5), ('2026-03-01', 0.0)])
+        self.assertEqual(monthly['total_sales'], 22.5)
+
+    def test_invalid_parameters(self):
+        for params in [{'granularity': 'year'}, {'start': '2026-02-01', 'end': '2026-01-01'},
+                       {'start': 'yesterday'}, {'start': '2020-01-01', 'end': '2026-01-01'}]:
+            self.assertEqual(self.client.get(reverse('api_sales_trend'), params).status_code, 400)
+
+
+class SalesRollupBackfillMigrationTest(TransactionTestCase):
+    before = [('core_ecommerce', '0012_product_score_dirty')]
+    after = [('core_ecommerce', '0013_sales_rollups')]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_migration_backfills_existing_orders(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        apps = executor.loader.project_state(self.before).apps
+        user = apps.get_model('auth', 'User').objects.create(username='alice')
+        orders = apps.get_model('core_ecommerce', 'Order').objects
+        orders.create(user=user, total_amount=Decimal('30.00'), status='PAID')
+        orders.create(user=user, total_amount=Decimal('10.00'))
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(self.after)
+        apps = executor.loader.project_state(self.after).apps
+        today = apps.get_model('core_ecommerce', 'DailySalesRollup').objects.get()
+        self.assertEqual((today.order_count, today.paid_orders, today.paid_amount, today.new_buyers),
+                         (2, 1, Decimal('30.00'), 1))
+        self.assertEqual(apps.get_model('core_ecommerce', 'HourlySalesRollup').objects.count(), 1)
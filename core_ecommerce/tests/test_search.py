@@ -0,0 +1,68 @@
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+from core_ecommerce.models import Product
+from core_ecommerce.search import tokenize, search_filter, search_product_ids, rebuild_index
+
+
+class ProductSearchIndexTest(TestCase):
+    def setUp(self):
+        self.earphone = Product.objects.create(
+            name='智能蓝牙耳机', sku='PROD-001', price=199, category='数码配件', potential_score=0.1,
+        )
+        self.charger = Product.objects.create(
+            name='无线充电器', sku='PROD-002', price=99, category='数码配件',
+            description='可同时为蓝牙耳机充电', potential_score=0.9,
+        )
+        self.keyboard = Product.objects.create(
+            name='Mechanical Keyboard', sku='KB-RED-01', price=399, category='电脑外设',
+        )
+
+    def test_tokenize_cjk_into_unigrams_and_bigrams(self):
+        self.assertEqual(tokenize('蓝牙耳机 Pro-2'), ['蓝', '牙', '耳', '机', '蓝牙', '牙耳', '耳机', 'pro', '2'])
+
+    def test_search_ranks_name_match_above_description_match(self):
+        self.assertEqual(search_product_ids('蓝牙耳机'), [self.earphone.id, self.charger.id])
+        self.assertEqual(search_product_ids('耳'), [self.earphone.id, self.charger.id])
+        self.assertEqual(search_product_ids('keyb'), [self.keyboard.id])
+        self.assertEqual(search_product_ids('kb-red'), [self.keyboard.id])
+        self.assertEqual(search_product_ids('蓝牙 keyboard'), [])
+        self.assertEqual(len(search_product_ids('蓝牙 keyboard', match_any=True)), 3)
+
+    def test_index_follows_saves_and_deletes(self):
+        self.keyboard.name = '机械键盘'
+        self.keyboard.save()
+        self.assertEqual(search_product_ids('keyboard'), [])
+        self.assertEqual(search_product_ids('键盘'), [self.keyboard.id])
+        self.keyboard.delete()
+        self.assertEqual(search_product_ids('键盘'), [])
+
+    def test_rebuild_index(self):
+        Product.objects.filter(id=self.keyboard.id).update(name='游戏手柄')
+        self.assertEqual(rebuild_index(), 3)
+        self.assertEqual(search_product_ids('手柄'), [self.keyboard.id])
+
+    def test_product_list_api_orders_search_results_by_relevance(self):
+        resp = self.client.get(reverse('api_product_list'), {'q': '蓝牙耳机'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([p['id'] for p in resp.json()['results']], [self.earphone.id, self.charger.id])
+
+        resp = self.client.get(reverse('api_product_list'), {'q': '蓝牙耳机', 'ordering': '-potential_score'})
+        self.assertEqual([p['id'] for p in resp.json()['results']], [self.charger.id, self.earphone.id])
+
+    def test_search_filter_is_not_capped(self):
+        self.assertEqual(set(Product.objects.filter(search_filter('耳')).values_list('id', flat=True)),
+                         {self.earphone.id, self.charger.id})
+        self.assertFalse(Product.objects.filter(search_filter('  ')).exists())
+
+    def test_product_list_api_counts_and_orders_all_matches(self):
+        # 相关度排名只取前 1 个命中：其余命中仍然参与计数、排序和分页
+        with mock.patch('core_ecommerce.api_views.search_product_ids', lambda q: search_product_ids(q, limit=1)):
+            data = self.client.get(reverse('api_product_list'), {'q': '蓝牙耳机'}).json()
+            self.assertEqual(data['count'], 2)
+            self.assertEqual([p['id'] for p in data['results']], [self.earphone.id, self.charger.id])
+
+            data = self.client.get(reverse('api_product_list'), {'q': '蓝牙耳机', 'ordering': 'price'}).json()
+            self.assertEqual(data['count'], 2)
+            self.assertEqual([p['id'] for p in data['results']], [self.charger.id, self.earphone.id])
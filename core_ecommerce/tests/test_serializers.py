@@ -0,0 +1,38 @@
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from core_ecommerce.models import Product
+from core_ecommerce.serializers import ProductSerializer, product_list_values, serialize_product_rows
+
+
+class FastProductSerializationTest(TestCase):
+    def setUp(self):
+        Product.objects.create(name='有图', sku='A', price=Decimal('19.9'), original_price=Decimal('29.90'),
+                               stock=3, category='Cat', description='desc', image_url='https://example.com/a.jpg',
+                               rating=4, sales_count=7, potential_score=0.5, selection_reason='热销')
+        Product.objects.create(name='无图', sku='B', price=Decimal('5'), stock=0, potential_score=0.25)
+
+    def test_output_is_byte_identical_to_product_serializer(self):
+        queryset = Product.objects.order_by('id')
+        expected = JSONRenderer().render(ProductSerializer(queryset, many=True).data)
+        self.assertEqual(JSONRenderer().render(serialize_product_rows(product_list_values(queryset))), expected)
+
+    def test_list_endpoints_use_fast_path(self):
+        expected = ProductSerializer(Product.objects.order_by('-potential_score', '-id'), many=True).data
+        with self.assertNumQueries(2):
+            data = self.client.get(reverse('api_product_list')).json()
+        self.assertEqual(data['results'], expected)
+        # keyset 分页从 dict 行中读取游标值
+        data = self.client.get(reverse('api_product_list'), {'cursor': '', 'page_size': 1}).json()
+        self.assertEqual(data['results'], expected[:1])
+        self.assertEqual(self.client.get(data['next']).json()['results'], expected[1:])
+
+    def test_benchmark_command_checks_identical_output(self):
+        from io import StringIO
+        out = StringIO()
+        call_command('bench_product_serializer', rows=[10], repeat=1, stdout=out)
+        self.assertIn('逐字节一致', out.getvalue())
+        self.assertEqual(Product.objects.count(), 2)
@@ -13,13 +13,19 @@ urlpatterns = [
     path('api/products/', api_views.ProductListAPI.as_view(), name='api_product_list'),
     path('api/products/<int:pk>/', api_views.ProductDetailAPI.as_view(), name='api_product_detail'),
     path('api/products/import/', api_views.ImportProductsAPI.as_view(), name='api_product_import'),
+    path('api/products/import/jobs/<int:job_id>/', api_views.ImportJobStatusAPI.as_view(), name='api_product_import_job'),
     path('api/products/<int:product_id>/reviews/', api_views.ProductReviewListAPI.as_view(), name='api_product_reviews'),
     path('api/reviews/<int:review_id>/helpful/', api_views.ProductReviewHelpfulAPI.as_view(), name='api_review_helpful'),
     path('api/cart/', api_views.CartAPI.as_view(), name='api_cart'),
+    path('api/cart/batch/', api_views.CartBatchAPI.as_view(), name='api_cart_batch'),
     path('api/orders/', api_views.OrderAPI.as_view(), name='api_orders'),
     path('api/addresses/', api_views.ShippingAddressAPI.as_view(), name='api_addresses'),
     path('api/analytics/', api_views.AnalyticsDashboardAPI.as_view(), name='api_analytics'),
+    path('api/analytics/sales-trend/', api_views.SalesTrendAPI.as_view(), name='api_sales_trend'),
+    path('api/analytics/query-cache/', api_views.QueryCacheStatsAPI.as_view(), name='api_query_cache_stats'),
     path('api/inventory/monitor/', api_views.InventoryMonitorAPI.as_view(), name='api_inventory_monitor'),
     path('api/behavior/', api_views.UserBehaviorAPI.as_view(), name='api_user_behavior'),
+    path('api/behavior/feed/', api_views.BehaviorFeedAPI.as_view(), name='api_behavior_feed'),
+    path('api/behavior/stats/', api_views.BehaviorEventStatsAPI.as_view(), name='api_behavior_stats'),
     path('api/recommendations/', api_views.RecommendationAPI.as_view(), name='api_recommendations'),
 ]
\ No newline at end of file
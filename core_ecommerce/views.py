@@ -2,6 +2,7 @@
 
 from django.shortcuts import render, get_object_or_404
 from .models import Product, Order
+from .related import related_products
 from django.db.models import Count, Sum
 from django.contrib.auth.decorators import login_required
 from django.http import HttpResponse
@@ -18,8 +19,11 @@ def product_list(request):
 def product_detail(request, product_id):
     """商品详情页（消费者端）"""
     product = get_object_or_404(Product, id=product_id)
-    # 此处应集成 AI 推荐（例如：推荐相似度高的商品）
-    return render(request, 'core_ecommerce/product_detail.html', {'product': product})
+    # 相关商品来自离线计算的相似度索引（见 related.py），一次索引查询
+    return render(request, 'core_ecommerce/product_detail.html', {
+        'product': product,
+        'related_products': list(related_products(product.id)),
+    })
 
 @login_required
 def order_list(request):
@@ -1,6 +1,7 @@
 # ecommerce_ai_system/settings.py
 
 import os
+import sys
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -66,6 +67,23 @@ DATABASES = {
     }
 }
 
+# 默认缓存保存目录版本号（core_ecommerce/catalog.py）、购物车读模型等数据。
+# 多进程部署（多个 Web worker + Celery worker）必须设置 CACHE_URL 使用 Redis：版本号需要跨进程共享，
+# 并且依赖 Redis INCR 的原子递增（文件缓存的 incr 是先读后写，并发递增会丢失，不支持）。
+# 未设置时使用进程内缓存，只适用于单进程的开发环境。
+CACHE_URL = os.environ.get('CACHE_URL')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_URL,
+    } if CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+# 测试始终使用进程内缓存：测试中的 cache.clear() 不会清空真实部署共享的缓存
+if len(sys.argv) > 1 and sys.argv[1] == 'test':
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
 # 国际化/多语言配置
 LANGUAGE_CODE = 'zh-Hans' # 中文
 TIME_ZONE = 'Asia/Shanghai' 
@@ -74,6 +92,10 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# 上传文件（商品导入任务的 CSV 等）
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # CORS (开发环境) - 允许前端本地开发时跨域访问 API，生产环境请配置为受限域名
@@ -100,4 +122,29 @@ REST_FRAMEWORK = {
 
 # Celery (默认使用本地 Redis，若需要改为其他 Broker，请在环境变量 CELERY_BROKER_URL 中设置)
 CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
-CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', CELERY_BROKER_URL)
\ No newline at end of file
+CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', CELERY_BROKER_URL)
+
+# 商品列表查询结果缓存（见 core_ecommerce/query_cache.py）：locmem 为进程内 LRU，
+# 多进程部署时改为 redis（LOCATION 为空时复用 CELERY_BROKER_URL）
+PRODUCT_QUERY_CACHE = {
+    'BACKEND': os.environ.get('PRODUCT_QUERY_CACHE_BACKEND', 'locmem'),
+    'LOCATION': os.environ.get('PRODUCT_QUERY_CACHE_URL'),
+    'MAX_ENTRIES': 1024,
+    'TIMEOUT': 60,
+}
+
+# 用户行为事件缓冲区（见 core_ecommerce/events.py）：locmem 由进程内线程写入，
+# redis 由 Celery 定时任务 drain_behavior_events 写入（LOCATION 为空时复用 CELERY_BROKER_URL）。
+# 实时动态（activity_feed.py）使用同一后端：locmem 只适用于单进程部署，多进程部署需使用 redis
+BEHAVIOR_EVENT_BUFFER = {
+    'BACKEND': os.environ.get('BEHAVIOR_EVENT_BUFFER_BACKEND', 'locmem'),
+    'LOCATION': os.environ.get('BEHAVIOR_EVENT_BUFFER_URL'),
+    'CAPACITY': 100000,
+}
+
+# 商品语义向量（见 core_ecommerce/embeddings.py）：定时任务 build_product_embeddings 写入 PATH，
+# Web 进程只读映射同一份文件
+PRODUCT_EMBEDDINGS = {
+    'PATH': os.environ.get('PRODUCT_EMBEDDINGS_PATH') or BASE_DIR / 'product_embeddings',
+    'DIMENSIONS': 64,
+}